@@ -0,0 +1,72 @@
+"""initial schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 08:41:11.459949
+
+Baseline of the schema the API used to create on startup. Databases it
+created that way already match, so their tables are left as they are.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not op.get_context().as_sql and sa.inspect(op.get_bind()).has_table('instagram_accounts'):
+        # Created by the API's create_all before migrations existed
+        return
+
+    op.create_table('instagram_accounts',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('username', sa.String(), nullable=True),
+    sa.Column('encrypted_credentials', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('last_used', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_instagram_accounts_username'), 'instagram_accounts', ['username'], unique=True)
+
+    op.create_table('media_posts',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('source_url', sa.String(), nullable=True),
+    sa.Column('media_type', sa.String(), nullable=True),
+    sa.Column('caption', sa.String(), nullable=True),
+    sa.Column('account_id', sa.String(), nullable=True),
+    sa.Column('status', sa.Enum('PENDING', 'SCHEDULED', 'POSTED', 'FAILED', name='poststatus'), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('posted_at', sa.DateTime(), nullable=True),
+    sa.Column('error_message', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['account_id'], ['instagram_accounts.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table('scheduled_posts',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('media_post_id', sa.String(), nullable=True),
+    sa.Column('scheduled_time', sa.DateTime(), nullable=True),
+    sa.Column('is_processed', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.Column('retry_count', sa.Integer(), nullable=True),
+    sa.Column('max_retries', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['media_post_id'], ['media_posts.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('scheduled_posts')
+    op.drop_table('media_posts')
+    op.drop_index(op.f('ix_instagram_accounts_username'), table_name='instagram_accounts')
+    op.drop_table('instagram_accounts')
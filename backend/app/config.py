@@ -15,13 +15,98 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./instagram_reposter.db")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT_SECONDS: int = int(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
     
     # Redis (for Celery)
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", "6379"))
+    REDIS_URL: str = os.getenv("REDIS_URL", f"redis://{REDIS_HOST}:{REDIS_PORT}/0")
+    
+    # Instagram rate limiting
+    INSTAGRAM_RATE_LIMIT: int = int(os.getenv("INSTAGRAM_RATE_LIMIT", "30"))  # calls per hour
+    INSTAGRAM_RATE_LIMIT_BURST: int = int(os.getenv("INSTAGRAM_RATE_LIMIT_BURST", "5"))
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "redis")  # "redis" or "memory"
+    
+    # Status read cache
+    STATUS_CACHE_BACKEND: str = os.getenv("STATUS_CACHE_BACKEND", "redis")  # "redis" or "memory"
+    STATUS_CACHE_TTL_SECONDS: int = int(os.getenv("STATUS_CACHE_TTL_SECONDS", "60"))
+    STATUS_CACHE_MAX_ENTRIES: int = int(os.getenv("STATUS_CACHE_MAX_ENTRIES", "10000"))
+    
+    # Status events
+    EVENTS_BACKEND: str = os.getenv("EVENTS_BACKEND", "redis")  # "redis" or "memory"
+    EVENTS_CHANNEL: str = os.getenv("EVENTS_CHANNEL", "status-events")
+    EVENTS_HEARTBEAT_SECONDS: int = int(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+    EVENTS_SUBSCRIBER_QUEUE_SIZE: int = int(os.getenv("EVENTS_SUBSCRIBER_QUEUE_SIZE", "100"))
+    
+    # Scheduling
+    BULK_SCHEDULE_MAX_ITEMS: int = int(os.getenv("BULK_SCHEDULE_MAX_ITEMS", "10000"))
+    SCHEDULE_PUBLISH_BATCH_SIZE: int = int(os.getenv("SCHEDULE_PUBLISH_BATCH_SIZE", "500"))
+    DISPATCH_BATCH_SIZE: int = int(os.getenv("DISPATCH_BATCH_SIZE", "500"))
+    DISPATCH_MAX_BATCHES: int = int(os.getenv("DISPATCH_MAX_BATCHES", "20"))
+    DISPATCH_CLAIM_TIMEOUT_SECONDS: int = int(os.getenv("DISPATCH_CLAIM_TIMEOUT_SECONDS", "3600"))
+    DISPATCH_LOOKAHEAD_SECONDS: int = int(os.getenv("DISPATCH_LOOKAHEAD_SECONDS", "30"))
+    UPLOAD_LEASE_SECONDS: int = int(os.getenv("UPLOAD_LEASE_SECONDS", "900"))
+    
+    # Retries of failed posts (see app.utils.failures)
+    RETRY_BACKOFF_BASE_SECONDS: int = int(os.getenv("RETRY_BACKOFF_BASE_SECONDS", "60"))
+    RETRY_BACKOFF_MAX_SECONDS: int = int(os.getenv("RETRY_BACKOFF_MAX_SECONDS", "1800"))
+    THROTTLED_BACKOFF_BASE_SECONDS: int = int(os.getenv("THROTTLED_BACKOFF_BASE_SECONDS", "600"))
+    THROTTLED_BACKOFF_MAX_SECONDS: int = int(os.getenv("THROTTLED_BACKOFF_MAX_SECONDS", "7200"))
+    REDRIVE_MAX_ITEMS: int = int(os.getenv("REDRIVE_MAX_ITEMS", "10000"))
+    
+    # Priority lanes
+    POST_ON_TIME_SECONDS: int = int(os.getenv("POST_ON_TIME_SECONDS", "60"))
+    LANE_STATS_BACKEND: str = os.getenv("LANE_STATS_BACKEND", "redis")  # "redis" or "memory"
+    
+    # Metrics
+    WORKER_METRICS_PORT: int = int(os.getenv("WORKER_METRICS_PORT", "9808"))  # 0 disables the worker exporter
+    
+    # Account-affinity routing
+    INSTAGRAM_QUEUE_SHARDS: int = int(os.getenv("INSTAGRAM_QUEUE_SHARDS", "16"))
+    INSTAGRAM_WORKER_INDEX: int = int(os.getenv("INSTAGRAM_WORKER_INDEX", "0"))
+    INSTAGRAM_WORKER_COUNT: int = int(os.getenv("INSTAGRAM_WORKER_COUNT", "1"))
     
     # File Storage
     MEDIA_DIR: Path = Path("media")
+    DOWNLOAD_DIR: Path = Path(os.getenv("MEDIA_STORAGE_PATH", "downloads"))
+    
+    # Media preparation
+    PREPARED_MEDIA_DIR: Path = Path(os.getenv("PREPARED_MEDIA_DIR", str(DOWNLOAD_DIR / "prepared")))
+    FFMPEG_PATH: str = os.getenv("FFMPEG_PATH", "ffmpeg")
+    FFPROBE_PATH: str = os.getenv("FFPROBE_PATH", "ffprobe")
+    MEDIA_PREP_TIMEOUT_SECONDS: int = int(os.getenv("MEDIA_PREP_TIMEOUT_SECONDS", "600"))
+    MEDIA_PREP_JPEG_QUALITY: int = int(os.getenv("MEDIA_PREP_JPEG_QUALITY", "90"))
+    
+    # Ingest (downloads queued by the API)
+    INGEST_RETRY_DELAY_SECONDS: int = int(os.getenv("INGEST_RETRY_DELAY_SECONDS", "30"))
+    INGEST_WAIT_MAX_DEFERRALS: int = int(os.getenv("INGEST_WAIT_MAX_DEFERRALS", "20"))
+    
+    # Downloader
+    DOWNLOAD_CONCURRENCY: int = int(os.getenv("DOWNLOAD_CONCURRENCY", "16"))
+    DOWNLOAD_LIMIT_PER_HOST: int = int(os.getenv("DOWNLOAD_LIMIT_PER_HOST", "8"))
+    DOWNLOAD_TIMEOUT_SECONDS: int = int(os.getenv("DOWNLOAD_TIMEOUT_SECONDS", "300"))
+    MAX_MEDIA_SIZE_MB: int = int(os.getenv("MAX_MEDIA_SIZE_MB", "50"))
+    DOWNLOAD_RETRIES: int = int(os.getenv("DOWNLOAD_RETRIES", "3"))
+    DOWNLOAD_RETRY_BACKOFF_SECONDS: float = float(os.getenv("DOWNLOAD_RETRY_BACKOFF_SECONDS", "1.0"))
+    DOWNLOAD_PARTIAL_MAX_AGE_HOURS: int = int(os.getenv("DOWNLOAD_PARTIAL_MAX_AGE_HOURS", "24"))
+    
+    # Media cleanup
+    MEDIA_RETENTION_HOURS: int = int(os.getenv("MEDIA_RETENTION_HOURS", "24"))
+    CLEANUP_BATCH_SIZE: int = int(os.getenv("CLEANUP_BATCH_SIZE", "500"))
+    CLEANUP_UNLINK_WORKERS: int = int(os.getenv("CLEANUP_UNLINK_WORKERS", "8"))
+    MEDIA_QUOTA_MB: int = int(os.getenv("MEDIA_QUOTA_MB", "0"))  # 0 disables quota eviction
+    MEDIA_QUOTA_TARGET_PERCENT: int = int(os.getenv("MEDIA_QUOTA_TARGET_PERCENT", "90"))
+    
+    # Instagram sessions
+    SESSION_DIR: Path = Path(os.getenv("SESSION_DIR", "sessions"))
+    INSTAGRAM_CLIENT_POOL_SIZE: int = int(os.getenv("INSTAGRAM_CLIENT_POOL_SIZE", "32"))
     
     class Config:
         case_sensitive = True
@@ -32,6 +117,3 @@ def get_settings() -> Settings:
 
 # Create instance for importing
 settings = get_settings()
-
-# Ensure media directory exists
-settings.MEDIA_DIR.mkdir(exist_ok=True)
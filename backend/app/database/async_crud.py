@@ -0,0 +1,301 @@
+"""Async variants of the crud operations used by the API routes.
+
+Celery workers keep using the sync functions in crud.py.
+"""
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from starlette.concurrency import run_in_threadpool
+from . import crud, models
+from ..utils.cache import status_cache, media_cache_key, schedule_cache_key
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+Cursor = Tuple[datetime, str]
+
+def _keyset(query, sort_column, id_column, after: Optional[Cursor], descending: bool = False):
+    """Order a query by (sort_column, id) and start it after the cursor row."""
+    if after:
+        key = tuple_(sort_column, id_column)
+        query = query.where(key < tuple_(*after) if descending else key > tuple_(*after))
+    if descending:
+        return query.order_by(sort_column.desc(), id_column.desc())
+    return query.order_by(sort_column, id_column)
+
+async def _page(db: AsyncSession, query, limit: int, sort_attr: str) -> Tuple[List, Optional[Cursor]]:
+    """Fetch one page plus a probe row; return the rows and the next cursor."""
+    rows = list((await db.execute(query.limit(limit + 1))).scalars())
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (getattr(rows[-1], sort_attr), rows[-1].id)
+
+async def create_instagram_account(db: AsyncSession, account_id: str, username: str, encrypted_credentials: str) -> models.InstagramAccount:
+    db_account = models.InstagramAccount(
+        id=account_id,
+        username=username,
+        encrypted_credentials=encrypted_credentials
+    )
+    db.add(db_account)
+    await db.commit()
+    return db_account
+
+async def get_instagram_account(db: AsyncSession, account_id: str) -> Optional[models.InstagramAccount]:
+    return await db.get(models.InstagramAccount, account_id)
+
+async def get_instagram_accounts(
+    db: AsyncSession,
+    limit: int = 100,
+    after: Optional[Cursor] = None
+) -> Tuple[List[models.InstagramAccount], Optional[Cursor]]:
+    query = _keyset(
+        select(models.InstagramAccount),
+        models.InstagramAccount.created_at,
+        models.InstagramAccount.id,
+        after
+    )
+    return await _page(db, query, limit, "created_at")
+
+async def update_instagram_account(db: AsyncSession, account_id: str, is_active: bool = None) -> Optional[models.InstagramAccount]:
+    db_account = await get_instagram_account(db, account_id)
+    if db_account:
+        if is_active is not None:
+            db_account.is_active = is_active
+        db_account.last_used = datetime.utcnow()
+        await db.commit()
+    return db_account
+
+async def delete_instagram_account(db: AsyncSession, account_id: str) -> bool:
+    db_account = await get_instagram_account(db, account_id)
+    if db_account:
+        await db.delete(db_account)
+        await db.commit()
+        return True
+    return False
+
+# Media Post operations
+async def create_media_post(
+    db: AsyncSession,
+    post_id: str,
+    source_url: str,
+    account_id: str,
+    media_type: str = "unknown",
+    caption: Optional[str] = None
+) -> models.MediaPost:
+    db_post = models.MediaPost(
+        id=post_id,
+        source_url=source_url,
+        media_type=media_type,
+        caption=caption,
+        account_id=account_id
+    )
+    db.add(db_post)
+    await db.commit()
+    return db_post
+
+async def get_media_post(db: AsyncSession, post_id: str) -> Optional[models.MediaPost]:
+    return await db.get(models.MediaPost, post_id)
+
+async def list_media_posts(
+    db: AsyncSession,
+    limit: int = 50,
+    after: Optional[Cursor] = None,
+    account_id: Optional[str] = None,
+    status: Optional[models.PostStatus] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None
+) -> Tuple[List[models.MediaPost], Optional[Cursor]]:
+    """List media posts newest first, one keyset page at a time."""
+    query = select(models.MediaPost)
+    if account_id:
+        query = query.where(models.MediaPost.account_id == account_id)
+    if status:
+        query = query.where(models.MediaPost.status == status)
+    if created_after:
+        query = query.where(models.MediaPost.created_at >= created_after)
+    if created_before:
+        query = query.where(models.MediaPost.created_at < created_before)
+    query = _keyset(query, models.MediaPost.created_at, models.MediaPost.id, after, descending=True)
+    return await _page(db, query, limit, "created_at")
+
+async def update_media_post_status(
+    db: AsyncSession,
+    post_id: str,
+    status: models.PostStatus,
+    error_message: Optional[str] = None
+) -> bool:
+    """Write a status transition with a single UPDATE and no reload."""
+    # Shared with the workers, so both stamp posted_at the same way
+    result = await db.execute(crud._media_post_status_update(post_id, status, error_message))
+    await db.commit()
+    # Redis calls are blocking; keep them off the event loop
+    await run_in_threadpool(status_cache.invalidate, media_cache_key(post_id))
+    return result.rowcount > 0
+
+# Scheduled Post operations
+async def create_scheduled_post(
+    db: AsyncSession,
+    schedule_id: str,
+    media_post_id: str,
+    scheduled_time: datetime
+) -> models.ScheduledPost:
+    db_schedule = models.ScheduledPost(
+        id=schedule_id,
+        media_post_id=media_post_id,
+        scheduled_time=scheduled_time
+    )
+    db.add(db_schedule)
+    await db.commit()
+    return db_schedule
+
+async def bulk_create_scheduled_posts(db: AsyncSession, schedules: List[Dict]) -> None:
+    """Insert many scheduled posts in a single transaction without reloading them."""
+    if not schedules:
+        return
+    await db.execute(insert(models.ScheduledPost), schedules)
+    await db.commit()
+
+async def get_existing_media_post_ids(db: AsyncSession, post_ids: Iterable[str], chunk_size: int = 500) -> Set[str]:
+    """Return the subset of post_ids that exist, querying in chunks."""
+    post_ids = list(set(post_ids))
+    existing = set()
+    for start in range(0, len(post_ids), chunk_size):
+        chunk = post_ids[start:start + chunk_size]
+        result = await db.execute(
+            select(models.MediaPost.id).where(models.MediaPost.id.in_(chunk))
+        )
+        existing.update(result.scalars())
+    return existing
+
+async def list_scheduled_posts(
+    db: AsyncSession,
+    limit: int = 50,
+    after: Optional[Cursor] = None,
+    account_id: Optional[str] = None,
+    is_processed: Optional[bool] = None,
+    scheduled_after: Optional[datetime] = None,
+    scheduled_before: Optional[datetime] = None
+) -> Tuple[List[models.ScheduledPost], Optional[Cursor]]:
+    """List scheduled posts by scheduled_time, one keyset page at a time."""
+    query = select(models.ScheduledPost)
+    if account_id:
+        query = query.join(models.MediaPost)\
+            .where(models.MediaPost.account_id == account_id)
+    if is_processed is not None:
+        query = query.where(models.ScheduledPost.is_processed == is_processed)
+    if scheduled_after:
+        query = query.where(models.ScheduledPost.scheduled_time >= scheduled_after)
+    if scheduled_before:
+        query = query.where(models.ScheduledPost.scheduled_time < scheduled_before)
+    query = _keyset(query, models.ScheduledPost.scheduled_time, models.ScheduledPost.id, after)
+    return await _page(db, query, limit, "scheduled_time")
+
+def _dead_letter_filter(query, failure_class: Optional[str], account_id: Optional[str]):
+    query = query.where(models.ScheduledPost.dead_lettered_at.is_not(None))
+    if failure_class:
+        query = query.where(models.ScheduledPost.failure_class == failure_class)
+    if account_id:
+        query = query.where(models.ScheduledPost.media_post_id.in_(
+            select(models.MediaPost.id).where(models.MediaPost.account_id == account_id)
+        ))
+    return query
+
+async def list_dead_letters(
+    db: AsyncSession,
+    limit: int = 50,
+    after: Optional[Cursor] = None,
+    failure_class: Optional[str] = None,
+    account_id: Optional[str] = None
+) -> Tuple[List[models.ScheduledPost], Optional[Cursor]]:
+    """List dead-lettered scheduled posts with their media post, oldest failure first."""
+    query = _dead_letter_filter(
+        select(models.ScheduledPost).options(joinedload(models.ScheduledPost.media_post)),
+        failure_class,
+        account_id
+    )
+    query = _keyset(query, models.ScheduledPost.dead_lettered_at, models.ScheduledPost.id, after)
+    return await _page(db, query, limit, "dead_lettered_at")
+
+async def redrive_dead_letters(
+    db: AsyncSession,
+    limit: int,
+    schedule_ids: Optional[Sequence[str]] = None,
+    failure_class: Optional[str] = None,
+    account_id: Optional[str] = None
+) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Make dead letters claimable again with a fresh retry budget.
+
+    Their media posts go back to PENDING, and the dispatcher picks them
+    up on its next run; posts whose time has passed go out in the
+    retry lane. Dead letters of deactivated accounts are left alone,
+    since they would fail again without a login attempt.
+
+    Returns:
+        IDs of the re-driven scheduled posts, IDs of matching dead
+        letters held back because their account is deactivated, and IDs
+        of re-driven media posts with nothing stored, which need ingest
+    """
+    query = _dead_letter_filter(
+        select(
+            models.ScheduledPost.id,
+            models.ScheduledPost.media_post_id,
+            models.MediaPost.blob_sha256,
+            models.MediaPost.prepared_path,
+            models.InstagramAccount.is_active
+        )
+        .join(models.ScheduledPost.media_post)
+        .join(models.MediaPost.account),
+        failure_class,
+        account_id
+    )
+    if schedule_ids is not None:
+        query = query.where(models.ScheduledPost.id.in_(schedule_ids))
+    rows = (await db.execute(query.order_by(models.ScheduledPost.dead_lettered_at).limit(limit))).all()
+    skipped = [row.id for row in rows if not row.is_active]
+    rows = [row for row in rows if row.is_active]
+    if not rows:
+        return [], skipped, []
+    redriven = [row.id for row in rows]
+    media_post_ids = [row.media_post_id for row in rows]
+    unstored = list(dict.fromkeys(
+        row.media_post_id for row in rows if not row.blob_sha256 and not row.prepared_path
+    ))
+    await db.execute(
+        update(models.ScheduledPost)
+        .where(models.ScheduledPost.id.in_(redriven))
+        .values(
+            dead_lettered_at=None,
+            dispatched_at=None,
+            retry_count=0,
+            ingest_deferrals=0,
+            failure_class=None,
+            last_error=None
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        update(models.MediaPost)
+        .where(models.MediaPost.id.in_(media_post_ids))
+        .where(models.MediaPost.status == models.PostStatus.FAILED)
+        .values(status=models.PostStatus.PENDING, error_message=None)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    await run_in_threadpool(
+        status_cache.invalidate,
+        *(schedule_cache_key(schedule_id) for schedule_id in redriven),
+        *(media_cache_key(post_id) for post_id in media_post_ids)
+    )
+    return redriven, skipped, unstored
+
+async def get_scheduled_post(db: AsyncSession, schedule_id: str) -> Optional[models.ScheduledPost]:
+    return await db.get(models.ScheduledPost, schedule_id)
+
+async def delete_scheduled_post(db: AsyncSession, schedule_id: str) -> bool:
+    result = await db.execute(
+        delete(models.ScheduledPost).where(models.ScheduledPost.id == schedule_id)
+    )
+    await db.commit()
+    await run_in_threadpool(status_cache.invalidate, schedule_cache_key(schedule_id))
+    return result.rowcount > 0
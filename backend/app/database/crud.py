@@ -1,7 +1,10 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, bindparam, delete, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
 from . import models
-from datetime import datetime
-from typing import List, Optional
+from ..utils.cache import status_cache, media_cache_key, schedule_cache_key
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
 def create_instagram_account(db: Session, account_id: str, username: str, encrypted_credentials: str) -> models.InstagramAccount:
     db_account = models.InstagramAccount(
@@ -62,22 +65,232 @@ def create_media_post(
 def get_media_post(db: Session, post_id: str) -> Optional[models.MediaPost]:
     return db.query(models.MediaPost).filter(models.MediaPost.id == post_id).first()
 
+def _media_post_status_update(
+    post_id: str,
+    status: models.PostStatus,
+    error_message: Optional[str] = None
+):
+    values = {"status": status}
+    if status == models.PostStatus.POSTED:
+        values["posted_at"] = datetime.utcnow()
+    if error_message:
+        values["error_message"] = error_message
+    return update(models.MediaPost)\
+        .where(models.MediaPost.id == post_id)\
+        .values(**values)\
+        .execution_options(synchronize_session=False)
+
 def update_media_post_status(
     db: Session,
     post_id: str,
     status: models.PostStatus,
     error_message: Optional[str] = None
-) -> Optional[models.MediaPost]:
-    db_post = get_media_post(db, post_id)
-    if db_post:
-        db_post.status = status
-        if status == models.PostStatus.POSTED:
-            db_post.posted_at = datetime.utcnow()
-        if error_message:
-            db_post.error_message = error_message
+) -> bool:
+    """Write a status transition with a single UPDATE and no reload."""
+    result = db.execute(_media_post_status_update(post_id, status, error_message))
+    db.commit()
+    status_cache.invalidate(media_cache_key(post_id))
+    return result.rowcount > 0
+
+def get_media_post_with_blob(db: Session, post_id: str) -> Optional[models.MediaPost]:
+    return db.query(models.MediaPost)\
+        .options(joinedload(models.MediaPost.blob))\
+        .filter(models.MediaPost.id == post_id)\
+        .first()
+
+def mark_media_post_prepared(db: Session, post_id: str, prepared) -> bool:
+    """Record the upload-ready file and its metadata on a media post."""
+    result = db.execute(
+        update(models.MediaPost)
+        .where(models.MediaPost.id == post_id)
+        .values(
+            media_type=prepared.media_type,
+            prepared_path=prepared.path,
+            prepared_thumbnail_path=prepared.thumbnail_path,
+            prepared_at=datetime.utcnow(),
+            width=prepared.width,
+            height=prepared.height,
+            duration=prepared.duration
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    status_cache.invalidate(media_cache_key(post_id))
+    return result.rowcount > 0
+
+# Media Blob operations
+def get_media_blob(db: Session, sha256: str) -> Optional[models.MediaBlob]:
+    return db.query(models.MediaBlob).filter(models.MediaBlob.sha256 == sha256).first()
+
+def get_media_blob_by_source(db: Session, source_url: str) -> Optional[models.MediaBlob]:
+    return db.query(models.MediaBlob).filter(models.MediaBlob.source_url == source_url).first()
+
+def get_or_create_media_blob(
+    db: Session,
+    sha256: str,
+    path: str,
+    size: int,
+    source_url: str,
+    content_type: Optional[str] = None
+) -> models.MediaBlob:
+    db_blob = get_media_blob(db, sha256)
+    if db_blob:
+        return db_blob
+    db_blob = models.MediaBlob(
+        sha256=sha256,
+        path=path,
+        size=size,
+        content_type=content_type,
+        source_url=source_url,
+        ref_count=0
+    )
+    db.add(db_blob)
+    try:
         db.commit()
-        db.refresh(db_post)
-    return db_post
+    except IntegrityError:
+        # Another download of the same bytes registered the blob first
+        db.rollback()
+        return get_media_blob(db, sha256)
+    return db_blob
+
+def attach_media_blob(
+    db: Session,
+    post_id: str,
+    sha256: str,
+    media_type: Optional[str] = None,
+    file_size: Optional[int] = None
+) -> Optional[models.MediaPost]:
+    """Point a media post at a blob and take a reference on it."""
+    # Re-ingested media is stored again, so cleanup has to release it again
+    values = {"blob_sha256": sha256, "purged_at": None}
+    if media_type:
+        values["media_type"] = media_type
+    if file_size is not None:
+        values["file_size"] = file_size
+    result = db.execute(
+        update(models.MediaPost)
+        .where(models.MediaPost.id == post_id)
+        .where(models.MediaPost.blob_sha256.is_(None))
+        .values(**values)
+    )
+    if result.rowcount:
+        db.execute(
+            update(models.MediaBlob)
+            .where(models.MediaBlob.sha256 == sha256)
+            .values(ref_count=models.MediaBlob.ref_count + 1, last_used_at=datetime.utcnow())
+        )
+    db.commit()
+    status_cache.invalidate(media_cache_key(post_id))
+    return get_media_post(db, post_id)
+
+def release_media_blobs(db: Session, post_ids: Sequence[str]) -> List[str]:
+    """
+    Drop the blob references of many media posts and mark them purged.
+
+    Returns the paths of blobs that lost their last reference; their rows
+    are deleted and the caller is responsible for unlinking the files.
+    """
+    if not post_ids:
+        return []
+    released = db.execute(
+        select(models.MediaPost.blob_sha256, func.count())
+        .where(models.MediaPost.id.in_(post_ids))
+        .where(models.MediaPost.blob_sha256.isnot(None))
+        .group_by(models.MediaPost.blob_sha256)
+    ).all()
+    db.execute(
+        update(models.MediaPost)
+        .where(models.MediaPost.id.in_(post_ids))
+        .values(blob_sha256=None, prepared_path=None, prepared_thumbnail_path=None, purged_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    orphaned_paths = []
+    if released:
+        blobs = models.MediaBlob.__table__
+        db.execute(
+            update(blobs)
+            .where(blobs.c.sha256 == bindparam("b_sha256"))
+            .values(ref_count=blobs.c.ref_count - bindparam("b_refs")),
+            [{"b_sha256": sha256, "b_refs": refs} for sha256, refs in released]
+        )
+        # RETURNING only reports blobs that really were orphaned at delete time
+        orphaned_paths = list(db.execute(
+            delete(models.MediaBlob)
+            .where(models.MediaBlob.sha256.in_([sha256 for sha256, _ in released]))
+            .where(models.MediaBlob.ref_count <= 0)
+            .returning(models.MediaBlob.path)
+        ).scalars())
+    db.commit()
+    status_cache.invalidate(*(media_cache_key(post_id) for post_id in post_ids))
+    return orphaned_paths
+
+def get_media_store_size(db: Session) -> int:
+    """Total bytes of all stored blobs."""
+    return db.execute(select(func.coalesce(func.sum(models.MediaBlob.size), 0))).scalar()
+
+def _blob_still_needed():
+    # True for blobs referenced by a post that is yet to be published, scheduled
+    # or not (freshly downloaded media has no schedule yet), or by a post that
+    # still has an unprocessed schedule
+    unpublished = and_(
+        models.MediaPost.status.in_([models.PostStatus.PENDING, models.PostStatus.SCHEDULED]),
+        models.MediaPost.posted_at.is_(None)
+    )
+    pending_schedule = (
+        select(models.ScheduledPost.id)
+        .where(models.ScheduledPost.media_post_id == models.MediaPost.id)
+        .where(models.ScheduledPost.is_processed.is_(False))
+        .exists()
+    )
+    return (
+        select(models.MediaPost.id)
+        .where(models.MediaPost.blob_sha256 == models.MediaBlob.sha256)
+        .where(or_(unpublished, pending_schedule))
+        .exists()
+    )
+
+def evictable_media_blobs_query():
+    """Blobs no unpublished post or pending schedule needs, least recently used first."""
+    return (
+        select(models.MediaBlob.sha256, models.MediaBlob.size)
+        .where(~_blob_still_needed())
+        .order_by(models.MediaBlob.last_used_at, models.MediaBlob.sha256)
+    )
+
+def evict_media_blobs(db: Session, sha256s: Sequence[str]) -> List[Tuple[str, int]]:
+    """
+    Delete blobs regardless of their reference count, marking every
+    referencing media post purged.
+
+    Blobs that gained an unpublished post or an unprocessed schedule since
+    they were selected are skipped. Returns (path, size) of each deleted blob; the caller is
+    responsible for unlinking the files.
+    """
+    if not sha256s:
+        return []
+    evictable = list(db.execute(
+        select(models.MediaBlob.sha256)
+        .where(models.MediaBlob.sha256.in_(sha256s))
+        .where(~_blob_still_needed())
+    ).scalars())
+    if not evictable:
+        return []
+    post_ids = list(db.execute(
+        update(models.MediaPost)
+        .where(models.MediaPost.blob_sha256.in_(evictable))
+        .values(blob_sha256=None, prepared_path=None, prepared_thumbnail_path=None, purged_at=datetime.utcnow())
+        .returning(models.MediaPost.id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+    evicted = [tuple(row) for row in db.execute(
+        delete(models.MediaBlob)
+        .where(models.MediaBlob.sha256.in_(evictable))
+        .returning(models.MediaBlob.path, models.MediaBlob.size)
+    )]
+    db.commit()
+    if post_ids:
+        status_cache.invalidate(*(media_cache_key(post_id) for post_id in post_ids))
+    return evicted
 
 # Scheduled Post operations
 def create_scheduled_post(
@@ -96,14 +309,157 @@ def create_scheduled_post(
     db.refresh(db_schedule)
     return db_schedule
 
+def bulk_create_scheduled_posts(db: Session, schedules: List[Dict]) -> None:
+    """Insert many scheduled posts in a single transaction without reloading them."""
+    if not schedules:
+        return
+    db.execute(insert(models.ScheduledPost), schedules)
+    db.commit()
+
+def get_existing_media_post_ids(db: Session, post_ids: Iterable[str], chunk_size: int = 500) -> Set[str]:
+    """Return the subset of post_ids that exist, querying in chunks."""
+    post_ids = list(set(post_ids))
+    existing = set()
+    for start in range(0, len(post_ids), chunk_size):
+        chunk = post_ids[start:start + chunk_size]
+        rows = db.query(models.MediaPost.id).filter(models.MediaPost.id.in_(chunk)).all()
+        existing.update(row.id for row in rows)
+    return existing
+
 def get_scheduled_post(db: Session, schedule_id: str) -> Optional[models.ScheduledPost]:
     return db.query(models.ScheduledPost).filter(models.ScheduledPost.id == schedule_id).first()
 
+def get_scheduled_post_for_processing(db: Session, schedule_id: str) -> Optional[models.ScheduledPost]:
+    """Load a scheduled post with its media post, blob and account in one query."""
+    return db.query(models.ScheduledPost)\
+        .options(
+            joinedload(models.ScheduledPost.media_post).joinedload(models.MediaPost.account),
+            joinedload(models.ScheduledPost.media_post).joinedload(models.MediaPost.blob)
+        )\
+        .filter(models.ScheduledPost.id == schedule_id)\
+        .first()
+
+def claim_scheduled_post_upload(db: Session, schedule_id: str, lease: timedelta) -> bool:
+    """
+    Take the upload lease on a scheduled post with one conditional UPDATE.
+
+    Account locks only serialize uploads within a process. A post that was
+    re-dispatched after a claim timeout can be delivered twice, possibly to
+    different workers; only the delivery that wins this lease uploads.
+    Leases older than lease (a worker died mid-upload) can be taken over.
+
+    Returns:
+        False if the post was processed, dead-lettered or is being uploaded
+    """
+    now = datetime.utcnow()
+    result = db.execute(
+        update(models.ScheduledPost)
+        .where(models.ScheduledPost.id == schedule_id)
+        .where(models.ScheduledPost.is_processed == False)
+        .where(models.ScheduledPost.dead_lettered_at.is_(None))
+        .where(or_(
+            models.ScheduledPost.upload_started_at.is_(None),
+            models.ScheduledPost.upload_started_at < now - lease
+        ))
+        .values(upload_started_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+def release_scheduled_post_upload(db: Session, schedule_id: str) -> None:
+    """Give up the upload lease after a failed attempt, so a retry can take it."""
+    db.execute(
+        update(models.ScheduledPost)
+        .where(models.ScheduledPost.id == schedule_id)
+        .values(upload_started_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+def mark_scheduled_post_posted(db: Session, schedule_id: str, media_post_id: str) -> None:
+    """Mark the media post POSTED and the schedule processed in one transaction."""
+    db.execute(_media_post_status_update(media_post_id, models.PostStatus.POSTED))
+    db.execute(
+        update(models.ScheduledPost)
+        .where(models.ScheduledPost.id == schedule_id)
+        .values(is_processed=True, processed_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    status_cache.invalidate(media_cache_key(media_post_id), schedule_cache_key(schedule_id))
+
+def increment_scheduled_post_retry(
+    db: Session,
+    schedule_id: str,
+    dispatched_until: Optional[datetime] = None
+) -> Optional[int]:
+    """
+    Bump retry_count with a single UPDATE and return the new value.
+
+    dispatched_until keeps the dispatcher claim alive until the retry runs.
+    """
+    values = {"retry_count": models.ScheduledPost.retry_count + 1}
+    if dispatched_until:
+        values["dispatched_at"] = dispatched_until
+    retry_count = db.execute(
+        update(models.ScheduledPost)
+        .where(models.ScheduledPost.id == schedule_id)
+        .values(**values)
+        .returning(models.ScheduledPost.retry_count)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    db.commit()
+    status_cache.invalidate(schedule_cache_key(schedule_id))
+    return retry_count
+
+def dead_letter_scheduled_post(
+    db: Session,
+    schedule_id: str,
+    media_post_id: str,
+    failure_class: str,
+    error: str
+) -> None:
+    """
+    Fail the media post and park its schedule as a dead letter, in one transaction.
+
+    Dead letters are never claimed by the dispatcher again; they wait for
+    a re-drive through the API.
+    """
+    db.execute(_media_post_status_update(media_post_id, models.PostStatus.FAILED, error))
+    db.execute(
+        update(models.ScheduledPost)
+        .where(models.ScheduledPost.id == schedule_id)
+        .values(dead_lettered_at=datetime.utcnow(), failure_class=failure_class, last_error=error)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    status_cache.invalidate(media_cache_key(media_post_id), schedule_cache_key(schedule_id))
+
+def defer_scheduled_post(db: Session, schedule_id: str, until: datetime, waiting_for_ingest: bool = False) -> None:
+    """
+    Hold the dispatcher claim on a scheduled post until the given time.
+
+    waiting_for_ingest counts the deferral in ingest_deferrals, which
+    bounds how long a post waits for media that never gets stored.
+    """
+    values = {"dispatched_at": until}
+    if waiting_for_ingest:
+        values["ingest_deferrals"] = func.coalesce(models.ScheduledPost.ingest_deferrals, 0) + 1
+    db.execute(
+        update(models.ScheduledPost)
+        .where(models.ScheduledPost.id == schedule_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
 def delete_scheduled_post(db: Session, schedule_id: str) -> bool:
     db_schedule = get_scheduled_post(db, schedule_id)
     if db_schedule:
         db.delete(db_schedule)
         db.commit()
+        status_cache.invalidate(schedule_cache_key(schedule_id))
         return True
     return False
 
@@ -111,4 +467,94 @@ def get_pending_scheduled_posts(db: Session) -> List[models.ScheduledPost]:
     return db.query(models.ScheduledPost)\
         .filter(models.ScheduledPost.is_processed == False)\
         .filter(models.ScheduledPost.scheduled_time <= datetime.utcnow())\
-        .all() 
\ No newline at end of file
+        .all()
+
+def claim_due_scheduled_posts(
+    db: Session,
+    limit: int = 100,
+    claim_timeout: timedelta = timedelta(hours=1),
+    lookahead: timedelta = timedelta(0)
+) -> List[str]:
+    """
+    Claim a batch of due, unprocessed scheduled posts for dispatch.
+
+    Claims are recorded in dispatched_at so concurrent dispatchers never hand
+    out the same row twice. Claims older than claim_timeout are considered
+    lost (e.g. the broker dropped the message) and become claimable again.
+    Posts due within lookahead are claimed early, so they can be queued to
+    run exactly at their scheduled time.
+
+    Returns:
+        IDs of the claimed scheduled posts, oldest first
+    """
+    now = datetime.utcnow()
+    claimable = and_(
+        models.ScheduledPost.is_processed == False,
+        # Dead letters only come back through an explicit re-drive
+        models.ScheduledPost.dead_lettered_at.is_(None),
+        models.ScheduledPost.scheduled_time <= now + lookahead,
+        or_(
+            models.ScheduledPost.dispatched_at.is_(None),
+            models.ScheduledPost.dispatched_at < now - claim_timeout
+        )
+    )
+    due = select(models.ScheduledPost.id)\
+        .where(claimable)\
+        .order_by(models.ScheduledPost.scheduled_time)\
+        .limit(limit)
+
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite has no row locks; its single writer lock makes a
+        # conditional UPDATE ... RETURNING atomic across processes.
+        schedule_ids = db.execute(
+            update(models.ScheduledPost)
+            .where(models.ScheduledPost.id.in_(due.scalar_subquery()))
+            .where(claimable)
+            .values(dispatched_at=now)
+            .returning(models.ScheduledPost.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+    else:
+        schedule_ids = db.execute(due.with_for_update(skip_locked=True)).scalars().all()
+        if schedule_ids:
+            db.execute(
+                update(models.ScheduledPost)
+                .where(models.ScheduledPost.id.in_(schedule_ids))
+                .values(dispatched_at=now)
+                .execution_options(synchronize_session=False)
+            )
+    db.commit()
+    return list(schedule_ids)
+
+def release_scheduled_post_claims(db: Session, schedule_ids: List[str]) -> None:
+    """Make claimed scheduled posts claimable again, e.g. after a failed publish."""
+    if not schedule_ids:
+        return
+    db.execute(
+        update(models.ScheduledPost)
+        .where(models.ScheduledPost.id.in_(schedule_ids))
+        .values(dispatched_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+def get_scheduled_post_routing(db: Session, schedule_ids: Sequence[str]) -> Dict[str, Tuple[str, datetime, int]]:
+    """
+    Look up what the dispatcher needs to route and prioritize scheduled posts.
+
+    Returns:
+        {schedule_id: (account_id, scheduled_time, retry_count)}
+    """
+    if not schedule_ids:
+        return {}
+    rows = db.execute(
+        select(
+            models.ScheduledPost.id,
+            models.MediaPost.account_id,
+            models.ScheduledPost.scheduled_time,
+            models.ScheduledPost.retry_count
+        )
+        .join(models.MediaPost, models.ScheduledPost.media_post_id == models.MediaPost.id)
+        .where(models.ScheduledPost.id.in_(schedule_ids))
+    ).all()
+    return {schedule_id: (account_id, scheduled_time, retry_count or 0) for schedule_id, account_id, scheduled_time, retry_count in rows}
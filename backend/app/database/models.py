@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer, Enum as SQLEnum
+from sqlalchemy import Column, String, Boolean, DateTime, Float, ForeignKey, Index, Integer, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -17,40 +17,91 @@ class InstagramAccount(Base):
     username = Column(String, unique=True, index=True)
     encrypted_credentials = Column(String)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     last_used = Column(DateTime, nullable=True)
 
     # Relationships
     media_posts = relationship("MediaPost", back_populates="account")
 
+class MediaBlob(Base):
+    __tablename__ = "media_blobs"
+
+    sha256 = Column(String, primary_key=True)
+    path = Column(String)
+    size = Column(Integer)
+    content_type = Column(String, nullable=True)
+    source_url = Column(String, index=True)  # first URL the blob was fetched from
+    ref_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)  # quota eviction order
+
+    # Relationships
+    media_posts = relationship("MediaPost", back_populates="blob")
+
 class MediaPost(Base):
     __tablename__ = "media_posts"
+    __table_args__ = (
+        # Keyset listing filtered by account and status, newest first
+        Index("ix_media_posts_account_status_created", "account_id", "status", "created_at"),
+        Index("ix_media_posts_created_at", "created_at"),
+        # Serves cleanup's "posted, not yet purged, older than retention" scan
+        Index("ix_media_posts_cleanup", "status", "purged_at", "posted_at"),
+    )
 
     id = Column(String, primary_key=True)
     source_url = Column(String)
     media_type = Column(String)  # "image", "video", "carousel"
+    file_size = Column(Integer, nullable=True)  # bytes of the downloaded media
     caption = Column(String, nullable=True)
     account_id = Column(String, ForeignKey("instagram_accounts.id"))
     status = Column(SQLEnum(PostStatus), default=PostStatus.PENDING)
     created_at = Column(DateTime, default=datetime.utcnow)
     posted_at = Column(DateTime, nullable=True)
     error_message = Column(String, nullable=True)
+    blob_sha256 = Column(String, ForeignKey("media_blobs.sha256"), nullable=True, index=True)
+    purged_at = Column(DateTime, nullable=True)  # when cleanup or eviction dropped the file
+
+    # Upload-ready file produced by the preparation stage
+    prepared_path = Column(String, nullable=True)
+    prepared_thumbnail_path = Column(String, nullable=True)  # video cover frame
+    prepared_at = Column(DateTime, nullable=True)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    duration = Column(Float, nullable=True)  # seconds, videos only
 
     # Relationships
     account = relationship("InstagramAccount", back_populates="media_posts")
     scheduled_posts = relationship("ScheduledPost", back_populates="media_post")
+    blob = relationship("MediaBlob", back_populates="media_posts")
+
+    @property
+    def local_path(self):
+        """Path of the stored media file, if it has been downloaded."""
+        return self.blob.path if self.blob else None
 
 class ScheduledPost(Base):
     __tablename__ = "scheduled_posts"
+    __table_args__ = (
+        # Serves the dispatcher's "due and unprocessed" scan
+        Index("ix_scheduled_posts_due", "is_processed", "scheduled_time"),
+        # Serves the dead-letter listing and re-drive
+        Index("ix_scheduled_posts_dead_letter", "dead_lettered_at", "id"),
+    )
 
     id = Column(String, primary_key=True)
     media_post_id = Column(String, ForeignKey("media_posts.id"))
-    scheduled_time = Column(DateTime)
+    scheduled_time = Column(DateTime, index=True)
     is_processed = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     processed_at = Column(DateTime, nullable=True)
     retry_count = Column(Integer, default=0)
     max_retries = Column(Integer, default=3)
+    dispatched_at = Column(DateTime, nullable=True)  # when a dispatcher last claimed it
+    dead_lettered_at = Column(DateTime, nullable=True)  # set when it failed for good; never claimed again
+    failure_class = Column(String, nullable=True)  # see app.utils.failures
+    last_error = Column(String, nullable=True)
+    upload_started_at = Column(DateTime, nullable=True)  # lease held by the delivery uploading it
+    ingest_deferrals = Column(Integer, default=0)  # times it came due before its media was stored
 
     # Relationships
     media_post = relationship("MediaPost", back_populates="scheduled_posts") 
\ No newline at end of file
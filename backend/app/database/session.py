@@ -1,14 +1,168 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
+from typing import AsyncIterator, Dict
+import threading
+import time
 from ..config import settings
 
-# Create SQLAlchemy engine
-engine = create_engine(settings.DATABASE_URL)
+# Async drivers used by the API for each sync URL scheme
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url(database_url: str) -> str:
+    """Map a sync DATABASE_URL onto its async driver."""
+    scheme, sep, rest = database_url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+class PoolStats:
+    def __init__(self):
+        """Counters for how long callers wait to check a connection out."""
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self, pool) -> Dict:
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
+
+class _CheckoutTimingMixin:
+    stats: PoolStats = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() builds a fresh pool; keep counting into the same stats
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+def _is_sqlite(database_url: str) -> bool:
+    return database_url.startswith("sqlite")
+
+def _engine_options(database_url: str, is_async: bool = False) -> Dict:
+    """Build pool and connect options for an engine from settings."""
+    if _is_sqlite(database_url):
+        options = {
+            "connect_args": {
+                # The API and its threadpool share connections across threads
+                "check_same_thread": False,
+                "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000,
+            }
+        }
+        if ":memory:" in database_url or database_url.rstrip("/").endswith(":"):
+            # In-memory databases keep SQLAlchemy's single-connection pools
+            return options
+    else:
+        options = {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+            "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        }
+        if database_url.startswith("postgresql"):
+            if is_async:
+                options["connect_args"] = {
+                    "server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+                }
+            else:
+                options["connect_args"] = {
+                    "options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+                }
+
+    options["poolclass"] = InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool
+    return options
+
+def _enable_sqlite_profile(sync_engine):
+    """Tune every new SQLite connection for concurrent API and worker access."""
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers proceed while the worker holds the write lock
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+def _attach_stats(sync_engine) -> PoolStats:
+    stats = PoolStats()
+    if isinstance(sync_engine.pool, _CheckoutTimingMixin):
+        sync_engine.pool.stats = stats
+    return stats
+
+# Create SQLAlchemy engine (Celery workers and scripts)
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL))
+
+# Async engine for the API so queries don't block the event loop
+async_engine = create_async_engine(
+    get_async_database_url(settings.DATABASE_URL),
+    **_engine_options(settings.DATABASE_URL, is_async=True)
+)
+
+if _is_sqlite(settings.DATABASE_URL):
+    _enable_sqlite_profile(engine)
+    _enable_sqlite_profile(async_engine.sync_engine)
+
+_pool_stats = {
+    "sync": _attach_stats(engine),
+    "async": _attach_stats(async_engine.sync_engine),
+}
+
+def get_pool_stats() -> Dict[str, Dict]:
+    """Return checkout wait and in-use counts for the sync and async pools."""
+    pools = {"sync": engine.pool, "async": async_engine.sync_engine.pool}
+    return {
+        name: _pool_stats[name].snapshot(pool)
+        for name, pool in pools.items()
+        if isinstance(pool, _CheckoutTimingMixin)
+    }
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Objects stay usable after commit; async sessions cannot lazily reload them
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Create Base class for models
 Base = declarative_base()
 
@@ -18,4 +172,9 @@ def get_db() -> Session:
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+# Dependency to get async DB session
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,11 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from .routes import accounts, media, scheduler
-from .database.session import engine
-from .database import models
-
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+from functools import partial
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from .routes import accounts, events, media, scheduler
+from .database.session import get_pool_stats
+from .utils.cache import status_cache
+from .utils.events import event_broadcaster, event_bus
+from .utils.lanes import lane_stats
+from .utils.metrics import QueueDepthCollector, scrape_registry
+from .tasks.celery_app import celery_app
+from .tasks.routing import broker_queue_depths, lane_backlog, shard_coverage
+import asyncio
 
 app = FastAPI(
     title="Instagram Reposter API",
@@ -13,6 +19,9 @@ app = FastAPI(
     version="1.0.0"
 )
 
+metrics_registry = scrape_registry()
+metrics_registry.register(QueueDepthCollector(partial(broker_queue_depths, celery_app)))
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -22,10 +31,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup():
+    """Start relaying status events from the workers."""
+    if event_bus is not None:
+        app.state.event_relay = asyncio.create_task(event_bus.listen(event_broadcaster))
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop relaying status events."""
+    event_relay = getattr(app.state, "event_relay", None)
+    if event_relay is not None:
+        event_relay.cancel()
+
 # Include routers
 app.include_router(accounts.router, prefix="/api/accounts", tags=["accounts"])
 app.include_router(media.router, prefix="/api/media", tags=["media"])
 app.include_router(scheduler.router, prefix="/api/scheduler", tags=["scheduler"])
+app.include_router(events.router, prefix="/api/events", tags=["events"])
 
 @app.get("/")
 async def read_root():
@@ -40,3 +63,36 @@ async def read_root():
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
+
+@app.get("/health/db")
+async def database_health():
+    """Connection pool usage for sizing workers against the database."""
+    return {"pools": get_pool_stats()}
+
+@app.get("/health/cache")
+async def cache_health():
+    """Hit and miss counters of the status read cache."""
+    return status_cache.stats()
+
+@app.get("/health/queues")
+async def queue_health():
+    """Backlog and on-time rate of each priority lane, and account shards without a consumer."""
+    try:
+        backlog = await run_in_threadpool(lane_backlog, celery_app)
+    except Exception as e:
+        backlog = {"error": str(e)}
+    try:
+        lanes = await run_in_threadpool(lane_stats.snapshot)
+    except Exception as e:
+        lanes = {"error": str(e)}
+    try:
+        shards = await run_in_threadpool(shard_coverage, celery_app)
+    except Exception as e:
+        shards = {"error": str(e)}
+    return {"backlog": backlog, "lanes": lanes, "shards": shards}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics, including the depth of every Celery queue."""
+    body = await run_in_threadpool(generate_latest, metrics_registry)
+    return Response(content=body, media_type=CONTENT_TYPE_LATEST)
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
-from sqlalchemy.orm import Session
-from ..database import crud, models
-from ..database.session import get_db
-from ..utils.encryption import encryption_manager
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from ..database import async_crud, models
+from ..database.session import get_async_db
+from ..utils.encryption import encrypt_credentials
+from ..utils.rate_limiter import instagram_rate_limiter
+from ..utils.pagination import encode_cursor, decode_cursor
 import uuid
 
 router = APIRouter()
@@ -21,19 +24,32 @@ class InstagramAccountResponse(BaseModel):
     created_at: datetime
     last_used: Optional[datetime]
 
+class InstagramAccountPage(BaseModel):
+    items: List[InstagramAccountResponse]
+    next_cursor: Optional[str]
+
+class RateLimitResponse(BaseModel):
+    account_id: str
+    remaining: float
+    capacity: int
+    next_available_at: datetime
+
 @router.post("/", response_model=InstagramAccountResponse)
-async def create_account(account: InstagramAccountCreate, db: Session = Depends(get_db)):
+async def create_account(account: InstagramAccountCreate, db: AsyncSession = Depends(get_async_db)):
     """Add a new Instagram account."""
     try:
-        # Encrypt the password
-        encrypted_password = encryption_manager.encrypt(account.password)
+        # Encrypt the credentials in the format the workers decrypt
+        encrypted_credentials = encrypt_credentials({
+            "username": account.username,
+            "password": account.password
+        })
         
         # Create new account
-        db_account = crud.create_instagram_account(
+        db_account = await async_crud.create_instagram_account(
             db,
             account_id=str(uuid.uuid4()),
             username=account.username,
-            encrypted_credentials=encrypted_password
+            encrypted_credentials=encrypted_credentials
         )
         
         return InstagramAccountResponse(
@@ -49,40 +65,67 @@ async def create_account(account: InstagramAccountCreate, db: Session = Depends(
             detail=f"Failed to create account: {str(e)}"
         )
 
-@router.get("/", response_model=List[InstagramAccountResponse])
-async def list_accounts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """List all Instagram accounts."""
-    accounts = crud.get_instagram_accounts(db, skip=skip, limit=limit)
-    return [
-        InstagramAccountResponse(
-            id=account.id,
-            username=account.username,
-            is_active=account.is_active,
-            created_at=account.created_at,
-            last_used=account.last_used
-        )
-        for account in accounts
-    ]
+@router.get("/", response_model=InstagramAccountPage)
+async def list_accounts(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List Instagram accounts, oldest first, using keyset pagination."""
+    try:
+        after = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    accounts, next_key = await async_crud.get_instagram_accounts(db, limit=limit, after=after)
+    return InstagramAccountPage(
+        items=[
+            InstagramAccountResponse(
+                id=account.id,
+                username=account.username,
+                is_active=account.is_active,
+                created_at=account.created_at,
+                last_used=account.last_used
+            )
+            for account in accounts
+        ],
+        next_cursor=encode_cursor(*next_key) if next_key else None
+    )
 
 @router.delete("/{account_id}")
-async def delete_account(account_id: str, db: Session = Depends(get_db)):
+async def delete_account(account_id: str, db: AsyncSession = Depends(get_async_db)):
     """Delete an Instagram account."""
-    if crud.delete_instagram_account(db, account_id):
+    if await async_crud.delete_instagram_account(db, account_id):
         return {"message": f"Account {account_id} deleted successfully"}
     raise HTTPException(status_code=404, detail="Account not found")
 
+@router.get("/{account_id}/rate-limit", response_model=RateLimitResponse)
+async def get_account_rate_limit(account_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Get the remaining Instagram call budget of an account."""
+    if not await async_crud.get_instagram_account(db, account_id):
+        raise HTTPException(status_code=404, detail="Account not found")
+
+    # The Redis-backed limiter does blocking I/O
+    status = await run_in_threadpool(instagram_rate_limiter.status, account_id)
+    return RateLimitResponse(
+        account_id=account_id,
+        remaining=status.remaining,
+        capacity=status.capacity,
+        next_available_at=status.next_available_at
+    )
+
 @router.put("/{account_id}/activate")
-async def activate_account(account_id: str, db: Session = Depends(get_db)):
+async def activate_account(account_id: str, db: AsyncSession = Depends(get_async_db)):
     """Activate an Instagram account."""
-    account = crud.update_instagram_account(db, account_id, is_active=True)
+    account = await async_crud.update_instagram_account(db, account_id, is_active=True)
     if account:
         return {"message": f"Account {account_id} activated"}
     raise HTTPException(status_code=404, detail="Account not found")
 
 @router.put("/{account_id}/deactivate")
-async def deactivate_account(account_id: str, db: Session = Depends(get_db)):
+async def deactivate_account(account_id: str, db: AsyncSession = Depends(get_async_db)):
     """Deactivate an Instagram account."""
-    account = crud.update_instagram_account(db, account_id, is_active=False)
+    account = await async_crud.update_instagram_account(db, account_id, is_active=False)
     if account:
         return {"message": f"Account {account_id} deactivated"}
     raise HTTPException(status_code=404, detail="Account not found")
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
+from ..config import settings
+from ..utils.events import event_broadcaster
+
+router = APIRouter()
+
+@router.get("/stream")
+async def stream_status_events(
+    request: Request,
+    account_id: Optional[str] = None,
+    post_id: Optional[str] = None
+):
+    """
+    Stream status transitions as server-sent events.
+
+    Filter by account_id, or by post_id (a media post or schedule ID).
+    """
+    subscription = event_broadcaster.subscribe(account_id=account_id, post_id=post_id)
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(),
+                        timeout=settings.EVENTS_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing idle streams
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event.type}\ndata: {event.to_json()}\n\n"
+        finally:
+            event_broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
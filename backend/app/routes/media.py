@@ -1,13 +1,20 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
 from pydantic import BaseModel, HttpUrl
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
-from sqlalchemy.orm import Session
-from ..database import crud, models
-from ..database.session import get_db
-from ..utils.downloader import media_downloader
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import async_crud, models
+from ..database.session import get_async_db
+from ..utils.pagination import encode_cursor, decode_cursor
+from ..utils.cache import status_cache, media_cache_key, etag_response
+from ..utils.timestamps import naive_utc
+from ..tasks.celery_app import INGEST_MEDIA_POST, celery_app
+from starlette.concurrency import run_in_threadpool
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 class MediaDownloadRequest(BaseModel):
@@ -24,48 +31,46 @@ class MediaPostResponse(BaseModel):
     created_at: datetime
     posted_at: Optional[datetime]
     error_message: Optional[str]
+    prepared_at: Optional[datetime] = None  # set once an upload-ready file exists
+    file_size: Optional[int] = None
+
+class MediaPostPage(BaseModel):
+    items: List[MediaPostResponse]
+    next_cursor: Optional[str]
 
-@router.post("/download", response_model=MediaPostResponse)
+@router.post("/download", response_model=MediaPostResponse, status_code=202)
 async def download_media(
     request: MediaDownloadRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Download media from Instagram URL."""
+    """Queue media from an Instagram URL for download; poll or subscribe for progress."""
     try:
-        # Process the download
-        result = await media_downloader.process_instagram_url(
-            url=request.url,
+        media_post = await async_crud.create_media_post(
+            db,
+            post_id=str(uuid.uuid4()),
+            source_url=str(request.url),
             account_id=request.account_id,
             caption=request.caption
         )
-        
-        # Get the created media post
-        media_post = crud.get_media_post(db, result["media_post_id"])
-        
-        return MediaPostResponse(
-            id=media_post.id,
-            source_url=media_post.source_url,
-            media_type=media_post.media_type,
-            caption=media_post.caption,
-            status=media_post.status,
-            created_at=media_post.created_at,
-            posted_at=media_post.posted_at,
-            error_message=media_post.error_message
-        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to process media download: {str(e)}"
         )
 
-@router.get("/{media_id}", response_model=MediaPostResponse)
-async def get_media_status(media_id: str, db: Session = Depends(get_db)):
-    """Get status of a media post."""
-    media_post = crud.get_media_post(db, media_id)
-    if not media_post:
-        raise HTTPException(status_code=404, detail="Media not found")
-    
+    # The ingest workers download, inspect and prepare the media
+    try:
+        await run_in_threadpool(celery_app.send_task, INGEST_MEDIA_POST, args=[media_post.id])
+    except Exception as e:
+        logger.error(f"Failed to queue download for media {media_post.id}: {str(e)}")
+        await async_crud.update_media_post_status(
+            db,
+            post_id=media_post.id,
+            status=models.PostStatus.FAILED,
+            error_message="Could not queue download"
+        )
+        raise HTTPException(status_code=503, detail="Download queue unavailable")
+
     return MediaPostResponse(
         id=media_post.id,
         source_url=media_post.source_url,
@@ -74,5 +79,82 @@ async def get_media_status(media_id: str, db: Session = Depends(get_db)):
         status=media_post.status,
         created_at=media_post.created_at,
         posted_at=media_post.posted_at,
-        error_message=media_post.error_message
+        error_message=media_post.error_message,
+        prepared_at=media_post.prepared_at,
+        file_size=media_post.file_size
     )
+
+@router.get("/", response_model=MediaPostPage)
+async def list_media(
+    account_id: Optional[str] = None,
+    status: Optional[models.PostStatus] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List media posts, newest first, using keyset pagination."""
+    try:
+        after = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media_posts, next_key = await async_crud.list_media_posts(
+        db,
+        limit=limit,
+        after=after,
+        account_id=account_id,
+        status=status,
+        created_after=naive_utc(created_after),
+        created_before=naive_utc(created_before)
+    )
+    return MediaPostPage(
+        items=[
+            MediaPostResponse(
+                id=media_post.id,
+                source_url=media_post.source_url,
+                media_type=media_post.media_type,
+                caption=media_post.caption,
+                status=media_post.status,
+                created_at=media_post.created_at,
+                posted_at=media_post.posted_at,
+                error_message=media_post.error_message,
+                prepared_at=media_post.prepared_at,
+                file_size=media_post.file_size
+            )
+            for media_post in media_posts
+        ],
+        next_cursor=encode_cursor(*next_key) if next_key else None
+    )
+
+@router.get("/{media_id}", response_model=MediaPostResponse)
+async def get_media_status(
+    media_id: str,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get status of a media post."""
+    # Cache hits answer without touching the database or re-serializing;
+    # Redis calls are blocking, so they run off the event loop
+    cached, generation = await run_in_threadpool(status_cache.get, media_cache_key(media_id))
+    if cached is None:
+        media_post = await async_crud.get_media_post(db, media_id)
+        if not media_post:
+            raise HTTPException(status_code=404, detail="Media not found")
+        
+        body = MediaPostResponse(
+            id=media_post.id,
+            source_url=media_post.source_url,
+            media_type=media_post.media_type,
+            caption=media_post.caption,
+            status=media_post.status,
+            created_at=media_post.created_at,
+            posted_at=media_post.posted_at,
+            error_message=media_post.error_message,
+            prepared_at=media_post.prepared_at,
+            file_size=media_post.file_size
+        ).model_dump_json().encode()
+        cached = await run_in_threadpool(status_cache.put, media_cache_key(media_id), body, generation)
+    
+    return etag_response(cached, if_none_match)
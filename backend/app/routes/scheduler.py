@@ -1,19 +1,30 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from pydantic import BaseModel, field_validator
+from typing import List, Optional
 from datetime import datetime
-from sqlalchemy.orm import Session
-from ..database import crud, models
-from ..database.session import get_db
-from ..tasks.instagram_tasks import process_scheduled_post
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from ..database import async_crud, models
+from ..database.session import get_async_db
+from ..config import settings
+from ..utils.pagination import encode_cursor, decode_cursor
+from ..utils.cache import status_cache, schedule_cache_key, etag_response
+from ..utils.failures import FAILURE_CLASSES
+from ..utils.timestamps import naive_utc
+from ..tasks.celery_app import INGEST_MEDIA_POST, celery_app
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 class SchedulePostRequest(BaseModel):
     media_post_id: str
     scheduled_time: datetime
 
+    _naive_scheduled_time = field_validator("scheduled_time")(naive_utc)
+
 class ScheduledPostResponse(BaseModel):
     id: str
     media_post_id: str
@@ -22,25 +33,70 @@ class ScheduledPostResponse(BaseModel):
     created_at: datetime
     processed_at: Optional[datetime]
     retry_count: int
+    dead_lettered_at: Optional[datetime] = None  # set once it failed for good
+    failure_class: Optional[str] = None  # "transient", "throttled", "auth" or "permanent"
+
+class ScheduledPostPage(BaseModel):
+    items: List[ScheduledPostResponse]
+    next_cursor: Optional[str]
+
+class BulkScheduleRequest(BaseModel):
+    items: List[SchedulePostRequest]
+
+class BulkScheduleItemResult(BaseModel):
+    index: int
+    id: Optional[str] = None
+    media_post_id: str
+    scheduled_time: datetime
+    status: str  # "scheduled" or "rejected"
+    error: Optional[str] = None
+
+class BulkScheduleResponse(BaseModel):
+    scheduled: int
+    rejected: int
+    results: List[BulkScheduleItemResult]
+
+class DeadLetterResponse(BaseModel):
+    id: str
+    media_post_id: str
+    account_id: Optional[str]
+    scheduled_time: datetime
+    retry_count: int
+    dead_lettered_at: datetime
+    failure_class: Optional[str]
+    last_error: Optional[str]
+
+class DeadLetterPage(BaseModel):
+    items: List[DeadLetterResponse]
+    next_cursor: Optional[str]
+
+class RedriveRequest(BaseModel):
+    # Needs schedule_ids or all=true; the filters narrow either
+    schedule_ids: Optional[List[str]] = None
+    all: bool = False
+    failure_class: Optional[str] = None
+    account_id: Optional[str] = None
+
+class RedriveResponse(BaseModel):
+    redriven: int
+    schedule_ids: List[str]
+    # Matching dead letters whose account must be reactivated first
+    skipped_inactive_account: List[str] = []
+    # Media posts of re-driven schedules sent to ingest again
+    reingesting: List[str] = []
 
 @router.post("/schedule", response_model=ScheduledPostResponse)
-async def schedule_post(request: SchedulePostRequest, db: Session = Depends(get_db)):
+async def schedule_post(request: SchedulePostRequest, db: AsyncSession = Depends(get_async_db)):
     """Schedule a post for later."""
     try:
-        # Create scheduled post
-        scheduled_post = crud.create_scheduled_post(
+        # The due-post dispatcher enqueues it once scheduled_time is reached
+        scheduled_post = await async_crud.create_scheduled_post(
             db=db,
             schedule_id=str(uuid.uuid4()),
             media_post_id=request.media_post_id,
             scheduled_time=request.scheduled_time
         )
         
-        # Schedule Celery task
-        process_scheduled_post.apply_async(
-            args=[scheduled_post.id],
-            eta=scheduled_post.scheduled_time
-        )
-        
         return ScheduledPostResponse(
             id=scheduled_post.id,
             media_post_id=scheduled_post.media_post_id,
@@ -56,26 +112,225 @@ async def schedule_post(request: SchedulePostRequest, db: Session = Depends(get_
             detail=f"Failed to schedule post: {str(e)}"
         )
 
+@router.get("/schedule", response_model=ScheduledPostPage)
+async def list_scheduled_posts(
+    account_id: Optional[str] = None,
+    is_processed: Optional[bool] = None,
+    scheduled_after: Optional[datetime] = None,
+    scheduled_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List scheduled posts by scheduled time using keyset pagination."""
+    try:
+        after = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    scheduled_posts, next_key = await async_crud.list_scheduled_posts(
+        db,
+        limit=limit,
+        after=after,
+        account_id=account_id,
+        is_processed=is_processed,
+        scheduled_after=naive_utc(scheduled_after),
+        scheduled_before=naive_utc(scheduled_before)
+    )
+    return ScheduledPostPage(
+        items=[
+            ScheduledPostResponse(
+                id=scheduled_post.id,
+                media_post_id=scheduled_post.media_post_id,
+                scheduled_time=scheduled_post.scheduled_time,
+                is_processed=scheduled_post.is_processed,
+                created_at=scheduled_post.created_at,
+                processed_at=scheduled_post.processed_at,
+                retry_count=scheduled_post.retry_count,
+                dead_lettered_at=scheduled_post.dead_lettered_at,
+                failure_class=scheduled_post.failure_class
+            )
+            for scheduled_post in scheduled_posts
+        ],
+        next_cursor=encode_cursor(*next_key) if next_key else None
+    )
+
+@router.post("/schedule/bulk", response_model=BulkScheduleResponse)
+async def schedule_posts_bulk(request: BulkScheduleRequest, db: AsyncSession = Depends(get_async_db)):
+    """Schedule many posts in one transaction."""
+    if len(request.items) > settings.BULK_SCHEDULE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.BULK_SCHEDULE_MAX_ITEMS} items per bulk request"
+        )
+
+    existing_ids = await async_crud.get_existing_media_post_ids(
+        db, (item.media_post_id for item in request.items)
+    )
+
+    now = datetime.utcnow()
+    results = []
+    rows = []
+    for index, item in enumerate(request.items):
+        if item.media_post_id not in existing_ids:
+            results.append(BulkScheduleItemResult(
+                index=index,
+                media_post_id=item.media_post_id,
+                scheduled_time=item.scheduled_time,
+                status="rejected",
+                error="Media post not found"
+            ))
+            continue
+
+        schedule_id = str(uuid.uuid4())
+        rows.append({
+            "id": schedule_id,
+            "media_post_id": item.media_post_id,
+            "scheduled_time": item.scheduled_time,
+            "is_processed": False,
+            "created_at": now,
+            "retry_count": 0,
+        })
+        results.append(BulkScheduleItemResult(
+            index=index,
+            id=schedule_id,
+            media_post_id=item.media_post_id,
+            scheduled_time=item.scheduled_time,
+            status="scheduled"
+        ))
+
+    try:
+        await async_crud.bulk_create_scheduled_posts(db, rows)
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to schedule posts: {str(e)}"
+        )
+
+    return BulkScheduleResponse(
+        scheduled=len(rows),
+        rejected=len(request.items) - len(rows),
+        results=results
+    )
+
 @router.delete("/schedule/{schedule_id}")
-async def cancel_scheduled_post(schedule_id: str, db: Session = Depends(get_db)):
+async def cancel_scheduled_post(schedule_id: str, db: AsyncSession = Depends(get_async_db)):
     """Cancel a scheduled post."""
-    if crud.delete_scheduled_post(db, schedule_id):
+    if await async_crud.delete_scheduled_post(db, schedule_id):
         return {"message": f"Scheduled post {schedule_id} cancelled"}
     raise HTTPException(status_code=404, detail="Scheduled post not found")
 
 @router.get("/schedule/{schedule_id}", response_model=ScheduledPostResponse)
-async def get_schedule_status(schedule_id: str, db: Session = Depends(get_db)):
+async def get_schedule_status(
+    schedule_id: str,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get status of a scheduled post."""
-    scheduled_post = crud.get_scheduled_post(db, schedule_id)
-    if not scheduled_post:
-        raise HTTPException(status_code=404, detail="Scheduled post not found")
+    # Cache hits answer without touching the database or re-serializing;
+    # Redis calls are blocking, so they run off the event loop
+    cached, generation = await run_in_threadpool(status_cache.get, schedule_cache_key(schedule_id))
+    if cached is None:
+        scheduled_post = await async_crud.get_scheduled_post(db, schedule_id)
+        if not scheduled_post:
+            raise HTTPException(status_code=404, detail="Scheduled post not found")
+        
+        body = ScheduledPostResponse(
+            id=scheduled_post.id,
+            media_post_id=scheduled_post.media_post_id,
+            scheduled_time=scheduled_post.scheduled_time,
+            is_processed=scheduled_post.is_processed,
+            created_at=scheduled_post.created_at,
+            processed_at=scheduled_post.processed_at,
+            retry_count=scheduled_post.retry_count,
+            dead_lettered_at=scheduled_post.dead_lettered_at,
+            failure_class=scheduled_post.failure_class
+        ).model_dump_json().encode()
+        cached = await run_in_threadpool(status_cache.put, schedule_cache_key(schedule_id), body, generation)
     
-    return ScheduledPostResponse(
-        id=scheduled_post.id,
-        media_post_id=scheduled_post.media_post_id,
-        scheduled_time=scheduled_post.scheduled_time,
-        is_processed=scheduled_post.is_processed,
-        created_at=scheduled_post.created_at,
-        processed_at=scheduled_post.processed_at,
-        retry_count=scheduled_post.retry_count
+    return etag_response(cached, if_none_match)
+
+@router.get("/dead-letters", response_model=DeadLetterPage)
+async def list_dead_letters(
+    failure_class: Optional[str] = None,
+    account_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List scheduled posts that failed for good, oldest failure first."""
+    try:
+        after = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if failure_class and failure_class not in FAILURE_CLASSES:
+        raise HTTPException(status_code=400, detail=f"Unknown failure class {failure_class}")
+
+    dead_letters, next_key = await async_crud.list_dead_letters(
+        db,
+        limit=limit,
+        after=after,
+        failure_class=failure_class,
+        account_id=account_id
+    )
+    return DeadLetterPage(
+        items=[
+            DeadLetterResponse(
+                id=dead_letter.id,
+                media_post_id=dead_letter.media_post_id,
+                account_id=dead_letter.media_post.account_id if dead_letter.media_post else None,
+                scheduled_time=dead_letter.scheduled_time,
+                retry_count=dead_letter.retry_count,
+                dead_lettered_at=dead_letter.dead_lettered_at,
+                failure_class=dead_letter.failure_class,
+                last_error=dead_letter.last_error
+            )
+            for dead_letter in dead_letters
+        ],
+        next_cursor=encode_cursor(*next_key) if next_key else None
+    )
+
+@router.post("/dead-letters/redrive", response_model=RedriveResponse)
+async def redrive_dead_letters(request: RedriveRequest, db: AsyncSession = Depends(get_async_db)):
+    """Put dead letters back in line with a fresh retry budget."""
+    if request.schedule_ids is not None and len(request.schedule_ids) > settings.REDRIVE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.REDRIVE_MAX_ITEMS} schedule IDs per re-drive"
+        )
+    if request.schedule_ids is None and not request.all:
+        raise HTTPException(status_code=400, detail="Pass schedule_ids, or all=true to re-drive every matching dead letter")
+    if request.failure_class and request.failure_class not in FAILURE_CLASSES:
+        raise HTTPException(status_code=400, detail=f"Unknown failure class {request.failure_class}")
+
+    try:
+        schedule_ids, skipped, unstored = await async_crud.redrive_dead_letters(
+            db,
+            limit=settings.REDRIVE_MAX_ITEMS,
+            schedule_ids=request.schedule_ids,
+            failure_class=request.failure_class,
+            account_id=request.account_id
+        )
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to re-drive dead letters: {str(e)}"
+        )
+
+    # Media that failed to ingest or was purged has nothing to upload;
+    # without a new download the posts would only wait and dead-letter again
+    reingesting = []
+    for media_post_id in unstored:
+        try:
+            await run_in_threadpool(celery_app.send_task, INGEST_MEDIA_POST, args=[media_post_id])
+            reingesting.append(media_post_id)
+        except Exception as e:
+            logger.error(f"Failed to queue download for re-driven media {media_post_id}: {str(e)}")
+    return RedriveResponse(
+        redriven=len(schedule_ids),
+        schedule_ids=schedule_ids,
+        skipped_inactive_account=skipped,
+        reingesting=reingesting
     )
@@ -0,0 +1,12 @@
+from celery import Celery
+
+# Task names, so the API can publish without importing the task code
+# (and instagrapi, Pillow and the media pipeline behind it)
+INGEST_MEDIA_POST = "app.tasks.instagram_tasks.ingest_media_post"
+
+# Initialize Celery
+celery_app = Celery('instagram_tasks')
+celery_app.config_from_object('celeryconfig')
+
+# Registers the account-shard router and worker queue subscription
+from . import routing  # noqa: E402,F401
@@ -0,0 +1,27 @@
+import logging
+import os
+
+from celery.signals import worker_init, worker_process_shutdown
+
+from ..config import settings
+from ..utils.metrics import start_exporter
+
+logger = logging.getLogger(__name__)
+
+@worker_init.connect
+def start_worker_exporter(sender=None, **kwargs):
+    # Runs once in the main worker process; prefork children report through
+    # PROMETHEUS_MULTIPROC_DIR, thread-pool workers share the process registry
+    if not settings.WORKER_METRICS_PORT:
+        return
+    try:
+        start_exporter(settings.WORKER_METRICS_PORT)
+    except OSError as e:
+        logger.error(f"Failed to start metrics exporter on port {settings.WORKER_METRICS_PORT}: {str(e)}")
+
+@worker_process_shutdown.connect
+def mark_process_dead(pid=None, **kwargs):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid or os.getpid())
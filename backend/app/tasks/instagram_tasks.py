@@ -1,114 +1,547 @@
-from celery import Celery
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from ..database import crud, models
 from ..database.session import SessionLocal
-from ..utils.instagram import InstagramClient
-from ..utils.encryption import decrypt_credentials
+from ..utils.sessions import session_manager
+from ..utils.background_loop import background_loop
+from ..utils.downloader import media_downloader
+from ..utils.media_sniff import UnsupportedMediaError
+from ..utils.media_prep import MediaNotStoredError, MediaPreparationError, media_preparer
+from ..utils.encryption import decrypt_credentials, get_fernet
+from ..utils.rate_limiter import RateLimitExceeded
+from ..utils.events import StatusEvent, publish_status_event
+from ..utils.failures import AUTH, RETRYABLE, AccountDisabledError, classify_failure, retry_delay
+from ..utils.lanes import LANE_DUE, LANE_RETRY, PRIORITY_RETRY, lane_stats, post_priority
+from ..utils.metrics import observe_post_failure, observe_schedule_lag
+from ..config import settings
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from celery.signals import worker_init
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Celery
-celery_app = Celery('instagram_tasks')
-celery_app.config_from_object('celeryconfig')
+# Shared with the API, which publishes tasks by name
+from .celery_app import celery_app  # noqa: E402
+# Starts the worker's metrics endpoint
+from . import exporter  # noqa: E402,F401
+
+@worker_init.connect
+def check_encryption_key(sender=None, **kwargs):
+    # Without a usable key every login fails; refuse to start instead of
+    # dead-lettering every due post. Celery only logs handler exceptions,
+    # so exit explicitly
+    try:
+        get_fernet()
+    except Exception as e:
+        raise SystemExit(f"Cannot start worker: {str(e)}")
 
 @celery_app.task(bind=True, max_retries=3)
-def process_scheduled_post(self, schedule_id: str):
-    """Process a scheduled post and upload it to Instagram."""
+def process_scheduled_post(self, schedule_id: str, account_id: Optional[str] = None):
+    """
+    Process a scheduled post and upload it to Instagram.
+
+    account_id is only used to route the task to its account's shard
+    queue; the account is always read from the database.
+    """
     db = SessionLocal()
+    media_post_id = None
+    max_retries = None
+    retry_count = 0
+    scheduled_time = None
+    lane = LANE_DUE
+    uploading = False
     try:
-        # Get scheduled post
-        scheduled_post = crud.get_scheduled_post(db, schedule_id)
+        # Load schedule, media post, blob and account in one round-trip
+        scheduled_post = crud.get_scheduled_post_for_processing(db, schedule_id)
         if not scheduled_post:
             logger.error(f"Scheduled post {schedule_id} not found")
             return
+        if scheduled_post.is_processed:
+            logger.info(f"Scheduled post {schedule_id} already processed, skipping")
+            return
+        if scheduled_post.dead_lettered_at:
+            logger.info(f"Scheduled post {schedule_id} is a dead letter, skipping")
+            return
+        
+        # Plain copies survive commits and rollbacks without reloading rows
+        media_post_id = scheduled_post.media_post_id
+        max_retries = scheduled_post.max_retries
+        retry_count = scheduled_post.retry_count or 0
+        scheduled_time = scheduled_post.scheduled_time
+        priority = (self.request.delivery_info or {}).get("priority")
+        if priority is None:
+            priority = post_priority(scheduled_time, datetime.utcnow(), scheduled_post.retry_count or self.request.retries)
+        lane = LANE_RETRY if priority >= PRIORITY_RETRY else LANE_DUE
+        if scheduled_post.media_post:
+            account_id = scheduled_post.media_post.account_id
         
-        # Get media post
-        media_post = crud.get_media_post(db, scheduled_post.media_post_id)
+        media_post = scheduled_post.media_post
         if not media_post:
-            logger.error(f"Media post {scheduled_post.media_post_id} not found")
+            logger.error(f"Media post {media_post_id} not found")
             return
         
-        # Get Instagram account
-        account = crud.get_instagram_account(db, media_post.account_id)
+        account = media_post.account
         if not account:
             logger.error(f"Instagram account {media_post.account_id} not found")
             return
+        if not account.is_active:
+            # Fails as an auth error below, without a doomed login attempt
+            raise AccountDisabledError(f"Instagram account {account.id} is deactivated")
+        if media_post.status == models.PostStatus.FAILED:
+            # Ingest or preparation already rejected the media
+            raise MediaPreparationError(media_post.error_message or f"Media {media_post_id} failed to ingest")
+        prepared = media_post.prepared_path and os.path.exists(media_post.prepared_path)
+        if not media_post.blob_sha256 and not prepared:
+            # Due before its media was stored; wait for ingest without spending a retry
+            deferrals = scheduled_post.ingest_deferrals or 0
+            if deferrals >= settings.INGEST_WAIT_MAX_DEFERRALS:
+                raise MediaPreparationError(
+                    f"Media {media_post_id} was still not stored after waiting "
+                    f"{deferrals * settings.INGEST_RETRY_DELAY_SECONDS}s for ingest"
+                )
+            # Purged media is never fetched again on its own, and an ingest
+            # still missing halfway through the wait was most likely lost.
+            # Sent once only: two downloads of one URL share a partial file
+            if (media_post.purged_at and deferrals == 0) or deferrals == settings.INGEST_WAIT_MAX_DEFERRALS // 2:
+                logger.info(f"Re-sending ingest of media {media_post_id} for scheduled post {schedule_id}")
+                ingest_media_post.delay(media_post_id)
+            delay = settings.INGEST_RETRY_DELAY_SECONDS
+            logger.info(f"Media {media_post_id} is not stored yet, deferring scheduled post {schedule_id} by {delay}s")
+            _defer_scheduled_post(db, schedule_id, media_post_id, account_id, delay, waiting_for_ingest=True)
+            return
         
-        # Decrypt credentials
-        credentials = decrypt_credentials(account.encrypted_credentials)
+        caption = media_post.caption
+        media_type = media_post.media_type
+        media_path = media_post.prepared_path
+        thumbnail_path = media_post.prepared_thumbnail_path
+        credentials = account.encrypted_credentials
+        if not media_path or not os.path.exists(media_path):
+            # Preparation hasn't run (or its output is gone); do it now,
+            # before opening an Instagram session, rather than hand
+            # instagrapi the raw download
+            logger.warning(f"Media {media_post_id} was not prepared ahead of time, preparing inline")
+            prepared = media_preparer.prepare(media_post.local_path, media_post.blob_sha256, media_type)
+            crud.mark_media_post_prepared(db, media_post_id, prepared)
+            media_type = prepared.media_type
+            media_path = prepared.path
+            thumbnail_path = prepared.thumbnail_path
         
-        # Initialize Instagram client
-        client = InstagramClient(credentials)
+        # Decrypt credentials
+        credentials = decrypt_credentials(credentials)
         
-        # Upload media to Instagram
-        success = client.upload_media(
-            media_path=media_post.local_path,
-            caption=media_post.caption
-        )
+        # Give the connection back to the pool while waiting on Instagram
+        db.commit()
         
-        if success:
-            # Update media post status
-            crud.update_media_post_status(
-                db=db,
-                media_post_id=media_post.id,
-                status=models.PostStatus.POSTED
-            )
+        # Other accounts upload concurrently on a threaded worker; this one waits its turn
+        with session_manager.account_lock(account_id):
+            # Reuse the pooled client or stored session for this account
+            client = session_manager.get_client(account_id, credentials)
             
-            # Mark scheduled post as processed
-            scheduled_post.is_processed = True
-            scheduled_post.processed_at = datetime.utcnow()
-            db.commit()
+            # The checks above ran before waiting on the lock; another
+            # delivery of this post may have uploaded it meanwhile
+            uploading = crud.claim_scheduled_post_upload(
+                db,
+                schedule_id,
+                timedelta(seconds=settings.UPLOAD_LEASE_SECONDS)
+            )
+            if not uploading:
+                logger.info(f"Scheduled post {schedule_id} was processed or is being uploaded elsewhere, skipping")
+                return
             
-            logger.info(f"Successfully posted media {media_post.id} to Instagram")
-        else:
-            raise Exception("Failed to upload media to Instagram")
+            # Upload the prepared media to Instagram; errors are classified below
+            client.upload_media(
+                media_path=media_path,
+                caption=caption,
+                thumbnail_path=thumbnail_path,
+                media_type=media_type
+            )
+        
+        # Mark media post as posted and schedule as processed
+        crud.mark_scheduled_post_posted(db, schedule_id, media_post_id)
+        posted_at = datetime.utcnow()
+        lane_stats.record_post(lane, scheduled_time, posted_at)
+        if scheduled_time:
+            observe_schedule_lag(lane, (posted_at - scheduled_time).total_seconds())
+        publish_status_event(StatusEvent(
+            type="media.posted",
+            media_post_id=media_post_id,
+            schedule_id=schedule_id,
+            account_id=account_id,
+            status=models.PostStatus.POSTED.value
+        ))
+        
+        logger.info(f"Successfully posted media {media_post_id} to Instagram")
             
+    except RateLimitExceeded as e:
+        # Out of budget is not a failure: queue the post for the next free slot
+        delay = max(1, int(e.retry_after) + 1)
+        logger.info(f"Deferring scheduled post {schedule_id} by {delay}s: {str(e)}")
+        if uploading:
+            crud.release_scheduled_post_upload(db, schedule_id)
+        _defer_scheduled_post(db, schedule_id, media_post_id, account_id, delay)
+
     except Exception as e:
-        logger.error(f"Error processing scheduled post {schedule_id}: {str(e)}")
+        db.rollback()
+        if max_retries is None:
+            logger.error(f"Error processing scheduled post {schedule_id}: {str(e)}")
+            raise
+        if uploading:
+            crud.release_scheduled_post_upload(db, schedule_id)
         
-        # Update retry count
-        scheduled_post.retry_count += 1
-        db.commit()
+        failure = classify_failure(e)
+        logger.error(f"Error processing scheduled post {schedule_id} ({failure}): {str(e)}")
         
-        # Retry task if max retries not reached
-        if scheduled_post.retry_count < scheduled_post.max_retries:
-            self.retry(exc=e, countdown=300)  # Retry after 5 minutes
-        else:
-            # Mark media post as failed
-            crud.update_media_post_status(
-                db=db,
-                media_post_id=media_post.id,
-                status=models.PostStatus.FAILED,
-                error_message=str(e)
+        # Only transient and throttled failures can succeed on a later attempt
+        if failure in RETRYABLE and retry_count + 1 < max_retries:
+            delay = retry_delay(failure, retry_count)
+            # Keep the claim alive until the retry runs
+            crud.increment_scheduled_post_retry(
+                db,
+                schedule_id,
+                dispatched_until=datetime.utcnow() + timedelta(seconds=delay)
             )
+            observe_post_failure(failure, "retried")
+            publish_status_event(StatusEvent(
+                type="schedule.retrying",
+                media_post_id=media_post_id,
+                schedule_id=schedule_id,
+                account_id=account_id,
+                error=str(e)
+            ))
+            # Jittered backoff, behind posts that are due now
+            self.retry(exc=e, countdown=delay, priority=PRIORITY_RETRY)
+        else:
+            if failure == AUTH and account_id and not isinstance(e, AccountDisabledError):
+                # Every other post of the account would fail the same way;
+                # they dead-letter without touching Instagram until it is
+                # fixed and reactivated
+                crud.update_instagram_account(db, account_id, is_active=False)
+                session_manager.invalidate(account_id, forget_session=True)
+            crud.dead_letter_scheduled_post(db, schedule_id, media_post_id, failure, str(e))
+            observe_post_failure(failure, "dead_lettered")
+            lane_stats.record_failure(lane)
+            publish_status_event(StatusEvent(
+                type="media.failed",
+                media_post_id=media_post_id,
+                schedule_id=schedule_id,
+                account_id=account_id,
+                status=models.PostStatus.FAILED.value,
+                error=str(e)
+            ))
             
     finally:
         db.close()
 
-@celery_app.task
-def cleanup_old_media():
-    """Clean up old media files that have been posted."""
+def _defer_scheduled_post(
+    db: Session,
+    schedule_id: str,
+    media_post_id: str,
+    account_id: Optional[str],
+    delay: int,
+    waiting_for_ingest: bool = False
+):
+    """Hold the claim on a scheduled post and run it again after delay seconds."""
+    crud.defer_scheduled_post(db, schedule_id, datetime.utcnow() + timedelta(seconds=delay), waiting_for_ingest)
+    process_scheduled_post.apply_async(
+        args=[schedule_id],
+        kwargs={"account_id": account_id},
+        countdown=delay,
+        priority=PRIORITY_RETRY
+    )
+    publish_status_event(StatusEvent(
+        type="schedule.deferred",
+        media_post_id=media_post_id,
+        schedule_id=schedule_id,
+        account_id=account_id
+    ))
+
+def _fail_media_post(db: Session, media_post_id: str, account_id: str, error: str):
+    crud.update_media_post_status(
+        db=db,
+        post_id=media_post_id,
+        status=models.PostStatus.FAILED,
+        error_message=error
+    )
+    publish_status_event(StatusEvent(
+        type="media.failed",
+        media_post_id=media_post_id,
+        account_id=account_id,
+        status=models.PostStatus.FAILED.value,
+        error=error
+    ))
+
+@celery_app.task(bind=True, max_retries=3)
+def ingest_media_post(self, media_post_id: str):
+    """Download and inspect the media of a PENDING post created by the API."""
     db = SessionLocal()
+    account_id = None
     try:
-        # Get all posted media older than 24 hours
-        old_media = db.query(models.MediaPost).filter(
-            models.MediaPost.status == models.PostStatus.POSTED,
-            models.MediaPost.posted_at < datetime.utcnow() - timedelta(days=1)
-        ).all()
+        media_post = crud.get_media_post(db, media_post_id)
+        if not media_post:
+            logger.error(f"Media post {media_post_id} not found")
+            return
+        if media_post.blob_sha256:
+            # Redelivered after the blob was attached; nothing left to do
+            return
+        account_id = media_post.account_id
+        source_url = media_post.source_url
+        
+        # Reuse bytes already stored for this source instead of fetching again
+        blob = crud.get_media_blob_by_source(db, source_url)
+        if not blob or not os.path.exists(blob.path):
+            # The shared loop keeps the downloader's connection pool warm across tasks
+            stored = background_loop.run(media_downloader.store_media(source_url))
+            blob = crud.get_or_create_media_blob(
+                db,
+                sha256=stored.sha256,
+                path=stored.path,
+                size=stored.size,
+                source_url=source_url,
+                content_type=stored.content_type
+            )
+        
+        crud.attach_media_blob(
+            db,
+            post_id=media_post_id,
+            sha256=blob.sha256,
+            media_type=media_downloader.media_type_for(blob.content_type),
+            file_size=blob.size
+        )
+        publish_status_event(StatusEvent(
+            type="media.downloaded",
+            media_post_id=media_post_id,
+            account_id=account_id,
+            status=models.PostStatus.PENDING.value
+        ))
         
-        for media in old_media:
+        # Resize/transcode now so the post is upload-ready well before it is due
+        prepare_media_post.delay(media_post_id)
+        
+    except UnsupportedMediaError as e:
+        # Rejected while streaming; retrying would fetch the same bytes
+        logger.error(f"Rejected media {media_post_id}: {str(e)}")
+        db.rollback()
+        _fail_media_post(db, media_post_id, account_id, str(e))
+    
+    except Exception as e:
+        logger.error(f"Error ingesting media {media_post_id}: {str(e)}")
+        db.rollback()
+        if self.request.retries < self.max_retries:
+            # Interrupted downloads resume from their partial file
+            self.retry(exc=e, countdown=settings.INGEST_RETRY_DELAY_SECONDS * 2 ** self.request.retries)
+        _fail_media_post(db, media_post_id, account_id, str(e))
+    
+    finally:
+        db.close()
+
+@celery_app.task(bind=True, max_retries=3)
+def prepare_media_post(self, media_post_id: str):
+    """Resize or transcode downloaded media into an upload-ready file."""
+    db = SessionLocal()
+    account_id = None
+    try:
+        media_post = crud.get_media_post_with_blob(db, media_post_id)
+        if not media_post:
+            logger.error(f"Media post {media_post_id} not found")
+            return
+        if media_post.prepared_path and os.path.exists(media_post.prepared_path):
+            return
+        account_id = media_post.account_id
+        
+        try:
+            prepared = media_preparer.prepare(media_post.local_path, media_post.blob_sha256, media_post.media_type)
+        except MediaNotStoredError:
+            # A missing file is not a verdict on the media; retried below
+            raise
+        except MediaPreparationError as e:
+            # Out-of-spec media fails now instead of at its scheduled time
+            logger.error(f"Cannot prepare media {media_post_id}: {str(e)}")
+            _fail_media_post(db, media_post_id, account_id, str(e))
+            return
+        
+        crud.mark_media_post_prepared(db, media_post_id, prepared)
+        publish_status_event(StatusEvent(
+            type="media.prepared",
+            media_post_id=media_post_id,
+            account_id=account_id
+        ))
+        
+    except Exception as e:
+        logger.error(f"Error preparing media {media_post_id}: {str(e)}")
+        db.rollback()
+        if self.request.retries < self.max_retries:
+            self.retry(exc=e, countdown=settings.INGEST_RETRY_DELAY_SECONDS * 2 ** self.request.retries)
+        _fail_media_post(db, media_post_id, account_id, str(e))
+    finally:
+        db.close()
+
+def publish_scheduled_posts(
+    schedule_ids: Sequence[str],
+    routes: Optional[Dict[str, Tuple[str, datetime, int]]] = None,
+    batch_size: int = settings.SCHEDULE_PUBLISH_BATCH_SIZE
+) -> List[str]:
+    """
+    Publish process_scheduled_post messages in batches.
+
+    Each batch reuses one producer and broker connection instead of
+    acquiring one per message. Posts that can still go out on time are
+    sent at the highest priority; posts not due yet wait for their
+    scheduled time as ETA messages.
+
+    Args:
+        schedule_ids: IDs of the claimed schedules to publish
+        routes: (account_id, scheduled_time, retry_count) of each schedule,
+            as returned by crud.get_scheduled_post_routing
+        batch_size: Number of messages sent per producer checkout
+
+    Returns:
+        IDs of schedules whose batch failed to publish
+    """
+    failed = []
+    for start in range(0, len(schedule_ids), batch_size):
+        batch = schedule_ids[start:start + batch_size]
+        try:
+            with celery_app.producer_or_acquire() as producer:
+                now = datetime.utcnow()
+                for schedule_id in batch:
+                    account_id, scheduled_time, retry_count = (routes or {}).get(schedule_id, (None, now, 0))
+                    process_scheduled_post.apply_async(
+                        args=[schedule_id],
+                        kwargs={"account_id": account_id},
+                        eta=scheduled_time if scheduled_time > now else None,
+                        priority=post_priority(scheduled_time, now, retry_count),
+                        producer=producer
+                    )
+        except Exception as e:
+            logger.error(f"Failed to publish batch of {len(batch)} scheduled posts: {str(e)}")
+            failed.extend(batch)
+    return failed
+
+@celery_app.task
+def dispatch_due_posts():
+    """Claim due scheduled posts from the database and enqueue only those."""
+    db = SessionLocal()
+    dispatched = 0
+    try:
+        for _ in range(settings.DISPATCH_MAX_BATCHES):
+            schedule_ids = crud.claim_due_scheduled_posts(
+                db,
+                limit=settings.DISPATCH_BATCH_SIZE,
+                claim_timeout=timedelta(seconds=settings.DISPATCH_CLAIM_TIMEOUT_SECONDS),
+                lookahead=timedelta(seconds=settings.DISPATCH_LOOKAHEAD_SECONDS)
+            )
+            if not schedule_ids:
+                break
+
+            routes = crud.get_scheduled_post_routing(db, schedule_ids)
+            failed = publish_scheduled_posts(schedule_ids, routes)
+            if failed:
+                crud.release_scheduled_post_claims(db, failed)
+            dispatched += len(schedule_ids) - len(failed)
+
+            if len(schedule_ids) < settings.DISPATCH_BATCH_SIZE:
+                break
+
+        if dispatched:
+            logger.info(f"Dispatched {dispatched} due scheduled posts")
+        return dispatched
+    finally:
+        db.close()
+
+def _remove_blob_files(path: str):
+    """Delete a blob and the prepared files derived from it."""
+    media_downloader.store.delete(path)
+    # Blobs are named by their SHA-256, which also keys prepared files
+    media_preparer.discard(os.path.basename(path).split(".")[0])
+
+def _unlink_blobs(executor: ThreadPoolExecutor, paths: List[str]) -> int:
+    """Delete blob files in parallel; returns how many were removed."""
+    for _ in executor.map(_remove_blob_files, paths):
+        pass
+    return len(paths)
+
+def _purge_posted_media(read_db: Session, db: Session, executor: ThreadPoolExecutor) -> int:
+    """Release blobs of posted media past retention, one streamed batch at a time."""
+    cutoff = datetime.utcnow() - timedelta(hours=settings.MEDIA_RETENTION_HOURS)
+    rows = read_db.execute(
+        select(models.MediaPost.id)
+        .where(models.MediaPost.status == models.PostStatus.POSTED)
+        .where(models.MediaPost.purged_at.is_(None))
+        .where(models.MediaPost.posted_at < cutoff)
+        .execution_options(yield_per=settings.CLEANUP_BATCH_SIZE)
+    )
+    removed = 0
+    for batch in rows.scalars().partitions():
+        try:
+            # Only the last reference to a blob unlinks the shared file
+            removed += _unlink_blobs(executor, crud.release_media_blobs(db, batch))
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error cleaning up a batch of {len(batch)} media posts: {str(e)}")
+    return removed
+
+def _evict_over_quota(read_db: Session, db: Session, executor: ThreadPoolExecutor) -> int:
+    """Evict least recently used blobs until the store is back under its quota."""
+    quota = settings.MEDIA_QUOTA_MB * 1024 * 1024
+    used = crud.get_media_store_size(db)
+    if used <= quota:
+        return 0
+    # Evict down to the target rather than the quota so cleanup doesn't run on every byte
+    excess = used - quota * settings.MEDIA_QUOTA_TARGET_PERCENT // 100
+    rows = read_db.execute(
+        crud.evictable_media_blobs_query()
+        .execution_options(yield_per=settings.CLEANUP_BATCH_SIZE)
+    )
+    removed = 0
+    for batch in rows.partitions():
+        position = 0
+        while position < len(batch) and excess > 0:
+            # Take just enough candidates to cover the excess
+            victims = []
+            planned = 0
+            while position < len(batch) and planned < excess:
+                sha256, size = batch[position]
+                victims.append(sha256)
+                planned += size or 0
+                position += 1
             try:
-                # Delete local file
-                if os.path.exists(media.local_path):
-                    os.remove(media.local_path)
-                logger.info(f"Cleaned up media file: {media.local_path}")
+                evicted = crud.evict_media_blobs(db, victims)
             except Exception as e:
-                logger.error(f"Error cleaning up media file {media.local_path}: {str(e)}")
-                
+                db.rollback()
+                logger.error(f"Error evicting {len(victims)} media blobs: {str(e)}")
+                continue
+            removed += _unlink_blobs(executor, [path for path, _ in evicted])
+            # Count only what was really deleted; a candidate may have been re-used meanwhile
+            excess -= sum(size or 0 for _, size in evicted)
+        if excess <= 0:
+            break
+    if excess > 0:
+        logger.warning(f"Media store still {excess} bytes over target; remaining media is not yet published")
+    return removed
+
+@celery_app.task
+def cleanup_old_media():
+    """Purge posted media past retention, then enforce the media quota."""
+    # Rows stream from one session while batches are written through the other
+    read_db = SessionLocal()
+    db = SessionLocal()
+    try:
+        with ThreadPoolExecutor(max_workers=settings.CLEANUP_UNLINK_WORKERS) as executor:
+            purged = _purge_posted_media(read_db, db, executor)
+            evicted = 0
+            if settings.MEDIA_QUOTA_MB > 0:
+                # Start a fresh read snapshot that no longer sees purged blobs
+                read_db.rollback()
+                evicted = _evict_over_quota(read_db, db, executor)
+        abandoned = media_downloader.store.sweep_tmp(settings.DOWNLOAD_PARTIAL_MAX_AGE_HOURS * 3600)
+        logger.info(f"Media cleanup removed {purged} expired, {evicted} evicted and {abandoned} abandoned files")
+        return {"purged": purged, "evicted": evicted, "abandoned": abandoned}
     finally:
-        db.close() 
\ No newline at end of file
+        read_db.close()
+        db.close()
@@ -0,0 +1,78 @@
+import logging
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from celery.signals import celeryd_after_setup
+
+from ..config import settings
+from ..utils.lanes import PRIORITY_STEPS, queue_backlog, queue_depths
+from ..utils.sharding import SHARD_QUEUE_PREFIX, account_shard, shard_queue, worker_shard_queues
+
+logger = logging.getLogger(__name__)
+
+SHARDED_TASKS = {"app.tasks.instagram_tasks.process_scheduled_post"}
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """
+    Celery router sending an account's posts to that account's shard queue.
+
+    Tasks without an account_id kwarg fall through to task_routes.
+    """
+    if name in SHARDED_TASKS and kwargs and kwargs.get("account_id"):
+        return {"queue": shard_queue(account_shard(kwargs["account_id"], settings.INSTAGRAM_QUEUE_SHARDS))}
+    return None
+
+@celeryd_after_setup.connect
+def consume_shard_queues(sender, instance, conf, **kwargs):
+    # Workers started with -Q ...,instagram also take their share of the shards
+    queues = instance.app.amqp.queues
+    if not queues.consume_from or SHARD_QUEUE_PREFIX not in queues.consume_from:
+        return
+    owned = worker_shard_queues(
+        settings.INSTAGRAM_WORKER_INDEX,
+        settings.INSTAGRAM_WORKER_COUNT,
+        settings.INSTAGRAM_QUEUE_SHARDS
+    )
+    if not owned:
+        logger.warning(f"Worker {sender} owns no account shards: INSTAGRAM_WORKER_COUNT exceeds INSTAGRAM_QUEUE_SHARDS")
+    for queue in owned:
+        queues.select_add(queue)
+    logger.info(f"Worker {sender} consuming {len(owned)} of {settings.INSTAGRAM_QUEUE_SHARDS} account shards: {', '.join(owned)}")
+
+def shard_coverage(app, timeout: float = 1.0) -> Dict:
+    """
+    Shard queues without a consumer, or with several, among the workers that reply.
+
+    A posting worker that is down or was never started leaves its shards'
+    posts waiting in the broker without any error.
+    """
+    replies = app.control.inspect(timeout=timeout).active_queues() or {}
+    consumers = Counter(
+        queue["name"]
+        for queues in replies.values()
+        for queue in queues
+        if queue["name"].startswith(f"{SHARD_QUEUE_PREFIX}.")
+    )
+    shards = [shard_queue(shard) for shard in range(settings.INSTAGRAM_QUEUE_SHARDS)]
+    unconsumed: List[str] = [queue for queue in shards if not consumers[queue]]
+    shared: List[str] = [queue for queue in shards if consumers[queue] > 1]
+    if unconsumed:
+        logger.warning(f"No worker consumes account shards {', '.join(unconsumed)}; their posts are not being sent")
+    if shared:
+        logger.warning(f"Account shards {', '.join(shared)} have more than one consumer; check INSTAGRAM_WORKER_INDEX")
+    return {"workers": len(replies), "unconsumed": unconsumed, "shared": shared}
+
+def broker_queue_depths(app) -> Dict[Tuple[str, str], int]:
+    """Messages waiting in each queue and priority lane, read from the Redis broker."""
+    options = app.conf.broker_transport_options or {}
+    with app.connection_for_read() as connection:
+        return queue_depths(
+            connection.default_channel.client,
+            app.amqp.queues.keys(),
+            sep=options.get("sep", "\x06\x16"),
+            steps=options.get("priority_steps", PRIORITY_STEPS)
+        )
+
+def lane_backlog(app) -> Dict[str, int]:
+    """Messages waiting in each priority lane."""
+    return queue_backlog(broker_queue_depths(app))
@@ -0,0 +1,55 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+from typing import Awaitable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class BackgroundLoop:
+    def __init__(self, name: str = "background-loop"):
+        """
+        An asyncio event loop running on a daemon thread.
+
+        Lets synchronous code such as Celery tasks drive async clients while
+        keeping their connection pools alive between calls, instead of
+        building a new loop and session per task. Safe to call from any
+        thread; the loop is started lazily in each process after a fork.
+        """
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _ensure_running(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid() or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name=self.name, daemon=True)
+                thread.start()
+                self._loop = loop
+                self._pid = os.getpid()
+            return self._loop
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """
+        Run a coroutine on the loop and wait for its result.
+
+        Args:
+            coro: Coroutine to run
+            timeout: Seconds to wait before cancelling it
+
+        Returns:
+            The coroutine's result
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_running())
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+background_loop = BackgroundLoop()
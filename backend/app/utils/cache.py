@@ -0,0 +1,222 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the serialized response body."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, per RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+class MemoryCacheBackend:
+    shared = False
+
+    def __init__(self, max_entries: int = 10000):
+        """In-process LRU with per-entry expiry and per-key generations."""
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, CachedResponse]]" = OrderedDict()
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[Optional[CachedResponse], int]:
+        with self._lock:
+            generation = self._generations.get(key, 0)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, generation
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None, generation
+            self._entries.move_to_end(key)
+            return value, generation
+
+    def set(self, key: str, value: CachedResponse, ttl: int, generation: int) -> bool:
+        with self._lock:
+            if self._generations.get(key, 0) != generation:
+                return False
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+                self._generations.move_to_end(key)
+            while len(self._generations) > self.max_entries:
+                self._generations.popitem(last=False)
+
+# Writes the entry only while the key's generation is still the one the
+# caller read, so a body rendered before an invalidation is dropped
+_SET_IF_GENERATION = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+class RedisCacheBackend:
+    shared = True
+
+    def __init__(self, redis_url: str, prefix: str = "cache:", generation_ttl: int = 3600):
+        """
+        Cache shared by the API and workers, so invalidation crosses processes.
+
+        Args:
+            redis_url: Redis to store entries in
+            prefix: Key prefix of entries; generations live under prefix + "gen:"
+            generation_ttl: Seconds a generation counter outlives its last
+                invalidation; far longer than any read it has to guard
+        """
+        import redis
+
+        self.prefix = prefix
+        self.generation_ttl = generation_ttl
+        self._redis = redis.Redis.from_url(redis_url, socket_timeout=0.5)
+        self._set_if_generation = self._redis.register_script(_SET_IF_GENERATION)
+
+    def _generation_key(self, key: str) -> str:
+        return f"{self.prefix}gen:{key}"
+
+    def get(self, key: str) -> Tuple[Optional[CachedResponse], int]:
+        raw, generation = self._redis.mget(f"{self.prefix}{key}", self._generation_key(key))
+        generation = int(generation or 0)
+        if raw is None:
+            return None, generation
+        etag, _, body = raw.partition(b"\n")
+        return CachedResponse(body=body, etag=etag.decode()), generation
+
+    def set(self, key: str, value: CachedResponse, ttl: int, generation: int) -> bool:
+        return bool(self._set_if_generation(
+            keys=[f"{self.prefix}{key}", self._generation_key(key)],
+            args=[str(generation), value.etag.encode() + b"\n" + value.body, ttl]
+        ))
+
+    def delete(self, *keys: str):
+        if not keys:
+            return
+        pipe = self._redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.incr(self._generation_key(key))
+            pipe.expire(self._generation_key(key), self.generation_ttl)
+        pipe.delete(*(f"{self.prefix}{key}" for key in keys))
+        pipe.execute()
+
+class ResponseCache:
+    def __init__(self, backend, ttl: int = 60):
+        """
+        Read-through cache of serialized API responses.
+
+        Every invalidation bumps the key's generation. A body rendered
+        from rows read before an invalidation carries the older generation
+        and is not cached, so a worker's write can't be undone by a
+        request that was still reading the old row.
+
+        Args:
+            backend: MemoryCacheBackend or RedisCacheBackend
+            ttl: Seconds an entry lives if nothing invalidates it first
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_writes = 0
+
+    def get(self, key: str) -> Tuple[Optional[CachedResponse], Optional[int]]:
+        """
+        Look up a cached response.
+
+        Returns:
+            The entry (None on a miss) and the key's generation, to pass to
+            put() along with a body rendered after this call
+        """
+        try:
+            value, generation = self.backend.get(key)
+        except Exception as e:
+            logger.error(f"Cache read failed for {key}: {str(e)}")
+            value, generation = None, None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value, generation
+
+    def put(self, key: str, body: bytes, generation: Optional[int]) -> CachedResponse:
+        """Cache a body unless the key was invalidated since generation was read."""
+        value = CachedResponse(body=body, etag=make_etag(body))
+        if generation is None:
+            # The read failed, so there is nothing to check the write against
+            return value
+        try:
+            if not self.backend.set(key, value, self.ttl, generation):
+                self.stale_writes += 1
+        except Exception as e:
+            logger.error(f"Cache write failed for {key}: {str(e)}")
+        return value
+
+    def invalidate(self, *keys: str):
+        self.invalidations += len(keys)
+        try:
+            self.backend.delete(*keys)
+        except Exception as e:
+            # Entries still expire after ttl
+            logger.error(f"Cache invalidation failed for {keys}: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "stale_writes": self.stale_writes,
+        }
+
+def etag_response(cached: CachedResponse, if_none_match: Optional[str]):
+    """Serve a cached body, or an empty 304 when the client already has it."""
+    # Workers import this module through crud and never build responses
+    from fastapi import Response
+
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+def media_cache_key(media_id: str) -> str:
+    return f"media:{media_id}"
+
+def schedule_cache_key(schedule_id: str) -> str:
+    return f"schedule:{schedule_id}"
+
+def _create_status_cache() -> ResponseCache:
+    if settings.STATUS_CACHE_BACKEND == "redis":
+        backend = RedisCacheBackend(settings.REDIS_URL)
+    else:
+        backend = MemoryCacheBackend(settings.STATUS_CACHE_MAX_ENTRIES)
+    return ResponseCache(backend, ttl=settings.STATUS_CACHE_TTL_SECONDS)
+
+status_cache = _create_status_cache()
@@ -1,62 +1,293 @@
 import aiohttp
+import asyncio
+import hashlib
 import os
 import logging
-from typing import Optional
+import random
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Optional
 from urllib.parse import urlparse
-import mimetypes
+from ..config import settings
+from .media_store import BlobWriter, MediaStore, StoredBlob
+from .media_sniff import SNIFF_BYTES, MediaFormat, MediaTooLargeError, sniff_file, sniff_media
+from .metrics import download_metrics
 
 logger = logging.getLogger(__name__)
 
+class DownloadInterrupted(Exception):
+    """A transfer that stopped early but may succeed if retried."""
+
+# Statuses worth retrying; anything else fails the download right away
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, DownloadInterrupted)
+
+@dataclass
+class DownloadResult:
+    url: str
+    path: Optional[str] = None
+    error: Optional[Exception] = None
+
 class MediaDownloader:
-    def __init__(self, download_dir: str = "downloads"):
-        """Initialize media downloader with download directory."""
+    def __init__(
+        self,
+        download_dir: str = "downloads",
+        concurrency: int = 16,
+        limit_per_host: int = 8,
+        timeout: int = 300,
+        max_size: int = 50 * 1024 * 1024,
+        retries: int = 3,
+        retry_backoff: float = 1.0
+    ):
+        """
+        Initialize media downloader with download directory.
+
+        Args:
+            download_dir: Root of the content-addressed media store
+            concurrency: Maximum number of downloads run by download_many at once
+            limit_per_host: Maximum number of pooled connections per host
+            timeout: Total timeout in seconds for a single download
+            max_size: Largest media body in bytes; bigger downloads are aborted
+            retries: Extra attempts after an interrupted transfer
+            retry_backoff: Base delay in seconds, doubled on every retry
+        """
         self.download_dir = download_dir
+        self.concurrency = concurrency
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.max_size = max_size
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.store = MediaStore(download_dir)
+        self._session: Optional[aiohttp.ClientSession] = None
         os.makedirs(download_dir, exist_ok=True)
-    
-    async def download_media(self, url: str, filename: Optional[str] = None) -> str:
+
+    async def start(self):
+        """Open the shared HTTP session."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=max(self.concurrency, self.limit_per_host),
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+
+    async def close(self):
+        """Close the shared HTTP session and its pooled connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # Callers outside the API lifecycle (workers, scripts) get a session lazily
+        await self.start()
+        return self._session
+
+    async def store_media(self, url: str) -> StoredBlob:
         """
-        Download media from URL.
-        
+        Download media from URL into the content-addressed store.
+
+        The SHA-256 is computed while the body streams in, so identical
+        media downloaded from several posts is only stored once. The real
+        format is sniffed from the first bytes, and the body is never
+        written past max_size.
+
+        Interrupted transfers are retried with backoff. Bytes already received
+        are kept in a temp file keyed by the URL and resumed with a Range
+        request validated by ETag or Last-Modified. A later call for the same
+        URL picks them up too.
+
         Args:
             url: URL of the media to download
-            filename: Optional filename to save as
-            
+
         Returns:
-            Path to the downloaded file
+            The stored blob, typed by its sniffed format
+
+        Raises:
+            UnsupportedMediaError: If the body is not supported media
+            MediaTooLargeError: If the body exceeds max_size
         """
+        started = time.perf_counter()
+        writer = self.store.writer(key=hashlib.sha256(url.encode()).hexdigest())
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        raise Exception(f"Failed to download media: HTTP {response.status}")
-                    
-                    # Get content type
-                    content_type = response.headers.get('Content-Type', '')
-                    
-                    # Generate filename if not provided
-                    if not filename:
-                        ext = mimetypes.guess_extension(content_type) or '.tmp'
-                        filename = f"{os.urandom(8).hex()}{ext}"
-                    
-                    # Ensure filename is safe
-                    filename = os.path.basename(filename)
-                    filepath = os.path.join(self.download_dir, filename)
-                    
-                    # Download the file
-                    with open(filepath, 'wb') as f:
-                        while True:
-                            chunk = await response.content.read(8192)
-                            if not chunk:
-                                break
-                            f.write(chunk)
-                    
-                    logger.info(f"Successfully downloaded media to {filepath}")
-                    return filepath
-                    
+            for attempt in range(self.retries + 1):
+                try:
+                    media_format = await self._fetch(url, writer)
+                    break
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.retries:
+                        raise
+                    delay = self.retry_backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                    logger.warning(
+                        f"Download of {url} interrupted at {writer.size} bytes ({str(e) or type(e).__name__}), "
+                        f"retrying in {delay:.1f}s"
+                    )
+                    await asyncio.sleep(delay)
+
+            blob = self.store.commit(writer, ext=media_format.ext, content_type=media_format.content_type)
+            download_metrics.observe("success", time.perf_counter() - started)
+            logger.info(f"Successfully downloaded media to {blob.path}")
+            return blob
+
+        except RETRYABLE_ERRORS as e:
+            # Keep the partial file so the next attempt can resume it
+            writer.close()
+            download_metrics.failure(time.perf_counter() - started, e)
+            logger.error(f"Error downloading media from {url}: {str(e) or type(e).__name__}")
+            raise
         except Exception as e:
+            writer.discard()
+            download_metrics.failure(time.perf_counter() - started, e)
             logger.error(f"Error downloading media from {url}: {str(e)}")
             raise
-    
+
+    async def _fetch(self, url: str, writer: BlobWriter) -> MediaFormat:
+        """Run one transfer into writer, resuming from writer.size when possible."""
+        session = await self._get_session()
+        validators = writer.load_meta() if writer.size else {}
+        headers = {}
+        if writer.size and validators.get("validator"):
+            headers["Range"] = f"bytes={writer.size}-"
+            # The origin sends the full body instead if the file changed
+            headers["If-Range"] = validators["validator"]
+
+        async with session.get(url, headers=headers) as response:
+            if response.status == 206 and self._range_start(response) == writer.size:
+                logger.info(f"Resuming download of {url} at {writer.size} bytes")
+                total = self._range_total(response)
+            elif response.status == 200:
+                if writer.size:
+                    logger.info(f"Cannot resume {url}, downloading it again in full")
+                    writer.truncate()
+                total = response.content_length
+            elif response.status in (206, 416):
+                # The origin answered a different range than asked for
+                writer.truncate()
+                raise DownloadInterrupted(f"Unusable range response (HTTP {response.status})")
+            elif response.status in RETRYABLE_STATUSES:
+                raise DownloadInterrupted(f"HTTP {response.status}")
+            else:
+                raise Exception(f"Failed to download media: HTTP {response.status}")
+
+            # Refuse oversized bodies before reading any of them
+            if total is not None and total > self.max_size:
+                raise MediaTooLargeError(total, self.max_size)
+
+            validator = self._strong_validator(response)
+            if validator and validator != validators.get("validator"):
+                writer.save_meta({"url": url, "validator": validator})
+
+            if writer.size:
+                # Resumed bytes were sniffed when they first arrived
+                writer.flush()
+                media_format = sniff_file(str(writer.tmp_path))
+            else:
+                # Trust the bytes, not the header: CDNs mislabel media
+                head = await self._read_head(response.content)
+                media_format = sniff_media(head)
+                content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+                if content_type and self.media_type_for(content_type) != media_format.media_type:
+                    logger.warning(f"{url} is labeled {content_type} but contains {media_format.content_type}")
+                writer.write(head)
+
+            async for chunk in response.content.iter_chunked(65536):
+                if writer.size + len(chunk) > self.max_size:
+                    raise MediaTooLargeError(writer.size + len(chunk), self.max_size)
+                writer.write(chunk)
+
+            if total is not None and writer.size < total:
+                raise DownloadInterrupted(f"Body ended at {writer.size} of {total} bytes")
+            return media_format
+
+    @staticmethod
+    def _strong_validator(response: aiohttp.ClientResponse) -> Optional[str]:
+        # If-Range only accepts strong ETags or a Last-Modified date
+        etag = response.headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            return etag
+        return response.headers.get('Last-Modified')
+
+    @staticmethod
+    def _range_start(response: aiohttp.ClientResponse) -> Optional[int]:
+        # Content-Range: bytes 1000-1999/2000
+        content_range = response.headers.get('Content-Range', '')
+        unit, _, spec = content_range.partition(' ')
+        start, _, _ = spec.partition('-')
+        return int(start) if unit == 'bytes' and start.isdigit() else None
+
+    @staticmethod
+    def _range_total(response: aiohttp.ClientResponse) -> Optional[int]:
+        total = response.headers.get('Content-Range', '').rpartition('/')[2]
+        return int(total) if total.isdigit() else None
+
+    @staticmethod
+    async def _read_head(content: aiohttp.StreamReader) -> bytes:
+        """Read the first SNIFF_BYTES of a body, or all of it if shorter."""
+        head = b""
+        while len(head) < SNIFF_BYTES:
+            chunk = await content.read(SNIFF_BYTES - len(head))
+            if not chunk:
+                break
+            head += chunk
+        return head
+
+    async def download_media(self, url: str) -> str:
+        """
+        Download media from URL.
+
+        Args:
+            url: URL of the media to download
+
+        Returns:
+            Path to the downloaded file
+        """
+        blob = await self.store_media(url)
+        return blob.path
+
+    async def download_many(
+        self,
+        urls: Iterable[str],
+        concurrency: Optional[int] = None
+    ) -> AsyncIterator[DownloadResult]:
+        """
+        Download several URLs concurrently over the shared session.
+
+        Args:
+            urls: URLs of the media to download
+            concurrency: Optional override for the maximum parallel downloads
+
+        Yields:
+            A DownloadResult per URL, in completion order
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def fetch(url: str) -> DownloadResult:
+            async with semaphore:
+                try:
+                    return DownloadResult(url=url, path=await self.download_media(url))
+                except Exception as e:
+                    return DownloadResult(url=url, error=e)
+
+        tasks = [asyncio.ensure_future(fetch(url)) for url in urls]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def media_type_for(content_type: Optional[str]) -> str:
+        """Map a content type to the MediaPost media_type."""
+        if content_type and content_type.startswith('image/'):
+            return "image"
+        if content_type and content_type.startswith('video/'):
+            return "video"
+        return "unknown"
+
     def cleanup_file(self, filepath: str):
         """Delete a downloaded file."""
         try:
@@ -66,3 +297,13 @@ class MediaDownloader:
         except Exception as e:
             logger.error(f"Error cleaning up file {filepath}: {str(e)}")
             raise
+
+media_downloader = MediaDownloader(
+    download_dir=str(settings.DOWNLOAD_DIR),
+    concurrency=settings.DOWNLOAD_CONCURRENCY,
+    limit_per_host=settings.DOWNLOAD_LIMIT_PER_HOST,
+    timeout=settings.DOWNLOAD_TIMEOUT_SECONDS,
+    max_size=settings.MAX_MEDIA_SIZE_MB * 1024 * 1024,
+    retries=settings.DOWNLOAD_RETRIES,
+    retry_backoff=settings.DOWNLOAD_RETRY_BACKOFF_SECONDS
+)
@@ -1,14 +1,30 @@
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import base64
 import os
 import json
+from functools import lru_cache
 from typing import Dict
 
-# Get encryption key from environment variable or generate one
-ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY', Fernet.generate_key())
-fernet = Fernet(ENCRYPTION_KEY)
+class CredentialsError(Exception):
+    """Credentials could not be encrypted or decrypted, e.g. after a key change."""
+
+@lru_cache()
+def get_fernet():
+    """
+    Build the Fernet cipher on first use.
+
+    cryptography is only imported here, so processes that never touch
+    credentials (and every process at import time) don't pay for it.
+
+    Raises:
+        CredentialsError: ENCRYPTION_KEY is not set. A generated key
+            would leave every stored credential unreadable
+    """
+    from cryptography.fernet import Fernet
+
+    key = os.getenv('ENCRYPTION_KEY')
+    if not key:
+        raise CredentialsError("ENCRYPTION_KEY is not set")
+    return Fernet(key)
 
 def encrypt_credentials(credentials: Dict[str, str]) -> str:
     """
@@ -25,13 +41,13 @@ def encrypt_credentials(credentials: Dict[str, str]) -> str:
         credentials_str = json.dumps(credentials)
         
         # Encrypt the credentials
-        encrypted_data = fernet.encrypt(credentials_str.encode())
+        encrypted_data = get_fernet().encrypt(credentials_str.encode())
         
         # Convert to base64 string for storage
         return base64.b64encode(encrypted_data).decode()
         
     except Exception as e:
-        raise Exception(f"Failed to encrypt credentials: {str(e)}")
+        raise CredentialsError(f"Failed to encrypt credentials: {str(e)}")
 
 def decrypt_credentials(encrypted_credentials: str) -> Dict[str, str]:
     """
@@ -48,10 +64,11 @@ def decrypt_credentials(encrypted_credentials: str) -> Dict[str, str]:
         encrypted_data = base64.b64decode(encrypted_credentials)
         
         # Decrypt the data
-        decrypted_data = fernet.decrypt(encrypted_data)
+        decrypted_data = get_fernet().decrypt(encrypted_data)
         
         # Parse JSON back to dictionary
         return json.loads(decrypted_data.decode())
         
     except Exception as e:
-        raise Exception(f"Failed to decrypt credentials: {str(e)}")
+        # A wrong key raises InvalidToken, which has no message
+        raise CredentialsError(f"Failed to decrypt credentials: {str(e) or type(e).__name__}")
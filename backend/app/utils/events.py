@@ -0,0 +1,187 @@
+import asyncio
+import json
+import logging
+import threading
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from ..config import settings
+from .cache import status_cache, media_cache_key, schedule_cache_key
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class StatusEvent:
+    type: str  # e.g. "media.downloaded", "media.posted", "schedule.retrying"
+    media_post_id: Optional[str] = None
+    schedule_id: Optional[str] = None
+    account_id: Optional[str] = None
+    status: Optional[str] = None
+    error: Optional[str] = None
+    at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw) -> "StatusEvent":
+        return cls(**json.loads(raw))
+
+class Subscription:
+    def __init__(self, account_id: Optional[str], post_id: Optional[str], queue_size: int):
+        """One subscriber's filter and bounded event queue."""
+        self.account_id = account_id
+        self.post_id = post_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, event: StatusEvent):
+        # Slow consumers lose their oldest events instead of growing memory
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+class EventBroadcaster:
+    def __init__(self, queue_size: int = 100):
+        """
+        In-process fan-out of status events to async subscribers.
+
+        Subscribers are indexed by their filter, so publishing only touches
+        the subscribers an event can match.
+        """
+        self.queue_size = queue_size
+        self._all: Set[Subscription] = set()
+        self._by_account: Dict[str, Set[Subscription]] = {}
+        self._by_post: Dict[str, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._all) + sum(map(len, self._by_account.values())) + sum(map(len, self._by_post.values()))
+
+    def subscribe(self, account_id: Optional[str] = None, post_id: Optional[str] = None) -> Subscription:
+        """Register a subscriber; post_id matches a media post or schedule ID."""
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(account_id, post_id, self.queue_size)
+        with self._lock:
+            if post_id:
+                self._by_post.setdefault(post_id, set()).add(subscription)
+            elif account_id:
+                self._by_account.setdefault(account_id, set()).add(subscription)
+            else:
+                self._all.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription.post_id:
+                self._discard(self._by_post, subscription.post_id, subscription)
+            elif subscription.account_id:
+                self._discard(self._by_account, subscription.account_id, subscription)
+            else:
+                self._all.discard(subscription)
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[Subscription]], key: str, subscription: Subscription):
+        subscriptions = index.get(key)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del index[key]
+
+    def _matching(self, event: StatusEvent) -> Set[Subscription]:
+        with self._lock:
+            matching = set(self._all)
+            if event.account_id:
+                for subscription in self._by_account.get(event.account_id, ()):
+                    matching.add(subscription)
+            for post_id in (event.media_post_id, event.schedule_id):
+                if post_id:
+                    for subscription in self._by_post.get(post_id, ()):
+                        if not subscription.account_id or subscription.account_id == event.account_id:
+                            matching.add(subscription)
+            return matching
+
+    def _deliver(self, event: StatusEvent):
+        for subscription in self._matching(event):
+            subscription.offer(event)
+
+    def publish(self, event: StatusEvent):
+        """Deliver an event to matching subscribers; safe to call from any thread."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(event)
+        else:
+            loop.call_soon_threadsafe(self._deliver, event)
+
+class RedisEventBus:
+    def __init__(self, redis_url: str, channel: str):
+        """Status events over Redis pub/sub, from workers to every API node."""
+        self.redis_url = redis_url
+        self.channel = channel
+        self._redis = None
+
+    def publish(self, event: StatusEvent):
+        if self._redis is None:
+            import redis
+
+            self._redis = redis.Redis.from_url(self.redis_url)
+        self._redis.publish(self.channel, event.to_json())
+
+    async def listen(self, broadcaster: EventBroadcaster):
+        """Relay events from Redis into the local broadcaster until cancelled."""
+        import redis.asyncio as aioredis
+
+        while True:
+            client = aioredis.Redis.from_url(self.redis_url)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    event = StatusEvent.from_json(message["data"])
+                    _invalidate_cached_status(event)
+                    broadcaster.publish(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Status event subscription failed, reconnecting: {str(e)}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+                await client.close()
+
+def _invalidate_cached_status(event: StatusEvent):
+    # Keeps per-process status caches coherent with writes made by workers.
+    # A shared cache was already invalidated by the writer, and its
+    # blocking client has no place on this event loop
+    if status_cache.backend.shared:
+        return
+    keys = []
+    if event.media_post_id:
+        keys.append(media_cache_key(event.media_post_id))
+    if event.schedule_id:
+        keys.append(schedule_cache_key(event.schedule_id))
+    if keys:
+        status_cache.invalidate(*keys)
+
+event_broadcaster = EventBroadcaster(queue_size=settings.EVENTS_SUBSCRIBER_QUEUE_SIZE)
+event_bus = RedisEventBus(settings.REDIS_URL, settings.EVENTS_CHANNEL) if settings.EVENTS_BACKEND == "redis" else None
+
+def publish_status_event(event: StatusEvent):
+    """Publish a status transition to subscribers; never raises."""
+    try:
+        if event_bus is not None:
+            event_bus.publish(event)
+        else:
+            event_broadcaster.publish(event)
+    except Exception as e:
+        logger.error(f"Failed to publish status event {event.type}: {str(e)}")
@@ -0,0 +1,87 @@
+import random
+from typing import Dict, Optional
+
+from ..config import settings
+
+# Failure classes of a scheduled post
+TRANSIENT = "transient"  # network blips, 5xx, timeouts: retry soon
+THROTTLED = "throttled"  # Instagram asked us to slow down: retry much later
+AUTH = "auth"  # credentials or a challenge need a human: fail now
+PERMANENT = "permanent"  # the post itself can never go out: fail now
+
+FAILURE_CLASSES = frozenset({TRANSIENT, THROTTLED, AUTH, PERMANENT})
+RETRYABLE = frozenset({TRANSIENT, THROTTLED})
+
+class AccountDisabledError(Exception):
+    """The post's account is deactivated, e.g. after an earlier auth failure."""
+
+# Matched by class name along the exception's MRO, so the most specific
+# class wins (MediaNotStoredError before MediaPreparationError) and this
+# module needs neither instagrapi nor the media pipeline imported. Builtin
+# errors are left out on purpose: a bug of ours should cost a few retries,
+# not dead-letter posts silently
+_CLASS_FAILURES: Dict[str, str] = {
+    # Instagram throttling
+    "PleaseWaitFewMinutes": THROTTLED,
+    "RateLimitError": THROTTLED,
+    "ClientThrottledError": THROTTLED,
+    "FeedbackRequired": THROTTLED,
+    "RateLimitExceeded": THROTTLED,
+    # Credentials, challenges and blocked accounts
+    "BadPassword": AUTH,
+    "BadCredentials": AUTH,
+    "ChallengeError": AUTH,
+    "CaptchaChallengeRequired": AUTH,
+    "TwoFactorRequired": AUTH,
+    "LoginRequired": AUTH,
+    "ClientLoginRequired": AUTH,
+    "ReloginAttemptExceeded": AUTH,
+    "ClientUnauthorizedError": AUTH,
+    "AccountSuspended": AUTH,
+    "AccountDisabledError": AUTH,
+    # Undecryptable credentials point at the worker's key, not the account;
+    # treating them as AUTH would deactivate every account a bad worker touches
+    "CredentialsError": PERMANENT,
+    # The blob's file is missing; it may be restored or re-downloaded
+    "MediaNotStoredError": TRANSIENT,
+    # Media Instagram or our pipeline will never accept
+    "UnsupportedMediaError": PERMANENT,
+    "MediaPreparationError": PERMANENT,
+    "VideoTooLongException": PERMANENT,
+    "AlbumUnknownFormat": PERMANENT,
+    "ClientBadRequestError": PERMANENT,
+    "ValidationError": PERMANENT,
+}
+
+def classify_failure(error: BaseException) -> str:
+    """
+    Map an exception raised while posting to a failure class.
+
+    Anything unrecognised is treated as transient, so a new kind of error
+    costs a few backed-off retries rather than a lost post.
+    """
+    for cls in type(error).__mro__:
+        failure = _CLASS_FAILURES.get(cls.__name__)
+        if failure:
+            return failure
+    return TRANSIENT
+
+def retry_delay(failure: str, attempt: int, rng: Optional[random.Random] = None) -> float:
+    """
+    Seconds to wait before retry number attempt (0-based) of a failure class.
+
+    Exponential with equal jitter: half the capped delay is fixed and the
+    other half random, so posts that failed together (one Instagram hiccup
+    across many accounts) don't come back together as a retry storm.
+
+    Args:
+        failure: TRANSIENT or THROTTLED
+        attempt: How many retries already happened
+        rng: Source of the jitter, for repeatable tests and benchmarks
+    """
+    if failure == THROTTLED:
+        base, cap = settings.THROTTLED_BACKOFF_BASE_SECONDS, settings.THROTTLED_BACKOFF_MAX_SECONDS
+    else:
+        base, cap = settings.RETRY_BACKOFF_BASE_SECONDS, settings.RETRY_BACKOFF_MAX_SECONDS
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + (rng or random).uniform(0, delay / 2)
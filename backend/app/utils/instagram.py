@@ -1,47 +1,172 @@
 from instagrapi import Client
 from instagrapi.exceptions import LoginRequired
 import logging
-from typing import Dict, Optional
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from .metrics import login_metrics, upload_metrics
+from .rate_limiter import RateLimitExceeded
 
 logger = logging.getLogger(__name__)
 
 class InstagramClient:
-    def __init__(self, credentials: Dict[str, str]):
-        """Initialize Instagram client with credentials."""
+    def __init__(
+        self,
+        credentials: Dict[str, str],
+        session_settings: Optional[Dict] = None,
+        on_login: Optional[Callable[[Dict], None]] = None,
+        rate_limiter=None,
+        rate_limit_key: Optional[str] = None
+    ):
+        """
+        Initialize Instagram client with credentials.
+
+        Args:
+            credentials: Dictionary containing username and password
+            session_settings: Previously dumped instagrapi settings to rehydrate
+            on_login: Called with the fresh session settings after every full login
+            rate_limiter: Optional TokenBucketRateLimiter guarding logins and uploads
+            rate_limit_key: Bucket key, usually the account ID
+        """
         self.client = Client()
         self.credentials = credentials
-        self._login()
-    
-    def _login(self):
+        self.on_login = on_login
+        self.rate_limiter = rate_limiter
+        self.rate_limit_key = rate_limit_key or credentials['username']
+
+        if session_settings and self._restore(session_settings):
+            logger.info(f"Restored Instagram session for {self.credentials['username']}")
+        elif session_settings:
+            # Throttled, persisted through on_login and counted as a login
+            logger.info(f"Stored session rejected for {self.credentials['username']}, logging in again")
+            self._login(relogin=True)
+        else:
+            self._login()
+
+    def _restore(self, session_settings: Dict) -> bool:
+        """
+        Rehydrate a stored session and check it with one cheap call.
+
+        instagrapi's login() would validate the session itself, but falls
+        back to a password login on its own when Instagram rejects it,
+        bypassing the rate limiter and on_login. Validating here leaves
+        that fallback to _login().
+
+        Returns:
+            True if Instagram accepted the session, False if it needs a new login
+        """
+        started = time.perf_counter()
+        try:
+            self._throttle()
+            self.client.set_settings(session_settings)
+            self.client.account_info()
+            login_metrics.observe("restored", time.perf_counter() - started)
+            return True
+        except LoginRequired:
+            return False
+        except RateLimitExceeded:
+            login_metrics.observe("rate_limited", time.perf_counter() - started)
+            raise
+        except Exception as e:
+            login_metrics.failure(time.perf_counter() - started, e)
+            logger.error(f"Failed to restore Instagram session: {str(e)}")
+            raise
+
+    def _login(self, relogin: bool = False):
         """Login to Instagram using provided credentials."""
+        started = time.perf_counter()
         try:
+            self._throttle()
+
+            if relogin:
+                # Keep the device identity so Instagram sees the same phone
+                old_settings = self.client.get_settings()
+                self.client.set_settings({})
+                self.client.set_uuids(old_settings.get("uuids", {}))
+
             self.client.login(
                 username=self.credentials['username'],
                 password=self.credentials['password']
             )
+            login_metrics.observe("success", time.perf_counter() - started)
             logger.info(f"Successfully logged in as {self.credentials['username']}")
+
+            if self.on_login:
+                self.on_login(self.dump_session())
+        except RateLimitExceeded:
+            login_metrics.observe("rate_limited", time.perf_counter() - started)
+            raise
         except Exception as e:
+            login_metrics.failure(time.perf_counter() - started, e)
             logger.error(f"Failed to login to Instagram: {str(e)}")
             raise
-    
-    def upload_media(self, media_path: str, caption: Optional[str] = None) -> bool:
-        """Upload media to Instagram."""
+
+    def _throttle(self):
+        """Spend one call from the account budget, raising RateLimitExceeded if empty."""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self.rate_limit_key)
+
+    def dump_session(self) -> Dict:
+        """Return the serializable instagrapi session settings."""
+        return self.client.get_settings()
+
+    def upload_media(
+        self,
+        media_path: str,
+        caption: Optional[str] = None,
+        thumbnail_path: Optional[str] = None,
+        media_type: Optional[str] = None
+    ) -> bool:
+        """
+        Upload media to Instagram.
+
+        media_type ("image" or "video") comes from the sniffed content and
+        wins over the file extension; videos use thumbnail_path as their
+        cover if given.
+
+        Raises:
+            The instagrapi or local error that stopped the upload, so the
+            caller can tell throttling and bad credentials from a bad file
+        """
+        started = time.perf_counter()
         try:
-            # Check if media is image or video
-            if media_path.lower().endswith(('.jpg', '.jpeg', '.png')):
-                media = self.client.photo_upload(media_path, caption=caption)
-            elif media_path.lower().endswith(('.mp4', '.mov')):
-                media = self.client.video_upload(media_path, caption=caption)
-            else:
-                raise ValueError("Unsupported media format")
-            
+            try:
+                media = self._upload(media_path, caption, thumbnail_path, media_type)
+            except LoginRequired:
+                logger.info(f"Session rejected for {self.credentials['username']}, logging in again")
+                self._login(relogin=True)
+                media = self._upload(media_path, caption, thumbnail_path, media_type)
+
+            upload_metrics.observe("success", time.perf_counter() - started)
             logger.info(f"Successfully uploaded media: {media.id}")
             return True
-            
+
+        except RateLimitExceeded:
+            upload_metrics.observe("rate_limited", time.perf_counter() - started)
+            raise
         except Exception as e:
+            upload_metrics.failure(time.perf_counter() - started, e)
             logger.error(f"Failed to upload media: {str(e)}")
-            return False
-    
+            raise
+
+    def _upload(
+        self,
+        media_path: str,
+        caption: Optional[str] = None,
+        thumbnail_path: Optional[str] = None,
+        media_type: Optional[str] = None
+    ):
+        """Upload a single photo or video based on its media type or extension."""
+        self._throttle()
+        # Check if media is image or video
+        if media_type == "image" or (media_type is None and media_path.lower().endswith(('.jpg', '.jpeg', '.png'))):
+            return self.client.photo_upload(media_path, caption=caption)
+        elif media_type == "video" or (media_type is None and media_path.lower().endswith(('.mp4', '.mov'))):
+            thumbnail = Path(thumbnail_path) if thumbnail_path else None
+            return self.client.video_upload(media_path, caption=caption, thumbnail=thumbnail)
+        else:
+            raise ValueError("Unsupported media format")
+
     def get_user_info(self) -> Dict:
         """Get information about the logged-in user."""
         try:
@@ -49,7 +174,7 @@ class InstagramClient:
         except Exception as e:
             logger.error(f"Failed to get user info: {str(e)}")
             raise
-    
+
     def logout(self):
         """Logout from Instagram."""
         try:
@@ -57,4 +182,4 @@ class InstagramClient:
             logger.info("Successfully logged out from Instagram")
         except Exception as e:
             logger.error(f"Failed to logout: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
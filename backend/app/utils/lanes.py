@@ -0,0 +1,165 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Lanes work is queued in, most urgent first
+LANE_DUE = "due"  # first attempts of posts inside their on-time window
+LANE_RETRY = "retry"  # retries, rate-limit deferrals and overdue backlog
+LANE_INGEST = "ingest"
+LANE_MEDIA = "media"
+LANE_MAINTENANCE = "maintenance"
+LANE_DEFAULT = "default"
+
+# Broker message priorities; on Redis 0 is served first
+PRIORITY_DUE = 0
+PRIORITY_RETRY = 6
+PRIORITY_STEPS = list(range(10))
+
+def post_priority(scheduled_time: datetime, now: datetime, retry_count: int = 0) -> int:
+    """
+    Message priority of a scheduled post.
+
+    Posts that can still go out on time preempt everything queued behind
+    them; retries and posts that already missed their window yield to them.
+
+    Args:
+        scheduled_time: When the post is due
+        now: Current UTC time
+        retry_count: Failed attempts so far
+
+    Returns:
+        PRIORITY_DUE or PRIORITY_RETRY
+    """
+    if retry_count:
+        return PRIORITY_RETRY
+    if (now - scheduled_time).total_seconds() > settings.POST_ON_TIME_SECONDS:
+        return PRIORITY_RETRY
+    return PRIORITY_DUE
+
+def queue_lane(queue: str, priority: int) -> str:
+    """Lane a message with the given priority on the given queue belongs to."""
+    if queue in (LANE_INGEST, LANE_MEDIA, LANE_MAINTENANCE, LANE_DEFAULT):
+        return queue
+    return LANE_DUE if priority < PRIORITY_RETRY else LANE_RETRY
+
+def queue_depths(client, queues: Iterable[str], sep: str, steps: Iterable[int] = PRIORITY_STEPS) -> Dict[Tuple[str, str], int]:
+    """
+    Messages waiting in each queue and lane of a Redis broker.
+
+    Kombu keeps each priority of a queue in its own list, named
+    "<queue><sep><priority>" (plain "<queue>" for priority 0).
+
+    Args:
+        client: redis.Redis connected to the broker
+        queues: Names of the queues to count
+        sep: Separator from broker_transport_options
+        steps: Priority steps from broker_transport_options
+
+    Returns:
+        Waiting messages keyed by (queue, lane)
+    """
+    keys = []
+    pipe = client.pipeline()
+    for queue in queues:
+        for priority in steps:
+            keys.append((queue, queue_lane(queue, priority)))
+            pipe.llen(queue if not priority else f"{queue}{sep}{priority}")
+    depths: Dict[Tuple[str, str], int] = {}
+    for key, length in zip(keys, pipe.execute()):
+        depths[key] = depths.get(key, 0) + length
+    return depths
+
+def queue_backlog(depths: Dict[Tuple[str, str], int]) -> Dict[str, int]:
+    """Sum queue_depths per lane."""
+    backlog: Dict[str, int] = {}
+    for (_, lane), depth in depths.items():
+        backlog[lane] = backlog.get(lane, 0) + depth
+    return backlog
+
+class MemoryLaneStatsBackend:
+    def __init__(self):
+        """Lane counters kept in this process, for tests and single-node use."""
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, counters: Dict[str, float]):
+        with self._lock:
+            for name, amount in counters.items():
+                self._counters[name] = self._counters.get(name, 0) + amount
+
+    def read(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._counters)
+
+class RedisLaneStatsBackend:
+    def __init__(self, redis_url: str, key: str = "lane-stats"):
+        """Lane counters in a Redis hash, summed over every worker."""
+        import redis
+
+        self.key = key
+        self._redis = redis.Redis.from_url(redis_url, socket_timeout=0.5)
+
+    def increment(self, counters: Dict[str, float]):
+        pipe = self._redis.pipeline(transaction=False)
+        for name, amount in counters.items():
+            pipe.hincrbyfloat(self.key, name, amount)
+        pipe.execute()
+
+    def read(self) -> Dict[str, float]:
+        return {name.decode(): float(value) for name, value in self._redis.hgetall(self.key).items()}
+
+class LaneStats:
+    def __init__(self, backend, on_time_seconds: int = 60):
+        """
+        Outcome counters of scheduled posts per lane.
+
+        Args:
+            backend: MemoryLaneStatsBackend or RedisLaneStatsBackend
+            on_time_seconds: Lateness up to which a post counts as on time
+        """
+        self.backend = backend
+        self.on_time_seconds = on_time_seconds
+
+    def record_post(self, lane: str, scheduled_time: Optional[datetime], posted_at: datetime):
+        """Count a published post and how late it went out; never raises."""
+        lateness = max(0.0, (posted_at - scheduled_time).total_seconds()) if scheduled_time else 0.0
+        counters = {f"{lane}:posted": 1, f"{lane}:lateness_seconds": lateness}
+        if lateness <= self.on_time_seconds:
+            counters[f"{lane}:on_time"] = 1
+        self._increment(counters)
+
+    def record_failure(self, lane: str):
+        """Count a post that failed for good; never raises."""
+        self._increment({f"{lane}:failed": 1})
+
+    def _increment(self, counters: Dict[str, float]):
+        try:
+            self.backend.increment(counters)
+        except Exception as e:
+            logger.error(f"Failed to record lane stats: {str(e)}")
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Per-lane totals with the on-time rate and mean lateness."""
+        lanes: Dict[str, Dict[str, float]] = {}
+        for name, value in self.backend.read().items():
+            lane, _, counter = name.partition(":")
+            lanes.setdefault(lane, {"posted": 0, "on_time": 0, "failed": 0, "lateness_seconds": 0.0})[counter] = value
+        for counters in lanes.values():
+            posted = counters["posted"]
+            counters["on_time_rate"] = counters["on_time"] / posted if posted else None
+            counters["mean_lateness_seconds"] = counters["lateness_seconds"] / posted if posted else None
+        return lanes
+
+def _create_lane_stats() -> LaneStats:
+    if settings.LANE_STATS_BACKEND == "redis":
+        backend = RedisLaneStatsBackend(settings.REDIS_URL)
+    else:
+        backend = MemoryLaneStatsBackend()
+    return LaneStats(backend, on_time_seconds=settings.POST_ON_TIME_SECONDS)
+
+lane_stats = _create_lane_stats()
@@ -0,0 +1,325 @@
+import json
+import logging
+import os
+import subprocess
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from ..config import settings
+from .media_sniff import UnsupportedMediaError, sniff_file
+
+logger = logging.getLogger(__name__)
+
+# Instagram feed limits
+IMAGE_MIN_WIDTH = 320
+IMAGE_MAX_WIDTH = 1080
+IMAGE_MIN_ASPECT = 4 / 5
+IMAGE_MAX_ASPECT = 1.91
+VIDEO_MAX_WIDTH = 1080
+VIDEO_MIN_ASPECT = 4 / 5
+VIDEO_MAX_ASPECT = 16 / 9
+VIDEO_MAX_FPS = 30
+VIDEO_MIN_DURATION = 3.0
+VIDEO_MAX_DURATION = 60.0
+
+class MediaPreparationError(Exception):
+    """Media that cannot be turned into an upload Instagram accepts."""
+
+class MediaNotStoredError(MediaPreparationError):
+    """The blob's file is not on disk, so there is nothing to prepare yet."""
+
+@dataclass
+class PreparedMedia:
+    path: str
+    media_type: str  # "image" or "video"
+    width: int
+    height: int
+    duration: Optional[float] = None
+    thumbnail_path: Optional[str] = None
+
+def fit_aspect(width: int, height: int, min_aspect: float, max_aspect: float) -> Tuple[int, int]:
+    """
+    Largest centered crop of width x height whose aspect ratio is in range.
+
+    Args:
+        width: Source width in pixels
+        height: Source height in pixels
+        min_aspect: Narrowest allowed width/height ratio
+        max_aspect: Widest allowed width/height ratio
+
+    Returns:
+        (crop_width, crop_height)
+    """
+    aspect = width / height
+    if aspect < min_aspect:
+        return width, int(width / min_aspect)
+    if aspect > max_aspect:
+        return int(height * max_aspect), height
+    return width, height
+
+def fit_width(width: int, height: int, min_width: int, max_width: int) -> Tuple[int, int]:
+    """Scale dimensions into [min_width, max_width], keeping the aspect ratio."""
+    target = min(max(width, min_width), max_width)
+    return target, max(1, round(height * target / width))
+
+def _even(value: int) -> int:
+    # H.264 with yuv420p needs even dimensions
+    return value - value % 2
+
+class MediaPreparer:
+    def __init__(
+        self,
+        prepared_dir: Path,
+        ffmpeg: str = "ffmpeg",
+        ffprobe: str = "ffprobe",
+        timeout: int = 600,
+        jpeg_quality: int = 90
+    ):
+        """
+        Turns stored blobs into files Instagram accepts without converting them.
+
+        Prepared files are keyed by the blob's SHA-256, so media shared by
+        several posts is only prepared once.
+
+        Args:
+            prepared_dir: Directory prepared files are written to
+            ffmpeg: ffmpeg executable
+            ffprobe: ffprobe executable
+            timeout: Seconds a single ffmpeg or ffprobe run may take
+            jpeg_quality: JPEG quality for re-encoded images
+        """
+        self.prepared_dir = Path(prepared_dir)
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self.timeout = timeout
+        self.jpeg_quality = jpeg_quality
+
+    def output_path(self, sha256: str, suffix: str) -> Path:
+        return self.prepared_dir / sha256[:2] / f"{sha256}{suffix}"
+
+    def prepare(self, source_path: str, sha256: str, media_type: Optional[str] = None) -> PreparedMedia:
+        """
+        Prepare a stored blob for upload, reusing an earlier result if present.
+
+        Args:
+            source_path: Path of the downloaded blob
+            sha256: Content hash of the blob, used to key the output
+            media_type: "image" or "video" if known; sniffed otherwise
+
+        Returns:
+            PreparedMedia describing the upload-ready file
+
+        Raises:
+            MediaNotStoredError: If the blob's file is missing
+            MediaPreparationError: If the media is unreadable or out of spec
+        """
+        if not source_path or not os.path.exists(source_path):
+            raise MediaNotStoredError("Media file is no longer stored")
+        if media_type not in ("image", "video"):
+            try:
+                media_type = sniff_file(source_path).media_type
+            except UnsupportedMediaError as e:
+                raise MediaPreparationError(str(e))
+        if media_type == "image":
+            return self.prepare_image(source_path, sha256)
+        return self.prepare_video(source_path, sha256)
+
+    def prepare_image(self, source_path: str, sha256: str) -> PreparedMedia:
+        """Crop to Instagram's aspect range, scale and re-encode as JPEG."""
+        dest = self.output_path(sha256, ".jpg")
+        if dest.exists():
+            with Image.open(dest) as img:
+                return PreparedMedia(path=str(dest), media_type="image", width=img.width, height=img.height)
+
+        try:
+            with Image.open(source_path) as img:
+                img = ImageOps.exif_transpose(img)
+                img = self._to_rgb(img)
+                crop_width, crop_height = fit_aspect(img.width, img.height, IMAGE_MIN_ASPECT, IMAGE_MAX_ASPECT)
+                if (crop_width, crop_height) != img.size:
+                    left = (img.width - crop_width) // 2
+                    top = (img.height - crop_height) // 2
+                    img = img.crop((left, top, left + crop_width, top + crop_height))
+                size = fit_width(img.width, img.height, IMAGE_MIN_WIDTH, IMAGE_MAX_WIDTH)
+                if size != img.size:
+                    img = img.resize(size, Image.LANCZOS)
+                with _AtomicOutput(dest) as tmp_path:
+                    img.save(tmp_path, "JPEG", quality=self.jpeg_quality, optimize=True, progressive=True)
+        except MediaPreparationError:
+            raise
+        except Exception as e:
+            raise MediaPreparationError(f"Unreadable image: {str(e)}")
+
+        logger.info(f"Prepared image {sha256} at {size[0]}x{size[1]}")
+        return PreparedMedia(path=str(dest), media_type="image", width=size[0], height=size[1])
+
+    @staticmethod
+    def _to_rgb(img: Image.Image) -> Image.Image:
+        if img.mode == "RGB":
+            return img
+        if img.mode in ("RGBA", "LA", "P"):
+            # Flatten transparency onto white rather than black
+            rgba = img.convert("RGBA")
+            background = Image.new("RGB", rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.split()[-1])
+            return background
+        return img.convert("RGB")
+
+    def probe(self, path: str) -> Dict:
+        """Return ffprobe's format and stream description of a file."""
+        result = self._run([
+            self.ffprobe, "-v", "error",
+            "-print_format", "json",
+            "-show_format", "-show_streams",
+            path
+        ])
+        return json.loads(result.stdout)
+
+    def prepare_video(self, source_path: str, sha256: str) -> PreparedMedia:
+        """Crop, scale and transcode to H.264/AAC MP4, or remux if already compliant."""
+        dest = self.output_path(sha256, ".mp4")
+        thumbnail = self.output_path(sha256, ".thumb.jpg")
+        if dest.exists() and thumbnail.exists():
+            video, duration = self._video_stream(self.probe(str(dest)))
+            return PreparedMedia(
+                path=str(dest),
+                media_type="video",
+                width=int(video["width"]),
+                height=int(video["height"]),
+                duration=duration,
+                thumbnail_path=str(thumbnail)
+            )
+
+        info = self.probe(source_path)
+        video, duration = self._video_stream(info)
+        if duration < VIDEO_MIN_DURATION:
+            raise MediaPreparationError(f"Video is {duration:.1f}s, shorter than {VIDEO_MIN_DURATION:.0f}s")
+
+        width, height = int(video["width"]), int(video["height"])
+        if int((video.get("tags") or {}).get("rotate", 0)) % 180:
+            width, height = height, width
+        crop_width, crop_height = fit_aspect(width, height, VIDEO_MIN_ASPECT, VIDEO_MAX_ASPECT)
+        out_width, out_height = fit_width(crop_width, crop_height, 1, VIDEO_MAX_WIDTH)
+        out_width, out_height = _even(out_width), _even(out_height)
+        fps = self._frame_rate(video)
+        audio = [stream for stream in info.get("streams", []) if stream.get("codec_type") == "audio"]
+
+        compliant = (
+            video.get("codec_name") == "h264"
+            and video.get("pix_fmt") == "yuv420p"
+            and all(stream.get("codec_name") == "aac" for stream in audio)
+            and (out_width, out_height) == (width, height)
+            and fps <= VIDEO_MAX_FPS
+            and duration <= VIDEO_MAX_DURATION
+        )
+        if compliant:
+            # Already in spec: only move the index to the front for faster uploads
+            codec_args = ["-c", "copy"]
+        else:
+            filters = []
+            if (crop_width, crop_height) != (width, height):
+                filters.append(f"crop={crop_width}:{crop_height}")
+            filters.append(f"scale={out_width}:{out_height}")
+            if fps > VIDEO_MAX_FPS:
+                filters.append(f"fps={VIDEO_MAX_FPS}")
+            codec_args = [
+                "-vf", ",".join(filters),
+                "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
+                "-pix_fmt", "yuv420p",
+                "-c:a", "aac", "-b:a", "128k", "-ar", "44100",
+                "-t", str(VIDEO_MAX_DURATION),
+            ]
+
+        with _AtomicOutput(dest) as tmp_path:
+            self._run([
+                self.ffmpeg, "-y", "-v", "error",
+                "-i", source_path,
+                *codec_args,
+                "-movflags", "+faststart",
+                "-f", "mp4", tmp_path
+            ])
+        with _AtomicOutput(thumbnail) as tmp_path:
+            self._run([
+                self.ffmpeg, "-y", "-v", "error",
+                "-ss", str(min(1.0, duration / 2)),
+                "-i", str(dest),
+                "-frames:v", "1", "-q:v", "2",
+                "-f", "mjpeg", tmp_path
+            ])
+
+        logger.info(f"Prepared video {sha256} at {out_width}x{out_height} ({'remuxed' if compliant else 'transcoded'})")
+        return PreparedMedia(
+            path=str(dest),
+            media_type="video",
+            width=out_width,
+            height=out_height,
+            duration=min(duration, VIDEO_MAX_DURATION),
+            thumbnail_path=str(thumbnail)
+        )
+
+    @staticmethod
+    def _video_stream(info: Dict) -> Tuple[Dict, float]:
+        streams = [stream for stream in info.get("streams", []) if stream.get("codec_type") == "video"]
+        if not streams:
+            raise MediaPreparationError("No video stream found")
+        duration = float(info.get("format", {}).get("duration") or streams[0].get("duration") or 0)
+        return streams[0], duration
+
+    @staticmethod
+    def _frame_rate(video: Dict) -> float:
+        numerator, _, denominator = video.get("avg_frame_rate", "0/1").partition("/")
+        try:
+            return float(numerator) / float(denominator or 1)
+        except (ValueError, ZeroDivisionError):
+            return 0.0
+
+    def _run(self, args) -> subprocess.CompletedProcess:
+        try:
+            return subprocess.run(args, capture_output=True, text=True, timeout=self.timeout, check=True)
+        except FileNotFoundError:
+            # A worker misconfiguration, not a problem with the media; let the task retry
+            raise RuntimeError(f"{args[0]} is not installed")
+        except subprocess.TimeoutExpired:
+            raise MediaPreparationError(f"{os.path.basename(args[0])} timed out after {self.timeout}s")
+        except subprocess.CalledProcessError as e:
+            raise MediaPreparationError(f"{os.path.basename(args[0])} failed: {e.stderr.strip()[-500:]}")
+
+    def discard(self, sha256: str):
+        """Remove every prepared file derived from a blob."""
+        for suffix in (".jpg", ".mp4", ".thumb.jpg"):
+            try:
+                os.remove(self.output_path(sha256, suffix))
+            except FileNotFoundError:
+                pass
+
+class _AtomicOutput:
+    def __init__(self, dest: Path):
+        """Context manager yielding a temp path that is renamed onto dest on success."""
+        self.dest = dest
+        self.tmp_path = dest.parent / f".{dest.name}.{uuid.uuid4().hex}.tmp"
+
+    def __enter__(self) -> str:
+        self.dest.parent.mkdir(parents=True, exist_ok=True)
+        return str(self.tmp_path)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            os.replace(self.tmp_path, self.dest)
+        else:
+            try:
+                os.remove(self.tmp_path)
+            except FileNotFoundError:
+                pass
+        return False
+
+media_preparer = MediaPreparer(
+    settings.PREPARED_MEDIA_DIR,
+    ffmpeg=settings.FFMPEG_PATH,
+    ffprobe=settings.FFPROBE_PATH,
+    timeout=settings.MEDIA_PREP_TIMEOUT_SECONDS,
+    jpeg_quality=settings.MEDIA_PREP_JPEG_QUALITY
+)
@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+from typing import Optional
+
+# Bytes needed to tell every supported container apart
+SNIFF_BYTES = 32
+
+# ISO base media brands (bytes 8-12 after "ftyp")
+_QUICKTIME_BRANDS = {b"qt  "}
+_MP4_BRANDS = {b"isom", b"iso2", b"iso4", b"iso5", b"iso6", b"mp41", b"mp42", b"avc1", b"M4V ", b"M4VP", b"dash", b"3gp4", b"3gp5", b"3g2a"}
+_HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"mif1", b"msf1", b"avif"}
+
+class UnsupportedMediaError(Exception):
+    """Downloaded bytes that are not media Instagram can take."""
+
+class MediaTooLargeError(UnsupportedMediaError):
+    def __init__(self, size: int, max_size: int):
+        self.size = size
+        self.max_size = max_size
+        super().__init__(f"Media exceeds the {max_size} byte limit (at least {size} bytes)")
+
+@dataclass(frozen=True)
+class MediaFormat:
+    media_type: str  # "image" or "video"
+    content_type: str
+    ext: str
+
+JPEG = MediaFormat("image", "image/jpeg", ".jpg")
+PNG = MediaFormat("image", "image/png", ".png")
+GIF = MediaFormat("image", "image/gif", ".gif")
+WEBP = MediaFormat("image", "image/webp", ".webp")
+MP4 = MediaFormat("video", "video/mp4", ".mp4")
+QUICKTIME = MediaFormat("video", "video/quicktime", ".mov")
+WEBM = MediaFormat("video", "video/webm", ".webm")
+AVI = MediaFormat("video", "video/x-msvideo", ".avi")
+
+def detect_media_format(head: bytes) -> Optional[MediaFormat]:
+    """
+    Identify a media container from its leading bytes.
+
+    Args:
+        head: The first SNIFF_BYTES bytes of the file (fewer if it is shorter)
+
+    Returns:
+        The detected format, or None if it is not a supported one
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return JPEG
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return PNG
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return GIF
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return WEBP
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return AVI
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return WEBM
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in _QUICKTIME_BRANDS:
+            return QUICKTIME
+        if brand in _MP4_BRANDS:
+            return MP4
+        # HEIF/AVIF stills need codecs neither Pillow nor Instagram uploads support here
+        return None
+    if head[4:8] in (b"moov", b"mdat", b"wide", b"free"):
+        # Old QuickTime files start straight with an atom, without ftyp
+        return QUICKTIME
+    return None
+
+def sniff_media(head: bytes) -> MediaFormat:
+    """
+    Like detect_media_format, but raise for anything unsupported.
+
+    Raises:
+        UnsupportedMediaError: If the bytes are not a supported format
+    """
+    media_format = detect_media_format(head)
+    if media_format is None:
+        if head[4:8] == b"ftyp" and head[8:12] in _HEIF_BRANDS:
+            raise UnsupportedMediaError(f"Unsupported HEIF/AVIF media (brand {head[8:12].decode(errors='replace')})")
+        preview = head[:16].decode("ascii", errors="replace").strip()
+        raise UnsupportedMediaError(f"Unrecognized media format (starts with {preview!r})")
+    return media_format
+
+def sniff_file(path: str) -> MediaFormat:
+    """Sniff the format of a file on disk."""
+    with open(path, "rb") as f:
+        return sniff_media(f.read(SNIFF_BYTES))
@@ -0,0 +1,200 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class StoredBlob:
+    sha256: str
+    path: str
+    size: int
+    content_type: Optional[str] = None
+
+class BlobWriter:
+    def __init__(self, tmp_path: Path, resume: bool = False):
+        """
+        Temp file that hashes bytes as they are written.
+
+        With resume, bytes already in the file are kept and re-hashed, and
+        the file is locked so only one writer appends to it at a time.
+
+        Raises:
+            BlockingIOError: If resume is set and another writer holds the file
+        """
+        self.tmp_path = tmp_path
+        self.meta_path = tmp_path.with_suffix(".json")
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        if not resume:
+            self._file = open(tmp_path, 'wb')
+            return
+
+        self._file = open(tmp_path, 'a+b')
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._file.close()
+            raise
+        # Reading local bytes back is far cheaper than fetching them again
+        self._file.seek(0)
+        for block in iter(lambda: self._file.read(1024 * 1024), b''):
+            self.hasher.update(block)
+            self.size += len(block)
+
+    def write(self, chunk: bytes):
+        self.hasher.update(chunk)
+        self.size += len(chunk)
+        self._file.write(chunk)
+
+    def flush(self):
+        self._file.flush()
+
+    def truncate(self):
+        """Drop everything written so far and start over."""
+        self._file.seek(0)
+        self._file.truncate()
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def load_meta(self) -> Dict:
+        """Return the metadata saved alongside a resumable temp file."""
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_meta(self, meta: Dict):
+        """Persist metadata (e.g. HTTP validators) needed to resume later."""
+        tmp_meta = self.meta_path.with_suffix(".json.tmp")
+        with open(tmp_meta, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, self.meta_path)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def discard_meta(self):
+        try:
+            self.meta_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def discard(self):
+        """Close and remove the temp file and its metadata."""
+        self.close()
+        try:
+            self.tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+        self.discard_meta()
+
+class MediaStore:
+    def __init__(self, root: str):
+        """
+        Initialize a content-addressed media store.
+
+        Blobs are stored once under their SHA-256, fanned out into
+        two-character subdirectories to keep directory listings small.
+
+        Args:
+            root: Directory the blobs are stored in
+        """
+        self.root = Path(root)
+        self.tmp_dir = self.root / "tmp"
+
+    def blob_path(self, sha256: str, ext: str = "") -> Path:
+        """Return the final path of a blob."""
+        return self.root / sha256[:2] / f"{sha256}{ext}"
+
+    def writer(self, key: Optional[str] = None) -> BlobWriter:
+        """
+        Open a hashing writer on a temp file.
+
+        Args:
+            key: Stable name for a resumable temp file; bytes left there by an
+                interrupted writer with the same key are picked up again
+
+        Returns:
+            The writer; check writer.size for how much was resumed
+        """
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        if key:
+            try:
+                return BlobWriter(self.tmp_dir / f"{key}.part", resume=True)
+            except BlockingIOError:
+                logger.info(f"Temp file {key} is in use, writing to a private one")
+        return BlobWriter(self.tmp_dir / f"{os.urandom(8).hex()}.part")
+
+    def commit(self, writer: BlobWriter, ext: str = "", content_type: Optional[str] = None) -> StoredBlob:
+        """
+        Move a finished temp file to its content address.
+
+        If a blob with the same hash already exists the temp file is dropped,
+        so identical media is only ever stored once.
+
+        Args:
+            writer: Writer holding the downloaded bytes
+            ext: File extension for the blob
+            content_type: Content type reported by the origin
+
+        Returns:
+            The stored blob
+        """
+        writer.flush()
+        sha256 = writer.hasher.hexdigest()
+        path = self.blob_path(sha256, ext)
+
+        if path.exists():
+            writer.discard()
+            logger.info(f"Blob {sha256} already stored, skipped duplicate write")
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Rename while still holding the lock so no resuming writer can
+            # open the finished file and append to it
+            os.replace(writer.tmp_path, path)
+            writer.close()
+            writer.discard_meta()
+
+        return StoredBlob(sha256=sha256, path=str(path), size=writer.size, content_type=content_type)
+
+    def delete(self, path: str):
+        """Unlink a blob from disk."""
+        try:
+            os.remove(path)
+            logger.info(f"Removed blob: {path}")
+        except FileNotFoundError:
+            pass
+
+    def sweep_tmp(self, max_age_seconds: int) -> int:
+        """
+        Remove abandoned temp files, e.g. downloads that were never resumed.
+
+        Files being written (locked or recently modified) are left alone.
+
+        Returns:
+            Number of files removed
+        """
+        if not self.tmp_dir.exists():
+            return 0
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for path in self.tmp_dir.iterdir():
+            try:
+                if path.stat().st_mtime >= cutoff:
+                    continue
+                with open(path, 'rb') as f:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    path.unlink()
+                removed += 1
+            except (FileNotFoundError, BlockingIOError):
+                continue
+        return removed
@@ -0,0 +1,159 @@
+import logging
+import os
+from typing import Callable, Dict, Iterable, Optional, Tuple, Type
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+from .failures import FAILURE_CLASSES
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "instagram_reposter"
+
+# Network operations take from tens of milliseconds to minutes for large videos
+OPERATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Schedule lag goes from sub-second on a healthy queue to hours in a backlog
+LAG_BUCKETS = (0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 4 * 3600, 24 * 3600)
+
+OPERATION_ERRORS = Counter(
+    f"{PREFIX}_operation_errors_total",
+    "Failed operations by operation and exception class",
+    ["operation", "error"]
+)
+
+class OperationMetrics:
+    def __init__(self, name: str, documentation: str, outcomes: Iterable[str] = ("success", "failure")):
+        """
+        Latency histogram of one operation, split by outcome.
+
+        Children for every outcome and every error class seen are bound once
+        and reused, so recording in the hot path is a dict lookup and an
+        observe, with no label dicts built per call. The histogram's _count
+        series doubles as the per-outcome counter.
+
+        Args:
+            name: Operation name, e.g. "download"
+            documentation: Help text of the histogram
+            outcomes: Every outcome label value the operation reports
+        """
+        self.name = name
+        self.seconds = Histogram(
+            f"{PREFIX}_{name}_seconds",
+            documentation,
+            ["outcome"],
+            buckets=OPERATION_BUCKETS
+        )
+        self._outcomes = {outcome: self.seconds.labels(outcome) for outcome in outcomes}
+        self._errors: Dict[Type[BaseException], Counter] = {}
+
+    def observe(self, outcome: str, seconds: float):
+        self._outcomes[outcome].observe(seconds)
+
+    def failure(self, seconds: float, error: BaseException, outcome: str = "failure"):
+        """Record a failed call and count it under the exception's class."""
+        self._outcomes[outcome].observe(seconds)
+        error_class = type(error)
+        counter = self._errors.get(error_class)
+        if counter is None:
+            counter = self._errors.setdefault(error_class, OPERATION_ERRORS.labels(self.name, error_class.__name__))
+        counter.inc()
+
+download_metrics = OperationMetrics("download", "Media download duration")
+login_metrics = OperationMetrics(
+    "login",
+    "Instagram login duration; restored sessions are only validated, without a password login",
+    outcomes=("success", "restored", "failure", "rate_limited")
+)
+upload_metrics = OperationMetrics(
+    "upload",
+    "Instagram upload duration, including a re-login when the session was rejected",
+    outcomes=("success", "failure", "rate_limited")
+)
+
+SCHEDULE_LAG_SECONDS = Histogram(
+    f"{PREFIX}_schedule_lag_seconds",
+    "Delay between a post's scheduled time and when it was published",
+    ["lane"],
+    buckets=LAG_BUCKETS
+)
+_schedule_lag_by_lane: Dict[str, Histogram] = {}
+
+def observe_schedule_lag(lane: str, seconds: float):
+    child = _schedule_lag_by_lane.get(lane)
+    if child is None:
+        child = _schedule_lag_by_lane.setdefault(lane, SCHEDULE_LAG_SECONDS.labels(lane))
+    child.observe(max(0.0, seconds))
+
+POST_FAILURES = Counter(
+    f"{PREFIX}_post_failures_total",
+    "Failed attempts at publishing a scheduled post, by failure class and what happened next",
+    ["failure", "outcome"]
+)
+# Every failure class and outcome is known up front, so all children are bound here
+_post_failures: Dict[Tuple[str, str], Counter] = {
+    (failure, outcome): POST_FAILURES.labels(failure, outcome)
+    for failure in sorted(FAILURE_CLASSES)
+    for outcome in ("retried", "dead_lettered")
+}
+
+def observe_post_failure(failure: str, outcome: str):
+    """Count a failed attempt; outcome is "retried" or "dead_lettered"."""
+    _post_failures[(failure, outcome)].inc()
+
+class QueueDepthCollector:
+    def __init__(self, read_depths: Callable[[], Dict[Tuple[str, str], int]]):
+        """
+        Reports broker queue depth at scrape time.
+
+        Args:
+            read_depths: Returns waiting messages keyed by (queue, lane)
+        """
+        self.read_depths = read_depths
+
+    @staticmethod
+    def _family() -> GaugeMetricFamily:
+        return GaugeMetricFamily(
+            f"{PREFIX}_queue_depth",
+            "Messages waiting in each Celery queue, by priority lane",
+            labels=["queue", "lane"]
+        )
+
+    def describe(self):
+        # Lets the registry check names without touching the broker
+        yield self._family()
+
+    def collect(self):
+        try:
+            depths = self.read_depths()
+        except Exception as e:
+            # A broker outage shouldn't fail the whole scrape
+            logger.error(f"Failed to read queue depths: {str(e)}")
+            return
+        family = self._family()
+        for (queue, lane), depth in sorted(depths.items()):
+            family.add_metric([queue, lane], depth)
+        yield family
+
+def scrape_registry() -> CollectorRegistry:
+    """
+    Registry to serve on /metrics.
+
+    With PROMETHEUS_MULTIPROC_DIR set (prefork workers, several API
+    processes), this aggregates the metric files of every process;
+    otherwise it is the process-wide default registry.
+    """
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    from prometheus_client import multiprocess
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+def start_exporter(port: int, registry: Optional[CollectorRegistry] = None):
+    """Serve metrics over HTTP from a background thread, e.g. in a worker."""
+    from prometheus_client import start_http_server
+
+    start_http_server(port, registry=registry or scrape_registry())
+    logger.info(f"Serving metrics on port {port}")
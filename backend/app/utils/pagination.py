@@ -0,0 +1,36 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from .timestamps import naive_utc
+
+def encode_cursor(sort_value: datetime, row_id: str) -> str:
+    """
+    Encode the last row of a page as an opaque keyset cursor.
+
+    Args:
+        sort_value: Value of the column the listing is ordered by
+        row_id: Primary key of the row, used as a tie-breaker
+
+    Returns:
+        URL-safe cursor string
+    """
+    payload = json.dumps([sort_value.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, str]]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return naive_utc(datetime.fromisoformat(sort_value)), str(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+class RateLimitExceeded(Exception):
+    def __init__(self, key: str, retry_after: float):
+        """Raised when a call would exceed the budget for a key."""
+        self.key = key
+        self.retry_after = retry_after
+        super().__init__(f"Rate limit exceeded for {key}, retry in {retry_after:.1f}s")
+
+@dataclass
+class RateLimitStatus:
+    remaining: float
+    capacity: int
+    next_available_at: datetime
+
+class InMemoryBucketBackend:
+    def __init__(self):
+        """Token buckets kept in this process, for tests and single-node use."""
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, rate: float, requested: int) -> Tuple[bool, float, float]:
+        """
+        Refill a bucket and try to take tokens from it.
+
+        Args:
+            key: Bucket key
+            capacity: Maximum number of tokens in the bucket
+            rate: Tokens added per second
+            requested: Tokens to take; 0 only inspects the bucket
+
+        Returns:
+            (allowed, tokens left, seconds until one more token is available)
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated_at = self._buckets.get(key, (float(capacity), now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+
+            needed = max(requested, 1)
+            if tokens >= needed:
+                allowed = True
+                tokens -= requested
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            else:
+                allowed = requested == 0
+                wait = (needed - tokens) / rate
+
+            if requested:
+                self._buckets[key] = (tokens, now)
+            return allowed, tokens, wait
+
+class RedisBucketBackend:
+    # Refill and take atomically on the server, using the server clock so
+    # every worker agrees on the bucket state.
+    SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local needed = math.max(requested, 1)
+local allowed = 0
+local wait = 0
+if tokens >= needed then
+    allowed = 1
+    tokens = tokens - requested
+    if tokens < 1 then wait = (1 - tokens) / rate end
+else
+    if requested == 0 then allowed = 1 end
+    wait = (needed - tokens) / rate
+end
+if requested > 0 then
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) * 2)
+end
+return {allowed, tostring(tokens), tostring(wait)}
+"""
+
+    def __init__(self, redis_url: str, prefix: str = "ratelimit:"):
+        """Token buckets shared by all processes through Redis."""
+        import redis
+
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(redis_url)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    def take(self, key: str, capacity: int, rate: float, requested: int) -> Tuple[bool, float, float]:
+        allowed, tokens, wait = self._script(
+            keys=[f"{self.prefix}{key}"],
+            args=[capacity, rate, requested]
+        )
+        return bool(allowed), float(tokens), float(wait)
+
+class TokenBucketRateLimiter:
+    def __init__(self, backend, capacity: int, per_seconds: float, refill_tokens: Optional[int] = None):
+        """
+        Initialize a token bucket rate limiter.
+
+        Args:
+            backend: Bucket storage (InMemoryBucketBackend or RedisBucketBackend)
+            capacity: Burst size, the most calls allowed back-to-back
+            per_seconds: Window the refill_tokens budget applies to
+            refill_tokens: Calls allowed per window, defaults to capacity
+        """
+        self.backend = backend
+        self.capacity = capacity
+        self.rate = (refill_tokens or capacity) / per_seconds
+
+    def acquire(self, key: str, tokens: int = 1):
+        """Take tokens for a key or raise RateLimitExceeded with the wait time."""
+        allowed, _, wait = self.backend.take(key, self.capacity, self.rate, tokens)
+        if not allowed:
+            logger.info(f"Rate limit reached for {key}, next slot in {wait:.1f}s")
+            raise RateLimitExceeded(key, wait)
+
+    def status(self, key: str) -> RateLimitStatus:
+        """Return the remaining budget and next available time for a key."""
+        _, tokens, wait = self.backend.take(key, self.capacity, self.rate, 0)
+        return RateLimitStatus(
+            remaining=tokens,
+            capacity=self.capacity,
+            next_available_at=datetime.utcnow() + timedelta(seconds=wait)
+        )
+
+def _create_instagram_rate_limiter() -> TokenBucketRateLimiter:
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        backend = RedisBucketBackend(settings.REDIS_URL)
+    else:
+        backend = InMemoryBucketBackend()
+    return TokenBucketRateLimiter(
+        backend,
+        capacity=settings.INSTAGRAM_RATE_LIMIT_BURST,
+        per_seconds=3600,
+        refill_tokens=settings.INSTAGRAM_RATE_LIMIT
+    )
+
+instagram_rate_limiter = _create_instagram_rate_limiter()
@@ -0,0 +1,200 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from ..config import settings
+from .encryption import encrypt_credentials, decrypt_credentials
+from .instagram import InstagramClient
+from .rate_limiter import instagram_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+class SessionStore:
+    def __init__(self, session_dir: Path):
+        """Initialize session store that keeps one encrypted file per account."""
+        self.session_dir = Path(session_dir)
+
+    def _path(self, account_id: str) -> Path:
+        return self.session_dir / f"{os.path.basename(account_id)}.session"
+
+    def load(self, account_id: str) -> Optional[Dict]:
+        """
+        Load stored instagrapi settings for an account.
+
+        Args:
+            account_id: ID of the Instagram account
+
+        Returns:
+            Session settings, or None if nothing usable is stored
+        """
+        path = self._path(account_id)
+        if not path.exists():
+            return None
+        try:
+            return decrypt_credentials(path.read_text())
+        except Exception as e:
+            logger.error(f"Discarding unreadable session for account {account_id}: {str(e)}")
+            self.delete(account_id)
+            return None
+
+    def save(self, account_id: str, session_settings: Dict):
+        """Persist instagrapi settings for an account."""
+        self.session_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(account_id)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(encrypt_credentials(session_settings))
+        os.replace(tmp_path, path)
+
+    def delete(self, account_id: str):
+        """Remove the stored session for an account."""
+        try:
+            self._path(account_id).unlink()
+        except FileNotFoundError:
+            pass
+
+class _FifoLock:
+    def __init__(self):
+        """Reentrant lock that admits waiting threads in arrival order."""
+        self._cond = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+        self._owner: Optional[int] = None
+        self._depth = 0
+        self.users = 0  # threads holding or waiting; guarded by AccountLocks
+
+    def acquire(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._owner == me:
+                self._depth += 1
+                return
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while ticket != self._serving:
+                self._cond.wait()
+            self._owner = me
+            self._depth = 1
+
+    def release(self):
+        with self._cond:
+            self._depth -= 1
+            if self._depth:
+                return
+            self._owner = None
+            self._serving += 1
+            self._cond.notify_all()
+
+class AccountLocks:
+    def __init__(self):
+        """
+        One FIFO lock per account, created on demand and dropped when idle.
+
+        Lets a threaded worker run uploads for many accounts at once while
+        each account still posts strictly one at a time, in arrival order.
+        """
+        self._lock = threading.Lock()
+        self._locks: Dict[str, _FifoLock] = {}
+
+    @contextmanager
+    def hold(self, account_id: str) -> Iterator[None]:
+        with self._lock:
+            lock = self._locks.setdefault(account_id, _FifoLock())
+            lock.users += 1
+        try:
+            lock.acquire()
+            try:
+                yield
+            finally:
+                lock.release()
+        finally:
+            with self._lock:
+                lock.users -= 1
+                if not lock.users:
+                    del self._locks[account_id]
+
+class SessionManager:
+    def __init__(self, store: SessionStore, max_clients: int = 32, rate_limiter=None):
+        """
+        Initialize session manager.
+
+        Args:
+            store: Persistent store for serialized sessions
+            max_clients: Maximum number of live clients kept in this process
+            rate_limiter: Optional per-account limiter handed to every client
+        """
+        self.store = store
+        self.max_clients = max_clients
+        self.rate_limiter = rate_limiter
+        self._clients: "OrderedDict[str, InstagramClient]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._account_locks = AccountLocks()
+
+    def account_lock(self, account_id: str):
+        """
+        Context manager serializing work on one account.
+
+        instagrapi clients are not thread-safe, and Instagram expects one
+        action at a time per account, so hold this around every use of a
+        client. Reentrant, so get_client can be called while holding it.
+        """
+        return self._account_locks.hold(account_id)
+
+    def get_client(self, account_id: str, credentials: Dict[str, str]) -> InstagramClient:
+        """
+        Get a logged-in client for an account.
+
+        Live clients are reused from the in-process pool. Otherwise the stored
+        session is rehydrated, and a full login only happens when there is no
+        stored session or Instagram rejects it.
+
+        Args:
+            account_id: ID of the Instagram account
+            credentials: Decrypted username and password
+
+        Returns:
+            Logged-in Instagram client
+        """
+        # Logins for one account never race; other accounts aren't blocked
+        with self.account_lock(account_id):
+            with self._lock:
+                client = self._clients.get(account_id)
+                if client is not None and client.credentials == credentials:
+                    self._clients.move_to_end(account_id)
+                    return client
+
+            def persist(session_settings: Dict):
+                self.store.save(account_id, session_settings)
+
+            client = InstagramClient(
+                credentials,
+                session_settings=self.store.load(account_id),
+                on_login=persist,
+                rate_limiter=self.rate_limiter,
+                rate_limit_key=account_id
+            )
+            with self._lock:
+                self._clients[account_id] = client
+                self._clients.move_to_end(account_id)
+
+                while len(self._clients) > self.max_clients:
+                    evicted_id, _ = self._clients.popitem(last=False)
+                    logger.info(f"Evicted Instagram client for account {evicted_id} from pool")
+
+            return client
+
+    def invalidate(self, account_id: str, forget_session: bool = False):
+        """Drop the live client for an account, and optionally its stored session."""
+        with self._lock:
+            self._clients.pop(account_id, None)
+        if forget_session:
+            self.store.delete(account_id)
+
+session_manager = SessionManager(
+    SessionStore(settings.SESSION_DIR),
+    max_clients=settings.INSTAGRAM_CLIENT_POOL_SIZE,
+    rate_limiter=instagram_rate_limiter
+)
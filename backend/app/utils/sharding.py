@@ -0,0 +1,46 @@
+import hashlib
+from typing import List
+
+SHARD_QUEUE_PREFIX = "instagram"
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Jump consistent hash (Lamping & Veach) of a 64-bit key.
+
+    Growing from n to n + 1 buckets moves only 1/(n + 1) of the keys, all
+    of them into the new bucket, so resharding is predictable.
+
+    Args:
+        key: Unsigned 64-bit integer key
+        buckets: Number of buckets, at least 1
+
+    Returns:
+        Bucket index in [0, buckets)
+    """
+    if buckets < 1:
+        raise ValueError("buckets must be at least 1")
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+def account_shard(account_id: str, shards: int) -> int:
+    """Shard an account's tasks are routed to; stable across processes and restarts."""
+    digest = hashlib.blake2b(account_id.encode(), digest_size=8).digest()
+    return jump_hash(int.from_bytes(digest, "big"), shards)
+
+def shard_queue(shard: int) -> str:
+    return f"{SHARD_QUEUE_PREFIX}.{shard}"
+
+def worker_shard_queues(worker_index: int, worker_count: int, shards: int) -> List[str]:
+    """
+    Shard queues a posting worker consumes.
+
+    Shards are dealt round-robin, so every shard has exactly one owner as
+    long as each worker has a distinct index below worker_count.
+    """
+    if not 0 <= worker_index < worker_count:
+        raise ValueError(f"Worker index {worker_index} is outside 0..{worker_count - 1}")
+    return [shard_queue(shard) for shard in range(worker_index, shards, worker_count)]
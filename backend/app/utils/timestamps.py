@@ -0,0 +1,14 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Convert a datetime to the naive UTC the database columns hold.
+
+    Columns are TIMESTAMP WITHOUT TIME ZONE in UTC; asyncpg refuses to bind
+    aware values to them, so offsets from clients ("Z", "+02:00") are
+    applied here. Naive values are taken to be UTC already.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
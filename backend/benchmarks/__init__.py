@@ -0,0 +1,9 @@
+"""
+Benchmarks that run the real task and API code against local stand-ins.
+
+Instagram is replaced by a fake instagrapi Client with configurable latency
+and failure rates, the media CDN by a local aiohttp server, Redis and
+Postgres by eager Celery and SQLite. Run from backend/:
+
+    PYTHONPATH=.:.. python -m benchmarks --output results.json
+"""
@@ -0,0 +1,339 @@
+"""
+Capacity test: how many accounts and posts/day a worker fleet sustains.
+
+Each load point runs in a fresh process against a fresh database. Accounts
+and prepared media are seeded directly; the day's schedule is created
+through the bulk scheduling API, the dispatcher claims due posts on its
+beat interval and an in-process Celery worker publishes them to the fake
+Instagram. Sweeping the load gives a capacity curve:
+
+    python -m benchmarks.capacity --accounts 50 200 --posts 250 500 1000 2000
+"""
+import argparse
+import asyncio
+import logging
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from . import environment
+from .results import percentile, run_metadata, write_results
+from .stand_ins import InstagramBehaviour
+from .workload import WorkloadShape, schedule_times
+
+logger = logging.getLogger(__name__)
+
+class QueryCounter:
+    def __init__(self, engines: Sequence):
+        """
+        Counts statements sent to the database by the code under test.
+
+        Threads inside paused() are not counted, so polling for progress
+        doesn't inflate the per-post figure.
+        """
+        from sqlalchemy import event
+
+        self._event = event
+        self._engines = list(engines)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if getattr(self._local, "paused", False):
+            return
+        with self._lock:
+            self.count += 1
+
+    def __enter__(self) -> "QueryCounter":
+        for engine in self._engines:
+            self._event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc_info):
+        for engine in self._engines:
+            self._event.remove(engine, "before_cursor_execute", self._on_execute)
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        self._local.paused = True
+        try:
+            yield
+        finally:
+            self._local.paused = False
+
+class DispatcherLoop(threading.Thread):
+    def __init__(self, interval: float):
+        """Runs dispatch_due_posts every interval seconds, standing in for beat."""
+        super().__init__(name="capacity-dispatcher", daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        from app.tasks.instagram_tasks import dispatch_due_posts
+
+        while not self._stopped.is_set():
+            try:
+                dispatch_due_posts()
+            except Exception as e:
+                logger.error(f"Dispatcher run failed: {str(e)}")
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+        self.join(self.interval + 10)
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+async def _schedule_through_api(items: List[Dict], batch: int) -> Tuple[List[str], int]:
+    """Create the schedules with the bulk endpoint; returns their IDs and rejections."""
+    import httpx
+
+    from app.main import app
+
+    schedule_ids: List[str] = []
+    rejected = 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://capacity") as client:
+        for offset in range(0, len(items), batch):
+            response = await client.post("/api/scheduler/schedule/bulk", json={"items": items[offset:offset + batch]})
+            response.raise_for_status()
+            body = response.json()
+            rejected += body["rejected"]
+            schedule_ids.extend(result["id"] for result in body["results"] if result["status"] == "scheduled")
+    return schedule_ids, rejected
+
+def _unsettled(db) -> int:
+    """Schedules that are neither posted nor finally failed."""
+    from app.database import models
+
+    return db.query(models.ScheduledPost)\
+        .join(models.MediaPost)\
+        .filter(models.ScheduledPost.is_processed == False)\
+        .filter(models.MediaPost.status != models.PostStatus.FAILED)\
+        .count()
+
+def run_point(options: Dict) -> Dict:
+    """
+    Measure one load point; runs in its own process.
+
+    Args:
+        options: The parsed CLI options plus accounts, posts and workdir
+
+    Returns:
+        On-time share, lag percentiles, queries per post and memory
+    """
+    workdir = Path(options["workdir"])
+    environment.configure(workdir, {
+        "POST_ON_TIME_SECONDS": str(options["on_time_seconds"]),
+        "DISPATCH_LOOKAHEAD_SECONDS": str(options["lookahead"]),
+    })
+    logging.basicConfig(level=logging.WARNING)
+    environment.setup_app(eager=False)
+
+    from celery.contrib.testing.worker import start_worker
+
+    from app.config import settings
+    from app.database import models
+    from app.database.session import SessionLocal, async_engine, engine
+    from app.tasks.instagram_tasks import celery_app
+    from app.utils.sharding import shard_queue
+    from .seed import make_prepared_image, seed_accounts, seed_prepared_posts
+    from .stand_ins import FakeInstagrapiClient, install_fake_instagram
+
+    install_fake_instagram(InstagramBehaviour(
+        login_latency=options["login_latency"],
+        upload_latency=options["upload_latency"],
+        failure_rate=options["upload_failure_rate"],
+        seed=options["seed"]
+    ))
+    baseline_rss = _peak_rss_mb()
+
+    accounts, posts, window = options["accounts"], options["posts"], options["window"]
+    db = SessionLocal()
+    try:
+        prepared = make_prepared_image(workdir / "prepared.jpg")
+        account_ids = seed_accounts(db, accounts)
+        post_ids = seed_prepared_posts(db, account_ids, posts, prepared)
+    finally:
+        db.close()
+
+    rng = random.Random(options["seed"])
+    shape = WorkloadShape(burst_share=options["burst_share"], diurnal_amplitude=options["diurnal_amplitude"])
+    start = datetime.utcnow() + timedelta(seconds=options["lead"])
+    times = schedule_times(posts, start, window, shape, rng)
+    # Busy hours shouldn't all belong to the same few accounts
+    rng.shuffle(post_ids)
+    items = [
+        {"media_post_id": post_id, "scheduled_time": scheduled_time.isoformat()}
+        for post_id, scheduled_time in zip(post_ids, times)
+    ]
+
+    queues = ["instagram"] + [shard_queue(shard) for shard in range(settings.INSTAGRAM_QUEUE_SHARDS)]
+    counter = QueryCounter([engine, async_engine.sync_engine])
+    with counter:
+        started = time.perf_counter()
+        schedule_ids, rejected = asyncio.run(_schedule_through_api(items, options["bulk_batch"]))
+        api_seconds = time.perf_counter() - started
+        api_queries = counter.count
+
+        deadline = start + timedelta(seconds=window + options["drain"])
+        with start_worker(
+            celery_app,
+            concurrency=options["worker_threads"],
+            pool="threads",
+            perform_ping_check=False,
+            shutdown_timeout=options["upload_latency"] * 4 + 30,
+            queues=queues
+        ):
+            dispatcher = DispatcherLoop(options["dispatch_interval"])
+            dispatcher.start()
+            unsettled = len(schedule_ids)
+            while unsettled and datetime.utcnow() < deadline:
+                time.sleep(0.5)
+                with counter.paused():
+                    db = SessionLocal()
+                    try:
+                        unsettled = _unsettled(db)
+                    finally:
+                        db.close()
+            dispatcher.stop()
+        wall = time.perf_counter() - started
+
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            models.ScheduledPost.scheduled_time,
+            models.ScheduledPost.processed_at,
+            models.ScheduledPost.retry_count,
+            models.MediaPost.status
+        ).join(models.MediaPost).all()
+    finally:
+        db.close()
+
+    lags = sorted(
+        (processed_at - scheduled_time).total_seconds()
+        for scheduled_time, processed_at, _, _ in rows
+        if processed_at
+    )
+    on_time = sum(1 for lag in lags if lag <= options["on_time_seconds"])
+    failed = sum(1 for _, _, _, status in rows if status == models.PostStatus.FAILED)
+    return {
+        "accounts": accounts,
+        "posts": posts,
+        "posts_per_day": round(posts * 86400 / window),
+        "posts_per_second": round(posts / window, 3),
+        "scheduled": len(schedule_ids),
+        "rejected": rejected,
+        "posted": len(lags),
+        "failed": failed,
+        "unfinished": len(rows) - len(lags) - failed,
+        "retried": sum(1 for _, _, retry_count, _ in rows if retry_count),
+        "on_time_pct": round(100 * on_time / posts, 2) if posts else None,
+        "lag_seconds": {
+            "p50": percentile(lags, 50),
+            "p90": percentile(lags, 90),
+            "p99": percentile(lags, 99),
+            "max": lags[-1] if lags else None,
+        },
+        "db_queries": {
+            "api": api_queries,
+            "dispatch_and_workers": counter.count - api_queries,
+            "per_post": round(counter.count / posts, 2) if posts else None,
+        },
+        "memory_mb": {
+            "baseline_rss": baseline_rss,
+            "peak_rss": _peak_rss_mb(),
+        },
+        "api_seconds": round(api_seconds, 3),
+        "wall_seconds": round(wall, 3),
+        "logins": FakeInstagrapiClient.logins,
+        "uploads": FakeInstagrapiClient.uploads,
+    }
+
+def measure_point(options: Dict) -> Dict:
+    """Run one load point in a fresh interpreter, so memory and settings don't carry over."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(run_point, options).result()
+
+def sustained(curve: List[Dict], target_pct: float) -> Dict[str, int]:
+    """Highest posts/day per account count that still met the on-time target."""
+    best: Dict[str, int] = {}
+    for point in curve:
+        if point["on_time_pct"] is not None and point["on_time_pct"] >= target_pct:
+            key = str(point["accounts"])
+            best[key] = max(best.get(key, 0), point["posts_per_day"])
+    return best
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.capacity",
+        description="Sweep synthetic load through API, dispatcher and worker and report a capacity curve."
+    )
+    parser.add_argument("--accounts", type=int, nargs="+", default=[50], help="Account counts to sweep")
+    parser.add_argument("--posts", type=int, nargs="+", default=[250, 500, 1000, 2000], help="Posts per compressed day to sweep")
+    parser.add_argument("--output", default="-", help="Where to write the JSON results (default: stdout)")
+    parser.add_argument("--workdir", help="Directory for the per-point databases and media (default: a fresh temp dir)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--target-on-time", type=float, default=99.0, help="On-time percentage a point must reach to count as sustained")
+
+    group = parser.add_argument_group("workload")
+    group.add_argument("--window", type=float, default=120.0, help="Real seconds standing in for one day of schedules")
+    group.add_argument("--lead", type=float, default=10.0, help="Seconds between scheduling and the start of the day")
+    group.add_argument("--drain", type=float, default=60.0, help="Seconds after the day to let the backlog finish")
+    group.add_argument("--burst-share", type=float, default=0.4, help="Share of posts set exactly on the hour or half hour")
+    group.add_argument("--diurnal-amplitude", type=float, default=0.6, help="0 spreads posts evenly over the day")
+    group.add_argument("--bulk-batch", type=int, default=500, help="Items per bulk scheduling request")
+
+    group = parser.add_argument_group("fleet")
+    group.add_argument("--worker-threads", type=int, default=32, help="Concurrent posting tasks, like -P threads --concurrency")
+    group.add_argument("--dispatch-interval", type=float, default=10.0, help="Seconds between dispatcher runs, like DISPATCH_INTERVAL_SECONDS")
+    group.add_argument("--lookahead", type=int, default=30, help="DISPATCH_LOOKAHEAD_SECONDS")
+    group.add_argument("--on-time-seconds", type=int, default=60, help="POST_ON_TIME_SECONDS; later posts count as late")
+
+    group = parser.add_argument_group("instagram stand-in")
+    group.add_argument("--login-latency", type=float, default=0.2)
+    group.add_argument("--upload-latency", type=float, default=0.5)
+    group.add_argument("--upload-failure-rate", type=float, default=0.0)
+    return parser
+
+def main(argv=None):
+    """Measure every load point and write the capacity curve."""
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="reposter-capacity-"))
+
+    curve: List[Dict] = []
+    for accounts in args.accounts:
+        for posts in args.posts:
+            print(f"Measuring {accounts} accounts, {posts} posts...", file=sys.stderr)
+            options = dict(vars(args), accounts=accounts, posts=posts, workdir=str(workdir / f"a{accounts}-p{posts}"))
+            point = measure_point(options)
+            curve.append(point)
+            print(
+                f"  {point['posts_per_day']} posts/day: {point['on_time_pct']}% on time, "
+                f"p99 lag {point['lag_seconds']['p99']}s, {point['db_queries']['per_post']} queries/post, "
+                f"peak RSS {point['memory_mb']['peak_rss']} MB",
+                file=sys.stderr
+            )
+
+    params = {key: value for key, value in vars(args).items() if key not in ("output", "workdir")}
+    write_results({
+        "meta": run_metadata(params),
+        "curve": curve,
+        "sustained_posts_per_day": sustained(curve, args.target_on_time),
+    }, args.output)
+
+if __name__ == "__main__":
+    main()
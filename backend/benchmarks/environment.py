@@ -0,0 +1,62 @@
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+def configure(workdir: Path, overrides: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Point the app at local stand-ins under workdir.
+
+    Must run before anything under app is imported, since settings and the
+    module-level singletons read the environment at import time.
+
+    Args:
+        workdir: Directory for the SQLite database, media store and sessions
+        overrides: Extra environment variables, applied last
+
+    Returns:
+        The variables that were set
+    """
+    workdir = Path(workdir)
+    env = {
+        "DATABASE_URL": f"sqlite:///{workdir / 'bench.db'}",
+        "MEDIA_STORAGE_PATH": str(workdir / "downloads"),
+        "SESSION_DIR": str(workdir / "sessions"),
+        "EVENTS_BACKEND": "memory",
+        "STATUS_CACHE_BACKEND": "memory",
+        "RATE_LIMIT_BACKEND": "memory",
+        "LANE_STATS_BACKEND": "memory",
+        # Throughput is the point; the fake Instagram enforces no limits
+        "INSTAGRAM_RATE_LIMIT": "1000000000",
+        "INSTAGRAM_RATE_LIMIT_BURST": "1000000000",
+        "WORKER_METRICS_PORT": "0",
+        "DOWNLOAD_RETRY_BACKOFF_SECONDS": "0.01",
+        # Any valid Fernet key; workers refuse to start without one
+        "ENCRYPTION_KEY": "YmVuY2htYXJrLWVuY3J5cHRpb24ta2V5LTMyYnl0ZXM=",
+    }
+    env.update(overrides or {})
+    os.environ.update(env)
+    for directory in ("downloads", "sessions"):
+        (workdir / directory).mkdir(parents=True, exist_ok=True)
+    return env
+
+def setup_app(eager: bool = True):
+    """
+    Create the schema and point Celery at an in-memory broker.
+
+    With eager, tasks run inline in the caller; otherwise they are queued
+    for a worker started in the same process.
+    """
+    from app.database import models
+    from app.database.session import engine
+    from app.tasks.instagram_tasks import celery_app
+
+    models.Base.metadata.create_all(bind=engine)
+    celery_app.conf.update(
+        task_always_eager=eager,
+        task_store_eager_result=False,
+        broker_url="memory://",
+        result_backend="cache+memory://"
+    )
+    # Bind every task to the settings above now; first use from several
+    # benchmark threads at once can otherwise see a half-bound task
+    celery_app.finalize(auto=True)
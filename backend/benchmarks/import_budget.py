@@ -0,0 +1,116 @@
+"""
+Import-time budget for the API process.
+
+Imports the API module in fresh interpreters and fails when the median
+import time exceeds the budget, when worker-only dependencies get pulled
+in, or when the import leaves files behind (a database, media folders):
+
+    python -m benchmarks.import_budget --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Only the workers need these; the API publishes tasks by name
+WORKER_ONLY_MODULES = (
+    "app.tasks.instagram_tasks",
+    "instagrapi",
+    "PIL",
+    "cryptography",
+)
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "loaded": [name for name in {forbidden!r} if name in sys.modules]}}))
+"""
+
+def measure_import(module: str, forbidden: Sequence[str], workdir: Path) -> Dict:
+    """Import module in a fresh interpreter, with workdir as cwd and home of any files."""
+    env = dict(
+        os.environ,
+        # The backend for app, its parent for celeryconfig
+        PYTHONPATH=os.pathsep.join(filter(None, [str(BACKEND_DIR), str(BACKEND_DIR.parent), os.getenv("PYTHONPATH")])),
+        DATABASE_URL=f"sqlite:///{workdir / 'import.db'}",
+        EVENTS_BACKEND="memory",
+        STATUS_CACHE_BACKEND="memory",
+        RATE_LIMIT_BACKEND="memory",
+        LANE_STATS_BACKEND="memory",
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, forbidden=tuple(forbidden))],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=workdir,
+        env=env
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def check(module: str, budget_ms: float, repeat: int, forbidden: Sequence[str]) -> Dict:
+    """
+    Measure an import and judge it against the budget.
+
+    Returns:
+        Median and per-run milliseconds, offending modules, files the
+        import created and the list of problems (empty when it passes)
+    """
+    runs: List[float] = []
+    loaded = set()
+    created = set()
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="reposter-import-") as workdir:
+            result = measure_import(module, forbidden, Path(workdir))
+            created.update(os.listdir(workdir))
+        runs.append(result["seconds"] * 1000)
+        loaded.update(result["loaded"])
+
+    median = statistics.median(runs)
+    problems = []
+    if median > budget_ms:
+        problems.append(f"import {module} took {median:.0f} ms, budget is {budget_ms:.0f} ms")
+    if loaded:
+        problems.append(f"import {module} pulled in {', '.join(sorted(loaded))}")
+    if created:
+        problems.append(f"import {module} created {', '.join(sorted(created))}")
+    return {
+        "module": module,
+        "median_ms": round(median, 1),
+        "runs_ms": [round(run, 1) for run in runs],
+        "budget_ms": budget_ms,
+        "loaded": sorted(loaded),
+        "created": sorted(created),
+        "problems": problems,
+    }
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.import_budget",
+        description="Fail when importing the API gets slow or starts doing work."
+    )
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="Allowed median import time")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters to take the median over")
+    parser.add_argument("--forbid", action="append", help="Modules the import must not load (default: worker-only dependencies)")
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    report = check(args.module, args.budget_ms, args.repeat, args.forbid or WORKER_ONLY_MODULES)
+    print(json.dumps(report, indent=2, sort_keys=True))
+    for problem in report["problems"]:
+        print(f"FAIL: {problem}", file=sys.stderr)
+    return 1 if report["problems"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence
+
+def percentile(ordered: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not ordered:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+class Recorder:
+    def __init__(self):
+        """Collects per-call latencies and errors, safe to share between threads."""
+        self.samples: List[float] = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.error()
+            raise
+        finally:
+            self.record(time.perf_counter() - started)
+
+def summarize(recorder: Recorder, wall_seconds: float, **extra) -> Dict:
+    """
+    Machine-readable summary of one benchmark.
+
+    Args:
+        recorder: Latencies of the individual operations
+        wall_seconds: Elapsed time of the whole run
+        extra: Benchmark-specific figures added as they are
+
+    Returns:
+        Counts, throughput and latency percentiles in seconds
+    """
+    ordered = sorted(recorder.samples)
+    count = len(ordered)
+    summary = {
+        "count": count,
+        "errors": recorder.errors,
+        "wall_seconds": round(wall_seconds, 6),
+        "throughput_per_second": round(count / wall_seconds, 3) if wall_seconds else None,
+        "latency_seconds": {
+            "mean": round(sum(ordered) / count, 6) if count else None,
+            "p50": percentile(ordered, 50),
+            "p90": percentile(ordered, 90),
+            "p99": percentile(ordered, 99),
+            "max": ordered[-1] if count else None,
+        },
+    }
+    summary.update(extra)
+    return summary
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_metadata(params: Dict) -> Dict:
+    """What a result was measured on, so runs can be compared across commits."""
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "started_at": datetime.utcnow().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": params,
+    }
+
+def write_results(results: Dict, path: Optional[str]):
+    """Write results as JSON to path, or to stdout when path is None or "-"."""
+    body = json.dumps(results, indent=2, sort_keys=True)
+    if not path or path == "-":
+        print(body)
+    else:
+        with open(path, "w") as f:
+            f.write(body + "\n")
+
+def compare(baseline: Dict, current: Dict) -> List[str]:
+    """
+    Lines comparing throughput and latency of two result files.
+
+    Positive throughput deltas and negative latency deltas are improvements.
+    """
+    lines = [f"baseline {baseline['meta'].get('commit')} -> current {current['meta'].get('commit')}"]
+    for name, result in sorted(current["results"].items()):
+        before = baseline["results"].get(name)
+        if before is None:
+            lines.append(f"{name}: new")
+            continue
+        parts = []
+        for label, old, new in (
+            ("throughput", before.get("throughput_per_second"), result.get("throughput_per_second")),
+            ("p50", before["latency_seconds"]["p50"], result["latency_seconds"]["p50"]),
+            ("p99", before["latency_seconds"]["p99"], result["latency_seconds"]["p99"]),
+        ):
+            if old and new is not None:
+                parts.append(f"{label} {old:.4g} -> {new:.4g} ({(new - old) / old:+.1%})")
+        lines.append(f"{name}: " + ", ".join(parts))
+    return lines
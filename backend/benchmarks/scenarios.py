@@ -0,0 +1,230 @@
+"""
+Failure-path scenarios run against the real task code.
+
+Each scenario seeds its own rows, drives the tasks by hand and returns the
+problems it found; the run fails when any scenario reports one. Tasks the
+code under test publishes are recorded instead of run, so a scenario can
+check what was sent without a worker:
+
+    python -m benchmarks.scenarios
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from . import environment
+
+MAX_DEFERRALS = 4
+
+def _published_tasks() -> List[Tuple[str, list]]:
+    """Record the name and args of every task published from now on."""
+    from celery.signals import before_task_publish
+
+    published: List[Tuple[str, list]] = []
+
+    def record(sender=None, body=None, **kwargs):
+        published.append((sender, list(body[0]) if body else []))
+
+    before_task_publish.connect(record, weak=False)
+    return published
+
+def _seed_due_post(db, **media_fields) -> Tuple[str, str]:
+    """Insert an account, a media post and a schedule that is due now."""
+    from app.database import models
+
+    from .seed import seed_accounts, seed_schedules
+
+    account_id = seed_accounts(db, 1)[0]
+    post_id = str(uuid.uuid4())
+    fields = dict(
+        id=post_id,
+        source_url=f"http://cdn.invalid/{post_id}.jpg",
+        media_type="image",
+        account_id=account_id,
+        status=models.PostStatus.SCHEDULED
+    )
+    fields.update(media_fields)
+    db.add(models.MediaPost(**fields))
+    db.commit()
+    schedule_id = seed_schedules(db, [post_id], [datetime.utcnow() - timedelta(seconds=1)])[0]
+    return post_id, schedule_id
+
+def purged_media_is_reingested(published: List[Tuple[str, list]]) -> List[str]:
+    """A post whose media was purged re-ingests it, then dead-letters if it never arrives."""
+    from app.database import models
+    from app.database.session import SessionLocal
+    from app.tasks.celery_app import INGEST_MEDIA_POST
+    from app.tasks.instagram_tasks import process_scheduled_post
+    from app.utils.failures import PERMANENT
+
+    problems = []
+    db = SessionLocal()
+    try:
+        post_id, schedule_id = _seed_due_post(db, purged_at=datetime.utcnow())
+        for attempt in range(MAX_DEFERRALS):
+            process_scheduled_post.apply(args=[schedule_id])
+            if attempt == 0 and (INGEST_MEDIA_POST, [post_id]) not in published:
+                problems.append("purged media was not sent to ingest when its post came due")
+        schedule = db.get(models.ScheduledPost, schedule_id)
+        if schedule.ingest_deferrals != MAX_DEFERRALS or schedule.dead_lettered_at:
+            problems.append(f"expected {MAX_DEFERRALS} deferrals, got {schedule.ingest_deferrals}")
+        process_scheduled_post.apply(args=[schedule_id])
+        db.refresh(schedule)
+        if not schedule.dead_lettered_at or schedule.failure_class != PERMANENT:
+            problems.append("post was deferred again after the ingest wait ran out")
+        elif "not stored" not in (schedule.last_error or ""):
+            problems.append(f"unclear last_error: {schedule.last_error!r}")
+    finally:
+        db.close()
+    return problems
+
+def redriven_failed_ingest_is_reingested(published: List[Tuple[str, list]]) -> List[str]:
+    """Re-driving a post whose download failed sends its media to ingest again."""
+    import httpx
+
+    from app.database import models
+    from app.database.session import SessionLocal
+    from app.main import app
+    from app.tasks.celery_app import INGEST_MEDIA_POST
+
+    async def redrive(schedule_id: str) -> Dict:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://scenarios") as client:
+            response = await client.post("/api/scheduler/dead-letters/redrive", json={"schedule_ids": [schedule_id]})
+            response.raise_for_status()
+            return response.json()
+
+    problems = []
+    db = SessionLocal()
+    try:
+        post_id, schedule_id = _seed_due_post(db, status=models.PostStatus.FAILED, error_message="download failed")
+        schedule = db.get(models.ScheduledPost, schedule_id)
+        schedule.dead_lettered_at = datetime.utcnow()
+        db.commit()
+        body = asyncio.run(redrive(schedule_id))
+        if body["schedule_ids"] != [schedule_id]:
+            problems.append(f"dead letter was not re-driven: {body}")
+        if (INGEST_MEDIA_POST, [post_id]) not in published or body["reingesting"] != [post_id]:
+            problems.append("media that failed to ingest was re-driven without a new download")
+    finally:
+        db.close()
+    return problems
+
+def unscheduled_media_survives_eviction(published: List[Tuple[str, list]]) -> List[str]:
+    """Quota eviction skips downloaded media that hasn't been scheduled yet."""
+    from app.database import models
+    from app.database.session import SessionLocal
+    from app.tasks.instagram_tasks import cleanup_old_media, media_downloader
+
+    from .seed import seed_accounts, seed_expired_posts
+
+    problems = []
+    db = SessionLocal()
+    try:
+        account_id = seed_accounts(db, 1)[0]
+        # Posted within retention, so only the quota can remove them
+        post_ids = seed_expired_posts(db, media_downloader.store, account_id, 3, 600 * 1024, timedelta(hours=1))
+        pending = db.get(models.MediaPost, post_ids[0])
+        pending.status = models.PostStatus.PENDING
+        pending.posted_at = None
+        # Least recently used, so it is the first candidate
+        pending.blob.last_used_at = datetime.utcnow() - timedelta(days=30)
+        db.commit()
+        result = cleanup_old_media.apply().get()
+        db.expire_all()
+        if not result["evicted"]:
+            problems.append("store over quota but nothing was evicted")
+        if not pending.blob_sha256 or pending.purged_at:
+            problems.append("media of a pending, unscheduled post was evicted")
+    finally:
+        db.close()
+    return problems
+
+def undecryptable_credentials_keep_account_active(published: List[Tuple[str, list]]) -> List[str]:
+    """Credentials the worker can't decrypt fail the post, not the account."""
+    from app.database import models
+    from app.database.session import SessionLocal
+    from app.tasks.instagram_tasks import process_scheduled_post
+    from app.utils.failures import PERMANENT
+
+    from .seed import make_prepared_image
+
+    problems = []
+    db = SessionLocal()
+    try:
+        prepared_path = make_prepared_image(Path(tempfile.mkdtemp(prefix="scenarios-")) / "prepared.jpg")
+        post_id, schedule_id = _seed_due_post(db, prepared_path=prepared_path)
+        account = db.get(models.MediaPost, post_id).account
+        # Encrypted under some other key
+        account.encrypted_credentials = "Z0FBQUFBQm5vdGVuY3J5cHRlZHdpdGh0aGlza2V5"
+        db.commit()
+        process_scheduled_post.apply(args=[schedule_id])
+        db.expire_all()
+        schedule = db.get(models.ScheduledPost, schedule_id)
+        if not schedule.dead_lettered_at or schedule.failure_class != PERMANENT:
+            problems.append(f"expected a permanent dead letter, got {schedule.failure_class!r}")
+        if not account.is_active:
+            problems.append("account was deactivated over the worker's encryption key")
+    finally:
+        db.close()
+    return problems
+
+def unpreparable_media_fails_after_retries(published: List[Tuple[str, list]]) -> List[str]:
+    """Media whose file stays missing is marked failed once prepare runs out of retries."""
+    from app.database import models
+    from app.database.session import SessionLocal
+    from app.tasks.instagram_tasks import prepare_media_post
+
+    problems = []
+    db = SessionLocal()
+    try:
+        post_id, _ = _seed_due_post(db)
+        # Run inline, retries included
+        prepare_media_post.apply(args=[post_id])
+        post = db.get(models.MediaPost, post_id)
+        if post.status != models.PostStatus.FAILED or not post.error_message:
+            problems.append(f"media left {post.status.value} after prepare ran out of retries")
+    finally:
+        db.close()
+    return problems
+
+SCENARIOS: Dict[str, Callable[[List[Tuple[str, list]]], List[str]]] = {
+    "purged_media_is_reingested": purged_media_is_reingested,
+    "redriven_failed_ingest_is_reingested": redriven_failed_ingest_is_reingested,
+    "unscheduled_media_survives_eviction": unscheduled_media_survives_eviction,
+    "unpreparable_media_fails_after_retries": unpreparable_media_fails_after_retries,
+    "undecryptable_credentials_keep_account_active": undecryptable_credentials_keep_account_active,
+}
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.scenarios",
+        description="Check how the tasks handle lost, purged, evicted and failed media, and unreadable credentials."
+    )
+    parser.add_argument("--only", action="append", choices=sorted(SCENARIOS), help="Scenarios to run (default: all)")
+    parser.add_argument("--workdir", help="Directory for the database and media (default: a temporary one)")
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="scenarios-"))
+    environment.configure(workdir, {"INGEST_WAIT_MAX_DEFERRALS": str(MAX_DEFERRALS), "MEDIA_QUOTA_MB": "1"})
+    # Published tasks are only recorded, never run
+    environment.setup_app(eager=False)
+    published = _published_tasks()
+
+    report = {name: SCENARIOS[name](published) for name in args.only or sorted(SCENARIOS)}
+    print(json.dumps(report, indent=2, sort_keys=True))
+    for name, problems in report.items():
+        for problem in problems:
+            print(f"FAIL: {name}: {problem}", file=sys.stderr)
+    return 1 if any(report.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Sequence
+
+from PIL import Image
+
+from app.database import models
+from app.utils.encryption import encrypt_credentials
+from app.utils.media_store import MediaStore
+
+from .stand_ins import fake_jpeg
+
+def make_prepared_image(path: Path, width: int = 1080, height: int = 1080) -> str:
+    """Write a real upload-ready JPEG for posts to point at."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", (width, height), (200, 120, 40)).save(path, "JPEG", quality=85)
+    return str(path)
+
+def seed_accounts(db, count: int) -> List[str]:
+    """Insert active accounts with encrypted fake credentials."""
+    account_ids = [str(uuid.uuid4()) for _ in range(count)]
+    db.add_all(
+        models.InstagramAccount(
+            id=account_id,
+            username=f"bench_{account_id[:12]}",
+            encrypted_credentials=encrypt_credentials({"username": f"bench_{account_id[:12]}", "password": "bench"})
+        )
+        for account_id in account_ids
+    )
+    db.commit()
+    return account_ids
+
+def seed_prepared_posts(db, account_ids: Sequence[str], count: int, prepared_path: str) -> List[str]:
+    """Insert downloaded, upload-ready media posts spread round-robin over accounts."""
+    now = datetime.utcnow()
+    post_ids = [str(uuid.uuid4()) for _ in range(count)]
+    db.add_all(
+        models.MediaPost(
+            id=post_id,
+            source_url=f"http://cdn.invalid/{post_id}.jpg",
+            media_type="image",
+            caption=f"Benchmark post {index}",
+            account_id=account_ids[index % len(account_ids)],
+            status=models.PostStatus.PENDING,
+            prepared_path=prepared_path,
+            prepared_at=now,
+            width=1080,
+            height=1080
+        )
+        for index, post_id in enumerate(post_ids)
+    )
+    db.commit()
+    return post_ids
+
+def seed_schedules(db, post_ids: Sequence[str], times: Sequence[datetime]) -> List[str]:
+    """Insert one scheduled post per media post at the given times."""
+    schedule_ids = [str(uuid.uuid4()) for _ in post_ids]
+    db.add_all(
+        models.ScheduledPost(id=schedule_id, media_post_id=post_id, scheduled_time=scheduled_time)
+        for schedule_id, post_id, scheduled_time in zip(schedule_ids, post_ids, times)
+    )
+    db.commit()
+    return schedule_ids
+
+def seed_expired_posts(db, store: MediaStore, account_id: str, count: int, size: int, age: timedelta) -> List[str]:
+    """
+    Insert posted media old enough for cleanup, each holding its own stored blob.
+
+    Args:
+        db: Sync session
+        store: Media store the blob files are written to
+        account_id: Owner of the posts
+        count: Number of posts and blobs
+        size: Bytes per blob
+        age: How long ago the posts were published
+    """
+    posted_at = datetime.utcnow() - age
+    post_ids = []
+    for index in range(count):
+        writer = store.writer()
+        writer.write(fake_jpeg(size, seed=10_000_000 + index))
+        blob = store.commit(writer, ext=".jpg", content_type="image/jpeg")
+        post_id = str(uuid.uuid4())
+        db.add(models.MediaBlob(
+            sha256=blob.sha256,
+            path=blob.path,
+            size=blob.size,
+            content_type=blob.content_type,
+            source_url=f"http://cdn.invalid/expired/{index}.jpg",
+            ref_count=1,
+            last_used_at=posted_at
+        ))
+        db.add(models.MediaPost(
+            id=post_id,
+            source_url=f"http://cdn.invalid/expired/{index}.jpg",
+            media_type="image",
+            account_id=account_id,
+            status=models.PostStatus.POSTED,
+            posted_at=posted_at,
+            blob_sha256=blob.sha256,
+            file_size=blob.size
+        ))
+        post_ids.append(post_id)
+    db.commit()
+    return post_ids
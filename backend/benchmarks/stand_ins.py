@@ -0,0 +1,183 @@
+import asyncio
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+from aiohttp import web
+
+class FakeInstagramError(Exception):
+    """A failure injected by the fake Instagram client."""
+
+@dataclass
+class InstagramBehaviour:
+    login_latency: float = 0.2  # seconds per network login
+    upload_latency: float = 0.5  # seconds per photo or video upload
+    jitter: float = 0.2  # latency varies by +/- this fraction
+    failure_rate: float = 0.0  # share of uploads that raise
+    login_failure_rate: float = 0.0  # share of logins that raise
+    seed: int = 0
+
+class FakeInstagrapiClient:
+    """
+    Drop-in for instagrapi.Client that sleeps instead of calling Instagram.
+
+    Stored session settings carry a fake token, so restored sessions skip
+    the login latency just like the real client.
+    """
+
+    behaviour = InstagramBehaviour()
+    _random = random.Random(0)
+    _lock = threading.Lock()
+    logins = 0
+    uploads = 0
+
+    @classmethod
+    def configure(cls, behaviour: InstagramBehaviour):
+        cls.behaviour = behaviour
+        cls._random = random.Random(behaviour.seed)
+        cls.logins = 0
+        cls.uploads = 0
+
+    def __init__(self):
+        self.settings: Dict = {}
+
+    @classmethod
+    def _draw(cls, latency: float, failure_rate: float):
+        with cls._lock:
+            delay = latency * (1 + cls.behaviour.jitter * (2 * cls._random.random() - 1))
+            failed = cls._random.random() < failure_rate
+        time.sleep(max(0.0, delay))
+        return failed
+
+    def set_settings(self, settings: Dict):
+        self.settings = dict(settings)
+
+    def get_settings(self) -> Dict:
+        return dict(self.settings)
+
+    def set_uuids(self, uuids: Dict):
+        self.settings["uuids"] = uuids
+
+    def login(self, username: str, password: str) -> bool:
+        if self.settings.get("authorization_data"):
+            return True
+        if self._draw(self.behaviour.login_latency, self.behaviour.login_failure_rate):
+            raise FakeInstagramError(f"Injected login failure for {username}")
+        with self._lock:
+            FakeInstagrapiClient.logins += 1
+        self.settings.setdefault("uuids", {"uuid": str(uuid.uuid4())})
+        self.settings["authorization_data"] = {"ds_user_id": username, "sessionid": uuid.uuid4().hex}
+        return True
+
+    def _upload(self):
+        if self._draw(self.behaviour.upload_latency, self.behaviour.failure_rate):
+            raise FakeInstagramError("Injected upload failure")
+        with self._lock:
+            FakeInstagrapiClient.uploads += 1
+        return SimpleNamespace(id=uuid.uuid4().hex, pk=uuid.uuid4().int >> 64)
+
+    def photo_upload(self, path, caption: Optional[str] = None):
+        return self._upload()
+
+    def video_upload(self, path, caption: Optional[str] = None, thumbnail=None):
+        return self._upload()
+
+    def account_info(self) -> Dict:
+        return {"username": self.settings.get("authorization_data", {}).get("ds_user_id")}
+
+    def logout(self) -> bool:
+        self.settings.pop("authorization_data", None)
+        return True
+
+def install_fake_instagram(behaviour: InstagramBehaviour):
+    """Make every InstagramClient built from now on use the fake client."""
+    from app.utils import instagram
+
+    FakeInstagrapiClient.configure(behaviour)
+    instagram.Client = FakeInstagrapiClient
+
+def fake_jpeg(size: int, seed: int) -> bytes:
+    """Bytes that sniff as JPEG, unique per seed, of exactly size bytes."""
+    header = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00"
+    return header + random.Random(seed).randbytes(max(0, size - len(header)))
+
+class MediaServer:
+    def __init__(self, root: Path, latency: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        """
+        Local stand-in for the media CDN, served from a background thread.
+
+        Files are served with aiohttp's FileResponse, so Range requests and
+        ETag/Last-Modified validators behave like a real static host.
+
+        Args:
+            root: Directory the media files are written to
+            latency: Seconds to wait before answering each request
+            failure_rate: Share of requests answered with 503
+            seed: Seed for the injected failures
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+        self.port: Optional[int] = None
+        self.requests = 0
+
+    def add(self, name: str, size: int, seed: int = 0) -> str:
+        """Write a media file of the given size and return its URL."""
+        (self.root / name).write_bytes(fake_jpeg(size, seed))
+        return self.url(name)
+
+    def url(self, name: str) -> str:
+        return f"http://127.0.0.1:{self.port}/media/{name}"
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            return web.Response(status=503, text="Injected failure")
+        path = self.root / request.match_info["name"]
+        if not path.is_file():
+            raise web.HTTPNotFound()
+        return web.FileResponse(path, headers={"Content-Type": "image/jpeg"})
+
+    def start(self) -> "MediaServer":
+        started = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        async def serve():
+            app = web.Application()
+            app.router.add_get("/media/{name}", self._handle)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, "127.0.0.1", 0)
+            await site.start()
+            self.port = site._server.sockets[0].getsockname()[1]
+            started.set()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(serve())
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="media-server", daemon=True)
+        self._thread.start()
+        started.wait(10)
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(10)
+        self._loop = None
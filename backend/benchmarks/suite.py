@@ -0,0 +1,326 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from . import environment
+from .results import Recorder, compare, run_metadata, summarize, write_results
+from .stand_ins import InstagramBehaviour, MediaServer
+
+logger = logging.getLogger(__name__)
+
+def bench_download(args) -> Dict[str, Dict]:
+    """MediaDownloader.download_media against the local media server."""
+    from app.config import settings
+    from app.utils.downloader import MediaDownloader
+
+    server = MediaServer(
+        Path(args.workdir) / "cdn",
+        latency=args.cdn_latency,
+        failure_rate=args.cdn_failure_rate,
+        seed=args.seed
+    ).start()
+    try:
+        size = args.download_kb * 1024
+        urls = [server.add(f"media-{index}.jpg", size, seed=args.seed + index) for index in range(args.downloads)]
+        downloader = MediaDownloader(
+            download_dir=str(settings.DOWNLOAD_DIR),
+            concurrency=args.download_concurrency,
+            limit_per_host=args.download_concurrency,
+            retry_backoff=0.01
+        )
+        recorder = Recorder()
+
+        async def run():
+            semaphore = asyncio.Semaphore(args.download_concurrency)
+
+            async def fetch(url: str):
+                async with semaphore:
+                    started = time.perf_counter()
+                    try:
+                        await downloader.download_media(url)
+                    except Exception:
+                        recorder.error()
+                    else:
+                        recorder.record(time.perf_counter() - started)
+
+            try:
+                await asyncio.gather(*(fetch(url) for url in urls))
+            finally:
+                await downloader.close()
+
+        started = time.perf_counter()
+        asyncio.run(run())
+        wall = time.perf_counter() - started
+    finally:
+        server.stop()
+    return {"download": summarize(
+        recorder,
+        wall,
+        bytes_per_second=round(len(recorder.samples) * size / wall, 1) if wall else None,
+        size_bytes=size,
+        concurrency=args.download_concurrency,
+        server_requests=server.requests
+    )}
+
+def bench_process(args) -> Dict[str, Dict]:
+    """process_scheduled_post end to end, from the due row to the fake upload."""
+    from app.database import models
+    from app.database.session import SessionLocal
+    from app.tasks.instagram_tasks import process_scheduled_post
+    from .seed import make_prepared_image, seed_accounts, seed_prepared_posts, seed_schedules
+    from .stand_ins import FakeInstagrapiClient
+
+    db = SessionLocal()
+    try:
+        prepared = make_prepared_image(Path(args.workdir) / "prepared.jpg")
+        account_ids = seed_accounts(db, args.accounts)
+        post_ids = seed_prepared_posts(db, account_ids, args.posts, prepared)
+        now = datetime.utcnow()
+        schedule_ids = seed_schedules(db, post_ids, [now] * len(post_ids))
+        account_for = {
+            schedule_id: account_ids[index % len(account_ids)]
+            for index, schedule_id in enumerate(schedule_ids)
+        }
+    finally:
+        db.close()
+
+    recorder = Recorder()
+
+    def run(schedule_id: str):
+        started = time.perf_counter()
+        process_scheduled_post.apply(args=[schedule_id], kwargs={"account_id": account_for[schedule_id]})
+        recorder.record(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.post_threads) as executor:
+        list(executor.map(run, schedule_ids))
+    wall = time.perf_counter() - started
+
+    db = SessionLocal()
+    try:
+        posted = db.query(models.MediaPost)\
+            .filter(models.MediaPost.id.in_(post_ids))\
+            .filter(models.MediaPost.status == models.PostStatus.POSTED)\
+            .count()
+    finally:
+        db.close()
+    recorder.errors = len(post_ids) - posted
+    return {"process_scheduled_post": summarize(
+        recorder,
+        wall,
+        posted=posted,
+        accounts=args.accounts,
+        threads=args.post_threads,
+        logins=FakeInstagrapiClient.logins,
+        uploads=FakeInstagrapiClient.uploads
+    )}
+
+def bench_schedule_api(args) -> Dict[str, Dict]:
+    """The scheduling endpoints through the ASGI app, without a network hop."""
+    import httpx
+
+    from app.database.session import SessionLocal
+    from app.main import app
+    from .seed import make_prepared_image, seed_accounts, seed_prepared_posts
+
+    db = SessionLocal()
+    try:
+        prepared = make_prepared_image(Path(args.workdir) / "prepared.jpg")
+        account_ids = seed_accounts(db, 1)
+        single_ids = seed_prepared_posts(db, account_ids, args.schedule_requests, prepared)
+        bulk_ids = seed_prepared_posts(db, account_ids, args.bulk_items, prepared)
+    finally:
+        db.close()
+
+    later = (datetime.utcnow() + timedelta(days=1)).isoformat()
+    recorders = {name: Recorder() for name in ("create", "bulk", "list", "status")}
+    walls: Dict[str, float] = {}
+
+    async def timed(name: str, call):
+        started = time.perf_counter()
+        response = await call
+        if response.status_code >= 400:
+            recorders[name].error()
+        recorders[name].record(time.perf_counter() - started)
+        return response
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            semaphore = asyncio.Semaphore(args.api_concurrency)
+            created: List[str] = []
+
+            async def create(post_id: str):
+                async with semaphore:
+                    response = await timed("create", client.post(
+                        "/api/scheduler/schedule",
+                        json={"media_post_id": post_id, "scheduled_time": later}
+                    ))
+                    if response.status_code == 200:
+                        created.append(response.json()["id"])
+
+            started = time.perf_counter()
+            await asyncio.gather(*(create(post_id) for post_id in single_ids))
+            walls["create"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for offset in range(0, len(bulk_ids), args.bulk_batch):
+                items = [{"media_post_id": post_id, "scheduled_time": later} for post_id in bulk_ids[offset:offset + args.bulk_batch]]
+                await timed("bulk", client.post("/api/scheduler/schedule/bulk", json={"items": items}))
+            walls["bulk"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            cursor = None
+            while True:
+                params = {"limit": 100}
+                if cursor:
+                    params["cursor"] = cursor
+                page = (await timed("list", client.get("/api/scheduler/schedule", params=params))).json()
+                cursor = page.get("next_cursor")
+                if not cursor:
+                    break
+            walls["list"] = time.perf_counter() - started
+
+            async def status(schedule_id: str):
+                async with semaphore:
+                    first = await timed("status", client.get(f"/api/scheduler/schedule/{schedule_id}"))
+                    # Polling clients revalidate; this is the 304 path
+                    await timed("status", client.get(
+                        f"/api/scheduler/schedule/{schedule_id}",
+                        headers={"If-None-Match": first.headers.get("ETag", "")}
+                    ))
+
+            started = time.perf_counter()
+            await asyncio.gather(*(status(schedule_id) for schedule_id in created))
+            walls["status"] = time.perf_counter() - started
+
+    asyncio.run(run())
+    return {
+        f"schedule_api.{name}": summarize(
+            recorder,
+            walls.get(name, 0.0),
+            items_per_request=args.bulk_batch if name == "bulk" else 1
+        )
+        for name, recorder in recorders.items()
+    }
+
+def bench_cleanup(args) -> Dict[str, Dict]:
+    """cleanup_old_media over posted media past retention."""
+    from app.config import settings
+    from app.database.session import SessionLocal
+    from app.tasks.instagram_tasks import cleanup_old_media
+    from app.utils.downloader import media_downloader
+    from .seed import seed_accounts, seed_expired_posts
+
+    db = SessionLocal()
+    try:
+        account_ids = seed_accounts(db, 1)
+        seed_expired_posts(
+            db,
+            media_downloader.store,
+            account_ids[0],
+            args.cleanup_posts,
+            size=args.cleanup_kb * 1024,
+            age=timedelta(hours=settings.MEDIA_RETENTION_HOURS + 1)
+        )
+    finally:
+        db.close()
+
+    recorder = Recorder()
+    started = time.perf_counter()
+    result = cleanup_old_media.apply().get()
+    wall = time.perf_counter() - started
+    recorder.record(wall)
+    purged = result["purged"] if isinstance(result, dict) else 0
+    if purged < args.cleanup_posts:
+        recorder.errors = args.cleanup_posts - purged
+    return {"cleanup_old_media": summarize(
+        recorder,
+        wall,
+        purged=purged,
+        posts_per_second=round(purged / wall, 1) if wall else None
+    )}
+
+BENCHMARKS: Dict[str, Callable] = {
+    "download": bench_download,
+    "process": bench_process,
+    "schedule_api": bench_schedule_api,
+    "cleanup": bench_cleanup,
+}
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Measure throughput and latency against local stand-ins for Instagram, the CDN and the broker."
+    )
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="Run only these benchmarks (repeatable)")
+    parser.add_argument("--output", default="-", help="Where to write the JSON results (default: stdout)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--workdir", help="Directory for the database and media (default: a fresh temp dir)")
+    parser.add_argument("--seed", type=int, default=1)
+
+    group = parser.add_argument_group("download")
+    group.add_argument("--downloads", type=int, default=200)
+    group.add_argument("--download-kb", type=int, default=512)
+    group.add_argument("--download-concurrency", type=int, default=16)
+    group.add_argument("--cdn-latency", type=float, default=0.02, help="Seconds before the CDN answers")
+    group.add_argument("--cdn-failure-rate", type=float, default=0.0)
+
+    group = parser.add_argument_group("process_scheduled_post")
+    group.add_argument("--posts", type=int, default=200)
+    group.add_argument("--accounts", type=int, default=20)
+    group.add_argument("--post-threads", type=int, default=32, help="Concurrent tasks, like -P threads --concurrency")
+    group.add_argument("--login-latency", type=float, default=0.2)
+    group.add_argument("--upload-latency", type=float, default=0.5)
+    group.add_argument("--upload-failure-rate", type=float, default=0.0)
+
+    group = parser.add_argument_group("scheduling endpoints")
+    group.add_argument("--schedule-requests", type=int, default=300)
+    group.add_argument("--bulk-items", type=int, default=5000)
+    group.add_argument("--bulk-batch", type=int, default=500)
+    group.add_argument("--api-concurrency", type=int, default=16)
+
+    group = parser.add_argument_group("cleanup_old_media")
+    group.add_argument("--cleanup-posts", type=int, default=2000)
+    group.add_argument("--cleanup-kb", type=int, default=16)
+    return parser
+
+def main(argv=None):
+    """Run the benchmarks and write machine-readable results."""
+    args = build_parser().parse_args(argv)
+    # Configured first, so the app's INFO logging of every call stays quiet
+    logging.basicConfig(level=logging.WARNING)
+    args.workdir = args.workdir or tempfile.mkdtemp(prefix="reposter-bench-")
+    environment.configure(Path(args.workdir))
+
+    environment.setup_app()
+    from .stand_ins import install_fake_instagram
+    install_fake_instagram(InstagramBehaviour(
+        login_latency=args.login_latency,
+        upload_latency=args.upload_latency,
+        failure_rate=args.upload_failure_rate,
+        seed=args.seed
+    ))
+
+    results: Dict[str, Dict] = {}
+    for name in args.only or list(BENCHMARKS):
+        print(f"Running {name} benchmark...", file=sys.stderr)
+        results.update(BENCHMARKS[name](args))
+
+    params = {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "workdir")}
+    report = {"meta": run_metadata(params), "results": results}
+    write_results(report, args.output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for line in compare(baseline, report):
+            print(line, file=sys.stderr)
@@ -0,0 +1,56 @@
+import math
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List
+
+@dataclass
+class WorkloadShape:
+    burst_share: float = 0.4  # share of posts set exactly on the hour or half hour
+    half_hour_share: float = 0.3  # of those, the share on the half hour
+    diurnal_amplitude: float = 0.6  # 0 is flat; 1 leaves the quietest hour empty
+    peak_hour: int = 19  # local hour with the most posts
+
+def hour_weights(shape: WorkloadShape) -> List[float]:
+    """Relative post volume of each hour of the day, peaking at shape.peak_hour."""
+    return [
+        1 + shape.diurnal_amplitude * math.cos(2 * math.pi * (hour - shape.peak_hour) / 24)
+        for hour in range(24)
+    ]
+
+def schedule_times(
+    count: int,
+    start: datetime,
+    window_seconds: float,
+    shape: WorkloadShape,
+    rng: random.Random
+) -> List[datetime]:
+    """
+    Scheduled times of a day's posts, compressed into a window.
+
+    The window stands for 24 hours. Hours are picked along a diurnal curve;
+    within an hour, burst_share of the posts land exactly on the hour or
+    half hour, the way people pick times in a scheduling UI, and the rest
+    fall on whole (compressed) minutes.
+
+    Args:
+        count: Number of posts
+        start: When the compressed day begins
+        window_seconds: Real length of the compressed day
+        shape: Burstiness and daily curve
+        rng: Source of randomness, seeded for repeatable runs
+
+    Returns:
+        Scheduled times in ascending order
+    """
+    hour = window_seconds / 24
+    minute = hour / 60
+    hours = rng.choices(range(24), weights=hour_weights(shape), k=count)
+    times = []
+    for chosen in hours:
+        if rng.random() < shape.burst_share:
+            offset = 30 * minute if rng.random() < shape.half_hour_share else 0.0
+        else:
+            offset = rng.randrange(60) * minute
+        times.append(start + timedelta(seconds=chosen * hour + offset))
+    return sorted(times)
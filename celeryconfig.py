@@ -1,3 +1,4 @@
+import os
 from kombu import Exchange, Queue
 
 # Broker settings
@@ -11,15 +12,36 @@ accept_content = ['json']
 timezone = 'UTC'
 enable_utc = True
 
+# Message priorities (0 is served first); see app.utils.lanes
+broker_transport_options = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+}
+
 # Queue settings
 task_queues = (
     Queue('default', Exchange('default'), routing_key='default'),
     Queue('instagram', Exchange('instagram'), routing_key='instagram'),
+    Queue('media', Exchange('media'), routing_key='media'),
+    Queue('ingest', Exchange('ingest'), routing_key='ingest'),
+    Queue('maintenance', Exchange('maintenance'), routing_key='maintenance'),
+) + tuple(
+    # Account shards: each account's posts always land on the same queue and worker
+    Queue(f'instagram.{shard}', Exchange('instagram'), routing_key=f'instagram.{shard}')
+    for shard in range(int(os.getenv('INSTAGRAM_QUEUE_SHARDS', '16')))
 )
 
-task_routes = {
+task_routes = ('app.tasks.routing.route_task', {
+    # CPU-heavy resizing and transcoding runs on its own workers
+    'app.tasks.instagram_tasks.prepare_media_post': {'queue': 'media'},
+    # Downloads queued by the API; sized separately so imports can't starve posting
+    'app.tasks.instagram_tasks.ingest_media_post': {'queue': 'ingest'},
+    # Housekeeping never queues in front of posts
+    'app.tasks.instagram_tasks.cleanup_old_media': {'queue': 'maintenance'},
+    # The dispatcher only claims and publishes; keep it off the post lanes
+    'app.tasks.instagram_tasks.dispatch_due_posts': {'queue': 'default'},
     'app.tasks.instagram_tasks.*': {'queue': 'instagram'},
-}
+})
 
 # Task execution settings
 task_acks_late = True
@@ -36,4 +58,8 @@ beat_schedule = {
         'task': 'app.tasks.instagram_tasks.cleanup_old_media',
         'schedule': 86400.0,  # Run once per day
     },
+    'dispatch-due-posts': {
+        'task': 'app.tasks.instagram_tasks.dispatch_due_posts',
+        'schedule': float(os.getenv('DISPATCH_INTERVAL_SECONDS', '10')),
+    },
 } 
\ No newline at end of file